@@ -0,0 +1,93 @@
+import argparse
+import threading
+import time
+from typing import List
+
+from src.browser_pool.chrome_driver_pool import ChromeDriverPool
+from src.config.webdriver_config import ChromeConfiguration
+from src.provider.fake_webdriver_provider import FakeDriverProvider
+
+
+def __percentile__(values: List[float], percent: float):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * percent / 100), len(ordered) - 1)]
+
+
+def __new_pool__(provider: FakeDriverProvider, pool_size: int, lazy: bool = False, launch_concurrency: int = 4):
+    return ChromeDriverPool(pool_size=pool_size, lazy_pool=lazy, chrome_config=ChromeConfiguration(),
+                            driver_provider=provider, launch_concurrency=launch_concurrency,
+                            health_check_interval=None)
+
+
+def bench_prewarm(pool_size: int, launch_latency: float):
+    print('Pre-warm of {} drivers starting in {}s each'.format(pool_size, launch_latency))
+    for concurrency in [1, 4, 8]:
+        started = time.perf_counter()
+        pool = __new_pool__(FakeDriverProvider(launch_latency=launch_latency), pool_size,
+                            launch_concurrency=concurrency)
+        elapsed = time.perf_counter() - started
+        pool.close_pool()
+        print('  launch_concurrency={:<3} {:>8.3f}s'.format(concurrency, elapsed))
+
+
+def bench_checkout(pool_size: int, threads: int, duration: float, hold: float):
+    pool = __new_pool__(FakeDriverProvider(), pool_size)
+    waits: List[float] = list()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        local_waits = list()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            session = pool.get_session(timeout=None)
+            local_waits.append(time.perf_counter() - started)
+            if hold:
+                time.sleep(hold)
+            pool.release_session(session.session_id)
+        with lock:
+            waits.extend(local_waits)
+
+    workers = [threading.Thread(target=worker) for x in range(0, threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    pool.close_pool()
+    print('  threads={:<4} {:>10.0f} checkouts/s  wait p50 {:>9.1f}us  p99 {:>9.1f}us'
+          .format(threads, len(waits) / elapsed, __percentile__(waits, 50) * 1e6, __percentile__(waits, 99) * 1e6))
+
+
+def bench_shutdown(pool_size: int, quit_latency: float):
+    pool = __new_pool__(FakeDriverProvider(quit_latency=quit_latency), pool_size)
+    for x in range(0, pool_size // 2):
+        pool.get_session()
+    started = time.perf_counter()
+    pool.close_pool()
+    print('Shutdown of {} drivers quitting in {}s each: {:.3f}s'
+          .format(pool_size, quit_latency, time.perf_counter() - started))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks of browser pool hot paths with fake drivers.')
+    parser.add_argument('--pool-size', type=int, default=8)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--duration', type=float, default=2.0, help='Seconds each checkout benchmark runs.')
+    parser.add_argument('--hold', type=float, default=0.0, help='Seconds each session is held by a worker.')
+    parser.add_argument('--launch-latency', type=float, default=0.1)
+    parser.add_argument('--quit-latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    bench_prewarm(20, args.launch_latency)
+    print('Checkout and release of pool with {} drivers'.format(args.pool_size))
+    for threads in args.threads:
+        bench_checkout(args.pool_size, threads, args.duration, args.hold)
+    bench_shutdown(20, args.quit_latency)
+
+
+if __name__ == '__main__':
+    main()
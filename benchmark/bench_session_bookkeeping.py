@@ -0,0 +1,45 @@
+import time
+
+from src.browser_pool.chrome_driver_pool import ChromeDriverPool
+from src.config.webdriver_config import ChromeConfiguration
+from src.provider.fake_webdriver_provider import FakeDriverProvider
+
+POOL_SIZES = [10, 100, 1000, 5000]
+CYCLES = 10000
+
+
+def __bench_pool_size__(pool_size: int):
+    # Fake drivers start and quit instantly, so only pool bookkeeping is measured
+    pool = ChromeDriverPool(pool_size=pool_size, lazy_pool=False, chrome_config=ChromeConfiguration(),
+                            driver_provider=FakeDriverProvider(), health_check_interval=None)
+    # Keep all sessions but one checked out, so lookups run against a full active pool
+    sessions = [pool.get_session() for x in range(0, pool_size - 1)]
+
+    started = time.perf_counter()
+    for x in range(0, CYCLES):
+        session = pool.get_session()
+        pool.release_session(session.session_id)
+    checkout_cost = (time.perf_counter() - started) / CYCLES
+
+    started = time.perf_counter()
+    for session in sessions[:pool_size // 2]:
+        pool.close_driver(session.session_id)
+    close_cost = (time.perf_counter() - started) / max(pool_size // 2, 1)
+
+    started = time.perf_counter()
+    pool.close_pool()
+    shutdown_cost = (time.perf_counter() - started) / pool_size
+    return checkout_cost, close_cost, shutdown_cost
+
+
+def main():
+    print('{:>10} {:>22} {:>18} {:>21}'.format('pool size', 'checkout+release, us', 'close_driver, us',
+                                              'close_pool/session, us'))
+    for pool_size in POOL_SIZES:
+        checkout_cost, close_cost, shutdown_cost = __bench_pool_size__(pool_size)
+        print('{:>10} {:>22.2f} {:>18.2f} {:>21.2f}'.format(pool_size, checkout_cost * 1e6, close_cost * 1e6,
+                                                           shutdown_cost * 1e6))
+
+
+if __name__ == '__main__':
+    main()
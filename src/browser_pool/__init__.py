@@ -0,0 +1,8 @@
+from src.browser_pool.async_chrome_driver_pool import AsyncChromeDriverPool
+from src.browser_pool.async_driver_pool import AsyncDriverPool
+from src.browser_pool.async_firefox_driver_pool import AsyncFirefoxDriverPool
+from src.browser_pool.browser_spec import BrowserSpec
+from src.browser_pool.chrome_driver_pool import ChromeDriverPool
+from src.browser_pool.driver_pool import DriverPool
+from src.browser_pool.firefox_driver_pool import FirefoxDriverPool
+from src.browser_pool.tab_pool import TabPool
@@ -0,0 +1,87 @@
+import threading
+import time
+
+from src.util.process_utils import get_available_memory, get_load_per_cpu
+
+DEFAULT_MAX_CONCURRENT_LAUNCHES = 2
+DEFAULT_MIN_AVAILABLE_MEMORY = 512 * 1024 * 1024
+DEFAULT_BROWSER_FOOTPRINT = 300 * 1024 * 1024
+DEFAULT_SAMPLE_INTERVAL = 0.5
+FOOTPRINT_SMOOTHING = 0.2
+
+
+class AdmissionController:
+    """Admits browser launches while the host has memory and CPU for one more browser.
+    Launches which are not admitted wait, host state is sampled every `sample_interval` seconds.
+    Can be shared by pools running on the same host."""
+
+    def __init__(self,
+                 max_concurrent_launches: int = DEFAULT_MAX_CONCURRENT_LAUNCHES,
+                 min_available_memory: int = DEFAULT_MIN_AVAILABLE_MEMORY,
+                 max_load_per_cpu: float = None,
+                 browser_footprint: int = DEFAULT_BROWSER_FOOTPRINT,
+                 sample_interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.max_concurrent_launches = max_concurrent_launches
+        # Memory in bytes which should stay available after the launched browsers take their footprint
+        self.min_available_memory = min_available_memory
+        self.max_load_per_cpu = max_load_per_cpu
+        # Expected memory of one browser, it follows memory measured by the pools once there is some
+        self.browser_footprint = browser_footprint
+        self.sample_interval = sample_interval
+        self.__condition__ = threading.Condition()
+        self.__launching__ = 0
+        self.__available_memory__ = None
+        self.__load_per_cpu__ = None
+        self.__sampled_at__ = None
+
+    def acquire(self, timeout: float = None, is_cancelled=None) -> bool:
+        # Waits up to timeout seconds until launch is admitted, every acquired launch should be released
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.__condition__:
+            while not self.__can_launch__():
+                if is_cancelled and is_cancelled():
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.__condition__.wait(self.sample_interval if remaining is None
+                                        else min(remaining, self.sample_interval))
+            self.__launching__ += 1
+            return True
+
+    def release(self):
+        with self.__condition__:
+            self.__launching__ -= 1
+            # Browser which finished launching shows up in the next sample of available memory
+            self.__sampled_at__ = None
+            self.__condition__.notify_all()
+
+    def observe_footprint(self, rss: int):
+        with self.__condition__:
+            self.browser_footprint = int(self.browser_footprint * (1 - FOOTPRINT_SMOOTHING)
+                                         + rss * FOOTPRINT_SMOOTHING)
+
+    def launching(self) -> int:
+        with self.__condition__:
+            return self.__launching__
+
+    def __can_launch__(self):
+        if self.__launching__ >= self.max_concurrent_launches:
+            return False
+        self.__sample__()
+        if self.max_load_per_cpu is not None and self.__load_per_cpu__ is not None \
+                and self.__load_per_cpu__ > self.max_load_per_cpu:
+            return False
+        if self.__available_memory__ is None:
+            return True
+        # Browsers which are launching did not allocate their memory yet
+        required = (self.__launching__ + 1) * self.browser_footprint + self.min_available_memory
+        return self.__available_memory__ >= required
+
+    def __sample__(self):
+        now = time.monotonic()
+        if self.__sampled_at__ is not None and now - self.__sampled_at__ < self.sample_interval:
+            return
+        self.__available_memory__ = get_available_memory()
+        self.__load_per_cpu__ = get_load_per_cpu()
+        self.__sampled_at__ = now
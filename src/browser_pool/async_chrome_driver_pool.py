@@ -0,0 +1,26 @@
+from typing import Callable
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from src.browser_pool.async_driver_pool import AsyncDriverPool
+from src.browser_pool.browser_spec import BrowserSpec
+from src.config.webdriver_config import ChromeConfiguration
+from src.provider.webdriver_provider import provide_chrome_driver
+
+
+class AsyncChromeDriverPool(AsyncDriverPool):
+    """Asyncio adapter of ChromeDriverPool, other options of ChromeDriverPool are passed by name."""
+
+    def __init__(self,
+                 pool_size: int = 0,
+                 lazy_pool: bool = True,
+                 chrome_config: ChromeConfiguration = ChromeConfiguration(),
+                 driver_provider: Callable[[ChromeConfiguration], WebDriver] = provide_chrome_driver,
+                 **options):
+        self.chrome_config = chrome_config
+        # Starts driver for the configuration, can be replaced e.g. by FakeDriverProvider to run without browser
+        self.driver_provider = driver_provider
+        super().__init__(browsers=[BrowserSpec.chrome(chrome_config, driver_provider)],
+                         pool_size=pool_size,
+                         lazy_pool=lazy_pool,
+                         **options)
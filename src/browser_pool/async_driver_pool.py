@@ -0,0 +1,201 @@
+import asyncio
+import functools
+import logging
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Iterable, List
+
+from selenium.common.exceptions import WebDriverException
+
+from src.browser_pool.browser_spec import BrowserSpec
+from src.browser_pool.checkout_queue import AsyncCheckoutQueue
+from src.browser_pool.driver_pool import DriverPool
+from src.config.webdriver_config import DriverSession
+from src.exception.BrowserPoolGeneralException import BrowserPoolGeneralException
+from src.metrics.pool_metrics import EXHAUSTED, render_prometheus
+
+
+class AsyncDriverPool:
+    """Asyncio adapter of DriverPool, it takes the same browsers and options and has all its features.
+    Calls of the pool which can block run on executor threads, coroutines waiting for a free session wait
+    on the event loop and are served in the order they came, so the event loop is never blocked.
+    The pool is created by start, e.g. not lazy pool starts its drivers there."""
+
+    def __init__(self, browsers: List[BrowserSpec], **options):
+        self.browsers = browsers
+        # Options of DriverPool, e.g. pool_size, lazy_pool, min_idle, proxies or max_lease_time
+        self.options = options
+        self.pool: DriverPool = None
+        self.__is_closed__ = False
+        # Callers which were let through the queue and did not get a session from the pool yet
+        self.__checking_out__ = 0
+        # Asyncio primitives are created in start, so they belong to the loop which uses the pool
+        self.__loop__: asyncio.AbstractEventLoop = None
+        self.__lock__: asyncio.Lock = None
+        self.__waiters__: AsyncCheckoutQueue = None
+        self.__started__: asyncio.Future = None
+        self.__executor__: ThreadPoolExecutor = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def start(self) -> DriverPool:
+        if self.__started__ is None:
+            self.__started__ = asyncio.ensure_future(self.__start__())
+        await asyncio.shield(self.__started__)
+        return self.pool
+
+    async def acquire(self,
+                      timeout: float = None,
+                      proxy: str = None,
+                      max_hold: float = None,
+                      priority: str = None,
+                      browser: str = None,
+                      tags: Iterable[str] = None) -> DriverSession:
+        # Waits up to timeout seconds for a free session, None means wait until one is free.
+        # Takes the same arguments as DriverPool.get_session
+        started = time.monotonic()
+        pool = await self.start()
+        stack = traceback.extract_stack()[:-1] if max_hold or max_hold is None and pool.max_lease_time else None
+        deadline = None if timeout is None else started + timeout
+        async with self.__lock__:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if not await self.__waiters__.wait_for(self.__can_checkout__, remaining):
+                pool.metrics.increment(EXHAUSTED)
+                raise BrowserPoolGeneralException('Reached limit of drivers in {} browser pool.'
+                                                  .format(pool.browser_name))
+            self.__check_pool_ran__()
+            self.__checking_out__ += 1
+        # Pool waits for the session only when another caller took it first, e.g. a thread using the pool
+        remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+        checkout = self.__run__(pool.__get_session__, started, lambda: stack, remaining, proxy, max_hold, priority,
+                                browser, tags)
+        try:
+            return await asyncio.shield(checkout)
+        except asyncio.CancelledError:
+            # Session which the pool gives out after the caller was cancelled is released
+            checkout.add_done_callback(self.__release_abandoned__)
+            raise
+        finally:
+            self.__checking_out__ -= 1
+            self.__notify__()
+
+    async def release_session(self, session_id: uuid):
+        await self.__run__(self.pool.release_session, session_id)
+
+    async def close_driver(self, session_id: uuid):
+        await self.__run__(self.pool.close_driver, session_id)
+
+    @asynccontextmanager
+    async def session(self,
+                      timeout: float = None,
+                      proxy: str = None,
+                      max_hold: float = None,
+                      priority: str = None,
+                      browser: str = None,
+                      tags: Iterable[str] = None):
+        # Session is released back to the pool on exit, driver which failed is closed
+        session = await self.acquire(timeout, proxy, max_hold, priority, browser, tags)
+        is_failed = False
+        try:
+            yield session
+        except WebDriverException:
+            is_failed = True
+            raise
+        finally:
+            if is_failed:
+                await self.close_driver(session.session_id)
+            else:
+                await self.release_session(session.session_id)
+
+    def get_metrics(self) -> dict:
+        metrics = self.pool.get_metrics() if self.pool else {'gauges': dict()}
+        metrics['gauges']['waiting_callers'] = metrics['gauges'].get('waiting_callers', 0) + \
+            (len(self.__waiters__) if self.__waiters__ else 0)
+        return metrics
+
+    def get_prometheus_metrics(self) -> str:
+        return render_prometheus(self.get_metrics())
+
+    def get_lease_report(self) -> dict:
+        return self.pool.get_lease_report() if self.pool else {'active': list(), 'reclaimed': list()}
+
+    async def aclose(self, timeout: float = None):
+        # Sessions are quit within timeout seconds (close_timeout of the pool by default) like by close_pool
+        if self.__is_closed__:
+            return
+        self.__is_closed__ = True
+        if self.__started__ is None:
+            return
+        try:
+            await asyncio.shield(self.__started__)
+        except Exception:
+            # Pool which failed to start quit its drivers already
+            return
+        self.pool.remove_free_session_listener(self.__notify_threadsafe__)
+        async with self.__lock__:
+            # Waiting callers are woken up to fail instead of waiting for sessions which will not return
+            self.__waiters__.notify_all()
+        await self.__run__(self.pool.close_pool, timeout)
+        self.__executor__.shutdown(wait=False)
+
+    async def __start__(self):
+        self.__loop__ = asyncio.get_running_loop()
+        self.__lock__ = asyncio.Lock()
+        self.__waiters__ = AsyncCheckoutQueue(self.__lock__)
+        # Not lazy pool starts its drivers in the constructor
+        pool = await self.__loop__.run_in_executor(None, self.__make_pool__)
+        # Every slot can be launching a driver for a caller while other callers release and close sessions
+        self.__executor__ = ThreadPoolExecutor(max_workers=pool.pool_size + pool.launch_concurrency,
+                                               thread_name_prefix='async-{}-pool'.format(pool.browser_name.lower()))
+        pool.add_free_session_listener(self.__notify_threadsafe__)
+        self.pool = pool
+        if self.__is_closed__:
+            await self.__run__(pool.close_pool)
+            self.__check_pool_ran__()
+
+    def __make_pool__(self) -> DriverPool:
+        return DriverPool(self.browsers, **self.options)
+
+    def __can_checkout__(self):
+        # One free session lets one caller through, callers let through before count as served.
+        # Callers of closed pool are let through to fail, e.g. pool closed by the exit handler
+        if self.__is_closed__ or not self.pool.__is_pool_ran__:
+            return True
+        return self.pool.__count_free__() > self.__checking_out__
+
+    def __check_pool_ran__(self):
+        if self.__is_closed__:
+            raise BrowserPoolGeneralException('{} browser pool is closed.'.format(self.pool.browser_name))
+
+    def __notify__(self):
+        # Head of the queue checks whether it can be served now, it passes the notification on when it is served
+        if self.__waiters__:
+            self.__waiters__.notify()
+
+    def __notify_threadsafe__(self):
+        try:
+            self.__loop__.call_soon_threadsafe(self.__notify__)
+        except RuntimeError:
+            # Event loop is closed, there are no coroutines to wake up
+            pass
+
+    def __release_abandoned__(self, checkout: asyncio.Future):
+        if checkout.cancelled() or checkout.exception() is not None:
+            return
+        try:
+            self.__executor__.submit(self.pool.release_session, checkout.result().session_id)
+        except RuntimeError:
+            # Executor is shut down, closed pool quits the session
+            logging.info('Session {} given out after its caller was cancelled is left to the closed pool.'
+                         .format(str(checkout.result().session_id)))
+
+    def __run__(self, func, *args) -> asyncio.Future:
+        return self.__loop__.run_in_executor(self.__executor__, functools.partial(func, *args))
@@ -0,0 +1,26 @@
+from typing import Callable
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from src.browser_pool.async_driver_pool import AsyncDriverPool
+from src.browser_pool.browser_spec import BrowserSpec
+from src.config.webdriver_config import FirefoxConfiguration
+from src.provider.webdriver_provider import provide_firefox_driver
+
+
+class AsyncFirefoxDriverPool(AsyncDriverPool):
+    """Asyncio adapter of FirefoxDriverPool, other options of FirefoxDriverPool are passed by name."""
+
+    def __init__(self,
+                 pool_size: int = 0,
+                 lazy_pool: bool = True,
+                 ff_config: FirefoxConfiguration = FirefoxConfiguration(),
+                 driver_provider: Callable[[FirefoxConfiguration], WebDriver] = provide_firefox_driver,
+                 **options):
+        self.ff_config = ff_config
+        # Starts driver for the configuration, can be replaced e.g. by FakeDriverProvider to run without browser
+        self.driver_provider = driver_provider
+        super().__init__(browsers=[BrowserSpec.firefox(ff_config, driver_provider)],
+                         pool_size=pool_size,
+                         lazy_pool=lazy_pool,
+                         **options)
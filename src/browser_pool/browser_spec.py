@@ -0,0 +1,61 @@
+from typing import Callable, Iterable, Type
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from src.config.webdriver_config import ChromeConfiguration, ChromeSession, DriverSession, FirefoxConfiguration, \
+    FirefoxSession
+from src.provider.shared_service_provider import SharedChromeServiceProvider, SharedFirefoxServiceProvider
+from src.provider.webdriver_provider import provide_chrome_driver, provide_firefox_driver
+
+
+class BrowserSpec:
+    """Browser which DriverPool starts sessions of: its configuration, driver provider and session class.
+    Callers of get_session are routed to sessions of the spec by its name and tags.
+    `default_provider` starts local drivers, only such specs need executable path and can use shared services."""
+
+    def __init__(self,
+                 name: str,
+                 config,
+                 driver_provider: Callable[[object], WebDriver],
+                 browser_name: str,
+                 session_class: Type[DriverSession] = DriverSession,
+                 default_provider: Callable[[object], WebDriver] = None,
+                 make_shared_provider: Callable[[int], Callable[[object], WebDriver]] = None,
+                 tags: Iterable[str] = None):
+        self.name = name
+        self.config = config
+        self.driver_provider = driver_provider
+        self.browser_name = browser_name
+        self.session_class = session_class
+        self.default_provider = default_provider
+        self.make_shared_provider = make_shared_provider
+        self.tags = frozenset(tags or ())
+
+    @classmethod
+    def chrome(cls,
+               config: ChromeConfiguration = None,
+               driver_provider: Callable[[ChromeConfiguration], WebDriver] = provide_chrome_driver,
+               name: str = 'chrome',
+               tags: Iterable[str] = None):
+        return cls(name, config or ChromeConfiguration(), driver_provider, 'Chrome', ChromeSession,
+                   default_provider=provide_chrome_driver,
+                   make_shared_provider=lambda count: SharedChromeServiceProvider(service_count=count),
+                   tags=tags)
+
+    @classmethod
+    def firefox(cls,
+                config: FirefoxConfiguration = None,
+                driver_provider: Callable[[FirefoxConfiguration], WebDriver] = provide_firefox_driver,
+                name: str = 'firefox',
+                tags: Iterable[str] = None):
+        return cls(name, config or FirefoxConfiguration(), driver_provider, 'Firefox', FirefoxSession,
+                   default_provider=provide_firefox_driver,
+                   make_shared_provider=lambda count: SharedFirefoxServiceProvider(service_count=count),
+                   tags=tags)
+
+    @property
+    def is_default_provider(self) -> bool:
+        return self.default_provider is not None and self.driver_provider is self.default_provider
+
+    def matches(self, browser: str = None, tags: Iterable[str] = None) -> bool:
+        return (browser is None or browser == self.name) and self.tags.issuperset(tags or ())
@@ -0,0 +1,175 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, List
+
+
+class Waiter:
+    """Thread waiting in the checkout queue with the condition it is served on."""
+
+    def __init__(self, condition: threading.Condition, predicate: Callable[[], bool], priority: float):
+        self.condition = condition
+        self.predicate = predicate
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+
+
+class CheckoutQueue:
+    """FIFO queue of threads waiting for a free session in the pool.
+    Only the longest waiting thread is woken up, so a returned session does not wake every waiter.
+    All methods should be called while holding the lock passed to the queue."""
+
+    def __init__(self, lock: threading.RLock):
+        self.__lock__ = lock
+        self.__waiters__: Deque[Waiter] = deque()
+        # Called on every notification, e.g. to wake callers which wait outside the queue on an event loop
+        self.__listeners__: List[Callable[[], None]] = list()
+
+    def __len__(self):
+        return len(self.__waiters__)
+
+    def add_listener(self, listener: Callable[[], None]):
+        self.__listeners__.append(listener)
+
+    def remove_listener(self, listener: Callable[[], None]):
+        self.__listeners__.remove(listener)
+
+    def notify(self):
+        waiter = self.__next_waiter__()
+        if waiter:
+            waiter.condition.notify()
+        for listener in self.__listeners__:
+            listener()
+
+    def notify_all(self):
+        for waiter in self.__waiters__:
+            waiter.condition.notify()
+        for listener in self.__listeners__:
+            listener()
+
+    def wait_for(self, predicate: Callable[[], bool], timeout: float = None, priority: float = 0) -> bool:
+        # Caller is served when predicate is true and there are no callers to be served before it
+        if not self.__waiters__ and predicate():
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waiter = Waiter(threading.Condition(self.__lock__), predicate, priority)
+        self.__waiters__.append(waiter)
+        try:
+            while self.__next_waiter__() is not waiter:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                waiter.condition.wait(remaining)
+            return True
+        finally:
+            self.__waiters__.remove(waiter)
+            # Next waiter in line could be served now
+            self.notify()
+
+    def __next_waiter__(self) -> Waiter:
+        # Waiter which can be served now, None when the longest waiting one cannot
+        if self.__waiters__ and self.__waiters__[0].predicate():
+            return self.__waiters__[0]
+        return None
+
+
+class PriorityCheckoutQueue(CheckoutQueue):
+    """Queue of threads waiting for a free session, served by priority instead of arrival order.
+    Waiters gain `aging` priority per second of waiting, so low priority callers are served eventually.
+    Waiters have own predicates, e.g. caller whose class may not take sessions reserved for other classes
+    does not hold back callers which may."""
+
+    def __init__(self, lock: threading.RLock, aging: float):
+        super().__init__(lock)
+        self.aging = aging
+
+    def __next_waiter__(self) -> Waiter:
+        now = time.monotonic()
+        best, best_rank = None, None
+        # Waiters are in arrival order, so of waiters with the same rank the longest waiting one is served
+        for waiter in self.__waiters__:
+            rank = waiter.priority + self.aging * (now - waiter.enqueued_at)
+            if (best is None or rank > best_rank) and waiter.predicate():
+                best, best_rank = waiter, rank
+        return best
+
+
+class AsyncWaiter:
+    """Coroutine waiting in the asyncio checkout queue, it is woken up by the result of its future."""
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        # Waiter which was served, timed out or cancelled stays in the queue until it reaches the head
+        self.is_done = False
+
+
+class AsyncCheckoutQueue:
+    """FIFO queue of coroutines waiting for a free session in the asyncio pool.
+    Every waiter waits on own future and only the longest waiting one is woken up,
+    so a returned session does not wake every waiter.
+    All methods should be called while holding the lock passed to the queue."""
+
+    def __init__(self, lock: asyncio.Lock):
+        self.__lock__ = lock
+        self.__waiters__: Deque[AsyncWaiter] = deque()
+        # Waiters which are not done, done ones are dropped when they reach the head
+        self.__count__ = 0
+
+    def __len__(self):
+        return self.__count__
+
+    def notify(self):
+        waiter = self.__head__()
+        if waiter and not waiter.future.done():
+            waiter.future.set_result(True)
+
+    def notify_all(self):
+        for waiter in self.__waiters__:
+            if not waiter.is_done and not waiter.future.done():
+                waiter.future.set_result(True)
+
+    async def wait_for(self, predicate: Callable[[], bool], timeout: float = None) -> bool:
+        # Caller is served when predicate is true and there are no callers waiting longer
+        if not self.__count__ and predicate():
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        loop = asyncio.get_running_loop()
+        waiter = AsyncWaiter(loop.create_future())
+        self.__waiters__.append(waiter)
+        self.__count__ += 1
+        try:
+            while not (self.__head__() is waiter and predicate()):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                if waiter.future.done():
+                    waiter.future = loop.create_future()
+                await self.__wait__(waiter.future, remaining)
+            return True
+        finally:
+            waiter.is_done = True
+            self.__count__ -= 1
+            # Next waiter in line could be served now
+            self.notify()
+
+    async def __wait__(self, future: asyncio.Future, timeout: float):
+        self.__lock__.release()
+        try:
+            await asyncio.wait([future], timeout=timeout)
+        finally:
+            # Lock is taken back even when the waiting coroutine is cancelled, the caller releases it on exit
+            is_cancelled = False
+            while True:
+                try:
+                    await self.__lock__.acquire()
+                    break
+                except asyncio.CancelledError:
+                    is_cancelled = True
+            if is_cancelled:
+                raise asyncio.CancelledError()
+
+    def __head__(self) -> AsyncWaiter:
+        while self.__waiters__ and self.__waiters__[0].is_done:
+            self.__waiters__.popleft()
+        return self.__waiters__[0] if self.__waiters__ else None
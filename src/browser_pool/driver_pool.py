@@ -0,0 +1,932 @@
+import logging
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterable, Iterator, List
+
+from selenium.common.exceptions import WebDriverException
+
+from src.browser_pool.admission_controller import AdmissionController
+from src.browser_pool.browser_spec import BrowserSpec
+from src.browser_pool.checkout_queue import CheckoutQueue, PriorityCheckoutQueue
+from src.browser_pool.exit_handler import register_pool, unregister_pool
+from src.browser_pool.health_prober import HealthProber
+from src.browser_pool.idle_sessions import IdleSessions
+from src.browser_pool.lease import Lease
+from src.browser_pool.pool_maintainer import PoolMaintainer
+from src.browser_pool.priority_class import DEFAULT_PRIORITY_AGING, DEFAULT_PRIORITY_CLASS, PriorityClass
+from src.browser_pool.proxy_selector import LEAST_USED, ROUND_ROBIN, ProxySelector
+from src.browser_pool.task_runner import TaskResult, TaskRunner
+from src.browser_pool.session_launcher import SessionLauncher
+from src.browser_pool.session_reaper import SessionReaper
+from src.config.profile_template import ProfileTemplate
+from src.config.webdriver_config import DriverSession
+from src.exception.BrowserPoolGeneralException import BrowserPoolGeneralException
+from src.exception.InvalidOrMissingConfigurationException import InvalidOrMissingConfigurationException
+from src.metrics.pool_metrics import ADMISSION_TIMEOUTS, CHECKOUT_WAIT_SECONDS, EVICTIONS, EXHAUSTED, FORCE_KILLS, \
+    LAUNCH_FAILURES, LAUNCH_SECONDS, QUIT_SECONDS, RECYCLES, WARM_UP_FAILURES, WARM_UP_SECONDS, PoolMetrics, \
+    render_prometheus
+from src.util.process_utils import get_process_tree_rss
+from src.util.webdriver_utils import DRAINING, LEASE_EXPIRED, MAX_AGE, MAX_RSS, MAX_USES, NO_FULL_RESET, \
+    can_reset_driver_state, get_driver_root_pid, is_driver_draining, kill_driver_processes, reset_driver_state
+
+DEFAULT_LAUNCH_CONCURRENCY = 4
+DEFAULT_HEALTH_CHECK_INTERVAL = 60
+DEFAULT_HEALTH_CHECK_TIMEOUT = 5
+DEFAULT_CLOSE_TIMEOUT = 30
+LEASE_CHECK_INTERVAL = 1
+# Number of reclaimed leases kept for the lease report
+RECLAIMED_LEASES_KEPT = 100
+# Quit mostly waits for the browser, so more sessions are quit at once than launched
+CLOSE_CONCURRENCY = 32
+DEFAULT_REBALANCE_INTERVAL = 10
+# Number of recent checkouts by browser which idle sessions of pool of several browsers are split by
+DEMAND_WINDOW = 100
+MIXED_POOL_NAME = 'Mixed'
+
+
+class DriverPool:
+    """Pool of browser sessions of one or several browsers under one pool size.
+    get_session routes callers by browser name and tags to matching idle sessions or starts a session
+    of the first matching browser. Idle sessions which the pool keeps are split between browsers
+    by their share of recent checkouts and idle sessions of browsers over their share are replaced
+    every `rebalance_interval` seconds."""
+
+    def __init__(self,
+                 browsers: List[BrowserSpec],
+                 pool_size: int = 0,
+                 lazy_pool: bool = True,
+                 launch_concurrency: int = DEFAULT_LAUNCH_CONCURRENCY,
+                 min_ready: int = None,
+                 max_session_uses: int = None,
+                 min_idle: int = None,
+                 max_size: int = None,
+                 idle_ttl: float = None,
+                 health_check_on_checkout: bool = True,
+                 health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL,
+                 health_check_timeout: float = DEFAULT_HEALTH_CHECK_TIMEOUT,
+                 shared_services: int = None,
+                 max_session_rss: int = None,
+                 max_session_age: float = None,
+                 admission_controller: AdmissionController = None,
+                 profile_template: ProfileTemplate = None,
+                 proxies: List[str] = None,
+                 proxy_selection: str = ROUND_ROBIN,
+                 close_timeout: float = DEFAULT_CLOSE_TIMEOUT,
+                 close_on_exit: bool = True,
+                 warm_up: Callable[[DriverSession], None] = None,
+                 max_lease_time: float = None,
+                 priority_classes: List[PriorityClass] = None,
+                 priority_aging: float = DEFAULT_PRIORITY_AGING,
+                 rebalance_interval: float = DEFAULT_REBALANCE_INTERVAL,
+                 require_full_reset: bool = False):
+        # Sessions given out by get_session by their id and idle sessions ready to be given out
+        self.__pool__: Dict[uuid.UUID, DriverSession] = dict()
+        self.__preallocated_pool__ = IdleSessions()
+        # max_size can be passed instead of pool_size, it reads better for elastic lazy pool
+        self.pool_size = pool_size if max_size is None else max_size
+        self.lazy_pool = lazy_pool
+        # Browsers the pool starts sessions of, sessions of all browsers count against pool size
+        self.browsers = browsers
+        self.browser_name = browsers[0].browser_name if len(browsers) == 1 else MIXED_POOL_NAME
+        self.launch_concurrency = launch_concurrency
+        # When not lazy pool, constructor returns once min_ready sessions started, the rest start in background
+        self.min_ready = self.pool_size if min_ready is None else min_ready
+        # Released session is quit instead of reused when it was used max_session_uses times
+        self.max_session_uses = max_session_uses
+        # Released session is reset by CDP for all visited origins, browsers without CDP, e.g. Firefox, reset
+        # the current origin only. With require_full_reset sessions of such browsers are quit on release instead
+        self.require_full_reset = require_full_reset
+        # Lazy pool keeps min_idle started sessions in reserve and quits ones idle longer than idle_ttl seconds
+        self.min_idle = min_idle
+        self.idle_ttl = idle_ttl
+        # Dead sessions are evicted when they are taken from idle sessions and by periodic check of idle sessions
+        self.health_check_on_checkout = health_check_on_checkout
+        self.health_check_interval = health_check_interval
+        # Driver which does not answer the check within health_check_timeout seconds is evicted as unresponsive
+        self.health_check_timeout = health_check_timeout
+        # Sessions are created on this number of long living driver services instead of a service per session
+        self.shared_services = shared_services
+        # Released session is quit instead of reused when its processes use more than max_session_rss bytes
+        # of resident memory or it was started more than max_session_age seconds ago
+        self.max_session_rss = max_session_rss
+        self.max_session_age = max_session_age
+        # Drivers are started only when the controller admits the launch, e.g. host has memory for one more browser
+        self.admission_controller = admission_controller
+        # Every session gets own clone of the template profile, the clone is removed when session is quit
+        self.profile_template = profile_template
+        # Sessions requested without proxy are started behind one of proxies picked by proxy_selection
+        self.proxies = proxies
+        self.proxy_selection = proxy_selection
+        # close_pool quits sessions within close_timeout seconds and kills processes of the rest,
+        # pool not closed until the process exits or gets a handled signal is closed then
+        self.close_timeout = close_timeout
+        self.close_on_exit = close_on_exit
+        # Called with every started session and every reset released session before it becomes idle,
+        # e.g. SessionStateCache which logs in once and replays cookies, session is quit when it fails
+        self.warm_up = warm_up
+        # Sessions given out longer than max_lease_time seconds (or max_hold of the checkout) are reclaimed and quit,
+        # so sessions leaked by faulty tasks do not starve the pool
+        self.max_lease_time = max_lease_time
+        # Waiting callers are served by priority of their class, callers of a class gain priority_aging per second
+        # of waiting, and sessions reserved for a class are not given to other classes
+        self.priority_classes = priority_classes
+        self.priority_aging = priority_aging
+        self.rebalance_interval = rebalance_interval
+        # Number of evicted sessions by reason
+        self.evictions: Counter = Counter()
+        # Number of sessions quit on release by reason
+        self.recycles: Counter = Counter()
+        # Launch, quit and checkout latencies and failures, observers can be added by metrics.add_observer
+        self.metrics = PoolMetrics(browser_name=self.browser_name)
+        self.__is_pool_ran__ = True
+        # Guards pool lists, waiters are notified when session is returned or started
+        self.__lock__ = threading.RLock()
+        self.__waiters__ = PriorityCheckoutQueue(self.__lock__, self.priority_aging) if self.priority_classes \
+            else CheckoutQueue(self.__lock__)
+        # Sessions started for get_session callers and sessions started in background to become idle
+        self.__launching__ = 0
+        self.__replenishing__ = 0
+        # Released sessions which are reset in background and number of finished resets
+        self.__resetting__ = 0
+        self.__resets__ = 0
+        # Sessions started for get_session callers by proxy, so least used proxy selection counts them too
+        self.__launching_proxies__: Counter = Counter()
+        self.__launching_priorities__: Counter = Counter()
+        # Leases reclaimed by the watchdog with stacks of their checkouts, the oldest are dropped
+        self.__reclaimed_leases__: Deque[dict] = deque(maxlen=RECLAIMED_LEASES_KEPT)
+        # Called with every reclaimed session, e.g. by the pool daemon to forget leases of its clients
+        self.__reclaim_listeners__: List[Callable[[DriverSession], None]] = list()
+        # Browsers of the last checkouts and of sessions started in background by browser
+        self.__demand__: Deque[str] = deque(maxlen=DEMAND_WINDOW)
+        self.__replenishing_browsers__: Counter = Counter()
+
+        self.__validate_config__()
+        self.__priority_classes__: Dict[str, PriorityClass] = {x.name: x for x in self.priority_classes or list()}
+        self.__proxy_selector__ = ProxySelector(self.proxies, self.proxy_selection) if self.proxies else None
+        self.__browser_names__ = [x.name for x in self.browsers]
+        # Driver providers by browser, browsers with default provider start sessions on shared services
+        self.__providers__: Dict[str, Callable] = {x.name: x.driver_provider for x in self.browsers}
+        self.__service_providers__ = list()
+        if self.shared_services:
+            for browser in self.browsers:
+                self.__providers__[browser.name] = browser.make_shared_provider(self.shared_services)
+                self.__service_providers__.append(self.__providers__[browser.name])
+        self.__launcher__ = SessionLauncher(make_session=self.__launch_session__,
+                                            quit_session=self.__quit_session__,
+                                            concurrency=self.launch_concurrency,
+                                            browser_name=self.browser_name)
+        self.__prober__ = HealthProber(timeout=self.health_check_timeout, browser_name=self.browser_name)
+        self.__reaper__ = SessionReaper(quit_session=self.__quit_session__,
+                                        kill_session=self.__kill_session__,
+                                        concurrency=CLOSE_CONCURRENCY,
+                                        browser_name=self.browser_name)
+        # Closed sessions of not lazy pool and idle reserve of lazy pool are replenished in background,
+        # so close_driver and get_session do not wait for a launch
+        self.__maintainer__ = PoolMaintainer(deficit=self.__replenish_deficit__,
+                                             launch=self.__replenish__,
+                                             browser_name=self.browser_name)
+        if self.idle_ttl:
+            self.__maintainer__.schedule(self.__close_expired_idle_drivers__, self.idle_ttl / 2)
+        if self.health_check_interval:
+            self.__maintainer__.schedule(self.__evict_dead_idle_drivers__, self.health_check_interval)
+        # Leases are checked only when sessions can be reclaimed, max_hold of a checkout starts the checks too
+        self.__is_lease_watched__ = False
+        if self.max_lease_time:
+            self.__watch_leases__(self.max_lease_time)
+        if len(self.browsers) > 1 and self.rebalance_interval and (not self.lazy_pool or self.min_idle):
+            self.__maintainer__.schedule(self.__rebalance_idle_sessions__, self.rebalance_interval)
+
+        if self.close_on_exit:
+            register_pool(self)
+        if not self.lazy_pool:
+            self.__fill_pool__()
+        self.__maintainer__.start()
+
+    def get_session(self,
+                    timeout: float = 0,
+                    proxy: str = None,
+                    max_hold: float = None,
+                    priority: str = None,
+                    browser: str = None,
+                    tags: Iterable[str] = None) -> DriverSession:
+        # Waits up to timeout seconds for a free session, None means wait until one is free
+        # Session behind proxy is reused when there is one idle, otherwise it is started
+        # Session held longer than max_hold seconds (max_lease_time by default) is reclaimed by the pool
+        # Caller of priority class is served before waiting callers of lower priority
+        # Session is of the named browser which has all the tags, any browser of the pool by default
+        return self.__get_session__(time.monotonic(), lambda: traceback.extract_stack()[:-3], timeout, proxy, max_hold,
+                                    priority, browser, tags)
+
+    def __get_session__(self,
+                        started: float,
+                        get_stack: Callable[[], traceback.StackSummary],
+                        timeout: float,
+                        proxy: str,
+                        max_hold: float,
+                        priority: str,
+                        browser: str,
+                        tags: Iterable[str]) -> DriverSession:
+        # Checkout wait is measured from `started` and lease is reported with the stack of the caller,
+        # asyncio pool checks out on executor threads after its callers waited on the event loop
+        browsers = self.__get_matching_browsers__(browser, tags)
+        session = self.__checkout__(timeout, proxy, self.__get_priority_class__(priority), browsers)
+        session.leased_at = time.monotonic()
+        if len(self.browsers) > 1:
+            with self.__lock__:
+                self.__demand__.append(session.browser)
+        self.metrics.observe(CHECKOUT_WAIT_SECONDS, session.leased_at - started)
+        max_hold = self.max_lease_time if max_hold is None else max_hold
+        if max_hold:
+            if not self.__is_lease_watched__:
+                self.__watch_leases__(max_hold)
+            session.lease_expires_at = session.leased_at + max_hold
+            # Stack is taken only for sessions which can be reclaimed, it costs more than the checkout
+            session.lease_stack = get_stack()
+        return session
+
+    def lease(self, timeout: float = 0, proxy: str = None, max_hold: float = None, priority: str = None,
+              browser: str = None, tags: Iterable[str] = None) -> Lease:
+        return Lease(self, self.get_session(timeout, proxy, max_hold, priority, browser, tags))
+
+    @contextmanager
+    def session(self, timeout: float = 0, proxy: str = None, max_hold: float = None, priority: str = None,
+                browser: str = None, tags: Iterable[str] = None):
+        # Session is released back to the pool on exit, driver which failed is closed
+        with self.lease(timeout, proxy, max_hold, priority, browser, tags) as session:
+            yield session
+
+    def add_reclaim_listener(self, listener: Callable[[DriverSession], None]):
+        self.__reclaim_listeners__.append(listener)
+
+    def remove_reclaim_listener(self, listener: Callable[[DriverSession], None]):
+        self.__reclaim_listeners__.remove(listener)
+
+    def add_free_session_listener(self, listener: Callable[[], None]):
+        # Listener is called under the pool lock whenever a session may have become free for waiting callers,
+        # e.g. it was released, closed or started, so it should not block
+        with self.__lock__:
+            self.__waiters__.add_listener(listener)
+
+    def remove_free_session_listener(self, listener: Callable[[], None]):
+        with self.__lock__:
+            self.__waiters__.remove_listener(listener)
+
+    def get_lease_report(self) -> dict:
+        # Sessions given out with seconds they are held and stacks where reclaimable ones were taken,
+        # and the last reclaimed leases
+        now = time.monotonic()
+        with self.__lock__:
+            active = [{'session_id': str(x.session_id),
+                       'held_seconds': now - x.leased_at if x.leased_at is not None else None,
+                       'acquired_at': ''.join(traceback.format_list(x.lease_stack)) if x.lease_stack else None}
+                      for x in self.__pool__.values() if not x.is_released]
+            return {'active': active, 'reclaimed': list(self.__reclaimed_leases__)}
+
+    def get_metrics(self) -> dict:
+        with self.__lock__:
+            gauges = {'active_sessions': len(self.__pool__),
+                      'idle_sessions': len(self.__preallocated_pool__),
+                      'launching_sessions': self.__launching__ + self.__replenishing__,
+                      'waiting_callers': len(self.__waiters__)}
+            if len(self.browsers) > 1:
+                active = Counter(x.browser for x in self.__pool__.values())
+                idle = self.__preallocated_pool__.count_by_browser()
+                for browser in self.browsers:
+                    gauges['active_sessions_' + browser.name] = active[browser.name]
+                    gauges['idle_sessions_' + browser.name] = idle[browser.name]
+            return self.metrics.snapshot(gauges, {EVICTIONS: self.evictions, RECYCLES: self.recycles})
+
+    def get_sessions_rss(self) -> Dict[uuid.UUID, int]:
+        # Resident memory in bytes of driver service, browser and renderer processes of every session,
+        # None when processes of the session cannot be found, e.g. remote driver or not Linux
+        with self.__lock__:
+            sessions = list(self.__pool__.values()) + list(self.__preallocated_pool__)
+        return {x.session_id: self.__measure_rss__(x) for x in sessions}
+
+    def get_prometheus_metrics(self) -> str:
+        return render_prometheus(self.get_metrics())
+
+    def __checkout__(self,
+                     timeout: float,
+                     proxy: str,
+                     priority_class: PriorityClass = None,
+                     browsers: List[BrowserSpec] = None) -> DriverSession:
+        browsers = browsers or self.browsers
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # Caller without proxy gets an idle session behind any proxy, proxy is selected only for a new session
+        is_proxy_selected = proxy is None and self.__proxy_selector__ is not None
+        priority = priority_class.name if priority_class else None
+        waiting_priority = priority_class.priority if priority_class else 0
+        can_checkout = self.__can_checkout__
+        if priority_class:
+            def can_checkout():
+                return self.__can_checkout__() and self.__leaves_reserved_sessions__(priority_class)
+        while True:
+            stale_session = None
+            with self.__lock__:
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+                is_free = self.__waiters__.wait_for(can_checkout, remaining, waiting_priority)
+                if not is_free and self.__resetting__:
+                    # Released sessions are reset in background, caller waits for resets in progress to finish
+                    # as if release_session returned after the reset, but not for sessions released later
+                    resets = self.__resets__ + self.__resetting__
+                    self.__waiters__.wait_for(lambda: can_checkout() or self.__resets__ >= resets, None,
+                                              waiting_priority)
+                    is_free = can_checkout()
+                if not is_free:
+                    self.metrics.increment(EXHAUSTED)
+                    raise BrowserPoolGeneralException('Reached limit of drivers in {} browser pool.'
+                                                      .format(self.browser_name))
+                self.__check_pool_ran__()
+                # When not lazy pool session should be got from preallocated_pool and moved to pool
+                # Lazy pool reuses released sessions before starting new ones
+                if len(self.__preallocated_pool__) == 0:
+                    session = None
+                elif is_proxy_selected:
+                    session = self.__get_preallocated_proxied_driver__(browsers)
+                else:
+                    session = self.__get_preallocated_driver__(proxy, browsers)
+                if session is None:
+                    if not self.lazy_pool or self.__size__() >= self.pool_size:
+                        # Pool is full and there is no idle session of the browser behind the proxy,
+                        # idle session which was not used for the longest time gives its slot
+                        stale_session = self.__preallocated_pool__.pop_oldest()
+                    if is_proxy_selected:
+                        proxy = self.__proxy_selector__.select(self.__proxy_usage__)
+                    self.__launching__ += 1
+                    self.__launching_proxies__[proxy] += 1
+                    self.__launching_priorities__[priority] += 1
+                else:
+                    session.priority = priority
+            if stale_session:
+                self.__reaper__.quit_later(stale_session)
+            # When lazy pool, session instance will be created just on get_session method call and add to pool
+            if session is None:
+                return self.__get_new_driver__(None if deadline is None else max(deadline - time.monotonic(), 0), proxy,
+                                               priority, browsers[0])
+            if not self.health_check_on_checkout:
+                return session
+            # Session is already moved to pool, so it is probed without holding the pool lock
+            reason = self.__prober__.check(session.driver)
+            if reason is None:
+                return session
+            self.__evict_session__(session, reason)
+
+    def map(self,
+            fn: Callable[[DriverSession, object], object],
+            items: Iterable,
+            concurrency: int = None,
+            timeout: float = None,
+            retries: int = 0) -> Iterator[TaskResult]:
+        # Yields result of fn(session, item) for every item in completion order, by default pool_size tasks run at once
+        return TaskRunner(self, fn, concurrency or self.pool_size, timeout, retries).run(items)
+
+    def close_driver(self, session_id: uuid):
+        with self.__lock__:
+            session = self.__pool__.pop(session_id, None)
+            self.__waiters__.notify()
+        if not session:
+            logging.warning('Session {} already closed or it was not started.'.format(str(session_id)))
+            return
+        # Caller does not wait for the quit, its slot is free at once and the maintainer starts a replacement
+        self.__reaper__.quit_later(session)
+        self.__maintainer__.wake()
+        logging.info('Driver {} closed successful.'.format(str(session_id)))
+
+    def release_session(self, session_id: uuid):
+        with self.__lock__:
+            session = self.__pool__.get(session_id)
+            if session and session.is_released:
+                session = None
+            elif session:
+                session.is_released = True
+                # Lease ends with the release, so the session is not reclaimed while it is reset
+                session.leased_at = session.lease_expires_at = session.lease_stack = None
+                self.__resetting__ += 1
+        if not session:
+            logging.warning('Session {} already released or it was not started.'.format(str(session_id)))
+            return
+        # Caller does not wait for the reset and warm-up, session stays in pool while they run on a launcher thread,
+        # so its slot cannot be taken by a new driver. Launcher is shut down when pool is closed, close_pool quits it
+        if not self.__launcher__.submit(lambda: self.__reset_released_session__(session)):
+            self.__end_reset__()
+
+    def __reset_released_session__(self, session: DriverSession):
+        try:
+            self.__return_released_session__(session)
+        finally:
+            self.__end_reset__()
+
+    def __end_reset__(self):
+        with self.__lock__:
+            self.__resetting__ -= 1
+            self.__resets__ += 1
+            # Callers which wait for the reset are woken up, the session is idle or closed now
+            self.__waiters__.notify()
+
+    def __return_released_session__(self, session: DriverSession):
+        session_id = session.session_id
+        session.uses += 1
+        reason = self.__get_recycle_reason__(session)
+        if reason:
+            with self.__lock__:
+                self.recycles[reason] += 1
+            self.metrics.notify(RECYCLES, 1)
+            logging.info('Driver {} is recycled: {}.'.format(str(session_id), reason))
+            self.close_driver(session_id)
+            return
+        try:
+            reset_driver_state(session.driver)
+        except WebDriverException as ex:
+            logging.warning('Failed to reset session {}, it will be closed: {}'.format(str(session_id), ex))
+            self.close_driver(session_id)
+            return
+        if self.warm_up and not self.__warm_up_session__(session):
+            self.close_driver(session_id)
+            return
+        with self.__lock__:
+            if self.__pool__.get(session_id) is not session:
+                # Session was closed while it was reset
+                return
+            del self.__pool__[session_id]
+            session.is_released = False
+            session.priority = None
+            if self.__is_pool_ran__:
+                session.idle_since = time.monotonic()
+                self.__preallocated_pool__.append(session)
+                self.__waiters__.notify()
+                return
+        self.__reaper__.quit_later(session)
+
+    def __close_preallocated_drivers__(self):
+        with self.__lock__:
+            sessions = list(self.__preallocated_pool__)
+            self.__preallocated_pool__.clear()
+        for session in sessions:
+            self.__quit_session__(session)
+
+    def close_pool(self, timeout: float = None):
+        # Sessions are quit concurrently, processes of sessions which did not quit within timeout seconds
+        # (close_timeout by default) are killed
+        timeout = self.close_timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining():
+            return None if deadline is None else max(deadline - time.monotonic(), 0)
+        with self.__lock__:
+            self.__is_pool_ran__ = False
+            # Waiting callers are woken up to fail instead of waiting for sessions which will not return
+            self.__waiters__.notify_all()
+        unregister_pool(self)
+        self.__maintainer__.stop(remaining())
+        self.__launcher__.shutdown(remaining())
+        self.__prober__.shutdown()
+        with self.__lock__:
+            sessions = list(self.__pool__.values()) + list(self.__preallocated_pool__)
+            self.__pool__.clear()
+            self.__preallocated_pool__.clear()
+        self.__reaper__.reap(sessions, remaining())
+        self.__stop_service_providers__()
+
+    def __can_checkout__(self):
+        if not self.__is_pool_ran__:
+            return True
+        if len(self.__preallocated_pool__) > 0:
+            return True
+        if not self.lazy_pool:
+            return False
+        return self.__size__() < self.pool_size
+
+    def __count_free__(self):
+        # Sessions which get_session could give out without waiting, read without the lock as a hint only
+        free = len(self.__preallocated_pool__)
+        if self.lazy_pool:
+            free += max(self.pool_size - self.__size__(), 0)
+        return free
+
+    def __size__(self):
+        return len(self.__pool__) + len(self.__preallocated_pool__) + self.__launching__ + self.__replenishing__
+
+    def __check_pool_ran__(self):
+        if not self.__is_pool_ran__:
+            raise BrowserPoolGeneralException('{} browser pool is closed.'.format(self.browser_name))
+
+    def __get_new_driver__(self, timeout: float, proxy: str, priority: str = None, browser: BrowserSpec = None):
+        # Slot is reserved by get_session, browser is started without holding the pool lock
+        try:
+            session = self.__make_new_session__(timeout, proxy, browser or self.browsers[0])
+        except Exception:
+            with self.__lock__:
+                self.__launching__ -= 1
+                self.__launching_proxies__[proxy] -= 1
+                self.__launching_priorities__[priority] -= 1
+                self.__waiters__.notify()
+            raise
+        with self.__lock__:
+            self.__launching__ -= 1
+            self.__launching_proxies__[proxy] -= 1
+            self.__launching_priorities__[priority] -= 1
+            session.priority = priority
+            is_pool_ran = self.__is_pool_ran__
+            if is_pool_ran:
+                self.__pool__[session.session_id] = session
+        if not is_pool_ran:
+            self.__quit_session__(session)
+            self.__check_pool_ran__()
+        return session
+
+    def __get_preallocated_driver__(self, proxy: str, browsers: List[BrowserSpec] = None):
+        # The most recently used session of the browsers behind the proxy is taken,
+        # sessions of pool of one browser without proxies always match
+        session = self.__preallocated_pool__.pop(proxy, self.__get_browser_names__(browsers))
+        if session is None:
+            return None
+        return self.__take_preallocated_driver__(session)
+
+    def __get_preallocated_proxied_driver__(self, browsers: List[BrowserSpec] = None):
+        # Idle session behind any proxy is taken: the most recently used one, or by least used selection
+        # the one whose proxy has the fewest sessions in use
+        candidates = self.__preallocated_pool__.latest(self.__get_browser_names__(browsers))
+        if not candidates:
+            return None
+        if self.__proxy_selector__.policy == LEAST_USED:
+            in_use = Counter(x.proxy for x in self.__pool__.values())
+            in_use.update(self.__launching_proxies__)
+            session = min(candidates, key=lambda x: (in_use[x.proxy], -x.idle_since))
+        else:
+            session = max(candidates, key=lambda x: x.idle_since)
+        self.__preallocated_pool__.remove(session)
+        return self.__take_preallocated_driver__(session)
+
+    def __get_browser_names__(self, browsers: List[BrowserSpec] = None) -> List[str]:
+        return self.__browser_names__ if browsers is None or browsers is self.browsers else [x.name for x in browsers]
+
+    def __take_preallocated_driver__(self, session: DriverSession) -> DriverSession:
+        self.__pool__[session.session_id] = session
+        if self.min_idle:
+            self.__maintainer__.wake()
+        return session
+
+    def __add_preallocated_session__(self, session: DriverSession):
+        with self.__lock__:
+            self.__replenishing__ -= 1
+            self.__replenishing_browsers__[session.browser] -= 1
+            if self.__is_pool_ran__:
+                session.idle_since = time.monotonic()
+                self.__preallocated_pool__.append(session)
+                self.__waiters__.notify()
+                return
+        self.__quit_session__(session)
+
+    def __fill_pool__(self):
+        with self.__lock__:
+            self.__replenishing__ += self.pool_size
+        try:
+            self.__launcher__.prewarm(count=self.pool_size,
+                                      required=self.min_ready,
+                                      on_ready=self.__add_preallocated_session__)
+        except BrowserPoolGeneralException:
+            # Drivers started before the failure should not outlive the pool which was not created,
+            # the pool was registered to be closed on exit while it was filled and it is not kept registered
+            self.__is_pool_ran__ = False
+            unregister_pool(self)
+            self.__close_preallocated_drivers__()
+            self.__stop_service_providers__()
+            raise
+
+    def __stop_service_providers__(self):
+        for service_provider in self.__service_providers__:
+            service_provider.stop()
+
+    def __replenish_deficit__(self):
+        with self.__lock__:
+            if not self.__is_pool_ran__:
+                return 0
+            free = self.pool_size - self.__size__()
+            if not self.lazy_pool:
+                return free
+            if not self.min_idle:
+                return 0
+            return min(self.min_idle - len(self.__preallocated_pool__) - self.__replenishing__, free)
+
+    def __replenish__(self, count: int):
+        with self.__lock__:
+            self.__replenishing__ += count
+        return self.__launcher__.launch(count=count, on_ready=self.__add_preallocated_session__)
+
+    def __launch_session__(self):
+        # Started session is added by __add_preallocated_session__, failed launch gives its slot back here
+        with self.__lock__:
+            proxy = self.__proxy_selector__.select(self.__proxy_usage__) if self.__proxy_selector__ else None
+            browser = self.__select_idle_browser__()
+            self.__replenishing_browsers__[browser.name] += 1
+        try:
+            return self.__make_new_session__(proxy=proxy, browser=browser)
+        except Exception:
+            with self.__lock__:
+                self.__replenishing__ -= 1
+                self.__replenishing_browsers__[browser.name] -= 1
+                self.__waiters__.notify()
+            raise
+
+    def __select_idle_browser__(self) -> BrowserSpec:
+        # Browser whose idle and starting sessions are the furthest below its share of idle sessions
+        if len(self.browsers) == 1:
+            return self.browsers[0]
+        idle = self.__count_idle_browsers__()
+        targets = self.__get_idle_targets__(sum(idle.values()) + 1)
+        return max(self.browsers, key=lambda x: targets[x.name] - idle[x.name])
+
+    def __count_idle_browsers__(self) -> Counter:
+        idle = self.__preallocated_pool__.count_by_browser()
+        idle.update(self.__replenishing_browsers__)
+        return idle
+
+    def __get_idle_targets__(self, total: int) -> Dict[str, float]:
+        # Idle sessions are split by share of recent checkouts, evenly until there are checkouts
+        demand = Counter(self.__demand__) if self.__demand__ else Counter(x.name for x in self.browsers)
+        checkouts = sum(demand.values())
+        return {x.name: total * demand[x.name] / checkouts for x in self.browsers}
+
+    def __rebalance_idle_sessions__(self):
+        # Idle sessions of browsers over their share are quit, the maintainer starts sessions of browsers under it
+        surplus = list()
+        with self.__lock__:
+            idle = self.__count_idle_browsers__()
+            targets = self.__get_idle_targets__(sum(idle.values()))
+            # Whole sessions over the share are quit, so shares which cannot be split evenly do not flip back and forth
+            over = {name: int(idle[name] - target) for name, target in targets.items() if idle[name] - target >= 1}
+            for session in self.__preallocated_pool__:
+                if over.get(session.browser, 0) > 0:
+                    over[session.browser] -= 1
+                    surplus.append(session)
+            for session in surplus:
+                self.__preallocated_pool__.remove(session)
+            if surplus:
+                self.__waiters__.notify()
+        for session in surplus:
+            logging.info('Idle driver {} of {} closed to rebalance idle sessions of {} browser pool.'
+                         .format(str(session.session_id), session.browser, self.browser_name))
+            self.__quit_session__(session)
+        if surplus:
+            self.__maintainer__.wake()
+
+    def __proxy_usage__(self) -> Counter:
+        # Sessions by proxy in use, idle and being started, so new sessions go to proxies with the fewest browsers
+        usage = Counter(x.proxy for x in self.__pool__.values())
+        usage.update(self.__launching_proxies__)
+        usage.update(self.__preallocated_pool__.count_by_proxy())
+        return usage
+
+    def __get_matching_browsers__(self, browser: str, tags: Iterable[str]) -> List[BrowserSpec]:
+        if browser is None and not tags:
+            return self.browsers
+        browsers = [x for x in self.browsers if x.matches(browser, tags)]
+        if not browsers:
+            raise InvalidOrMissingConfigurationException('No browser of {} browser pool matches browser {} and tags {}.'
+                                                         .format(self.browser_name, browser, sorted(tags or ())))
+        return browsers
+
+    def __get_priority_class__(self, name: str):
+        # Callers without class belong to the default class, which has no reserved sessions unless it is configured
+        if not self.__priority_classes__:
+            return None
+        name = DEFAULT_PRIORITY_CLASS if name is None else name
+        priority_class = self.__priority_classes__.get(name)
+        if priority_class is None and name == DEFAULT_PRIORITY_CLASS:
+            return PriorityClass(DEFAULT_PRIORITY_CLASS)
+        if priority_class is None:
+            raise InvalidOrMissingConfigurationException('Unknown priority class {}.'.format(name))
+        return priority_class
+
+    def __leaves_reserved_sessions__(self, priority_class: PriorityClass) -> bool:
+        # Session can be taken when free slots left cover reserved sessions which other classes do not use yet
+        usage = Counter(x.priority for x in self.__pool__.values())
+        usage.update(self.__launching_priorities__)
+        free = self.pool_size - sum(usage.values())
+        unused_reserved = sum(max(x.reserved - usage[x.name], 0) for x in self.__priority_classes__.values()
+                              if x.name != priority_class.name)
+        return free - unused_reserved >= 1
+
+    def __evict_session__(self, session: DriverSession, reason: str):
+        with self.__lock__:
+            self.__pool__.pop(session.session_id, None)
+            self.evictions[reason] += 1
+            self.__waiters__.notify()
+        self.metrics.notify(EVICTIONS, 1)
+        logging.warning('Driver {} evicted from {} browser pool: {}.'
+                        .format(str(session.session_id), self.browser_name, reason))
+        self.__reaper__.quit_later(session)
+        self.__maintainer__.wake()
+
+    def __watch_leases__(self, max_hold: float):
+        with self.__lock__:
+            if self.__is_lease_watched__:
+                return
+            self.__is_lease_watched__ = True
+        self.__maintainer__.schedule(self.__reclaim_expired_leases__, min(LEASE_CHECK_INTERVAL, max_hold / 2))
+        self.__maintainer__.wake()
+
+    def __reclaim_expired_leases__(self):
+        now = time.monotonic()
+        with self.__lock__:
+            expired = [x for x in self.__pool__.values() if x.lease_expires_at is not None and x.lease_expires_at < now]
+            for session in expired:
+                # Session is taken out at once, so it cannot be released to idle sessions before it is quit
+                del self.__pool__[session.session_id]
+                self.__reclaimed_leases__.append({'session_id': str(session.session_id),
+                                                  'held_seconds': now - session.leased_at,
+                                                  'acquired_at': ''.join(traceback.format_list(session.lease_stack))})
+        for session in expired:
+            # Holder of the lease may still use the driver, so it is quit instead of reused
+            logging.warning('Lease of driver {} expired after {:.1f} seconds, it was taken at:\n{}'
+                            .format(str(session.session_id), now - session.leased_at,
+                                    ''.join(traceback.format_list(session.lease_stack))))
+            self.__evict_session__(session, LEASE_EXPIRED)
+            for listener in list(self.__reclaim_listeners__):
+                try:
+                    listener(session)
+                except Exception as ex:
+                    logging.warning('Reclaim listener of {} browser pool failed: {}'.format(self.browser_name, ex))
+
+    def __get_recycle_reason__(self, session: DriverSession):
+        if is_driver_draining(session.driver):
+            return DRAINING
+        if self.max_session_uses and session.uses >= self.max_session_uses:
+            return MAX_USES
+        if self.max_session_age and time.monotonic() - session.created_at >= self.max_session_age:
+            return MAX_AGE
+        if self.require_full_reset and not can_reset_driver_state(session.driver):
+            return NO_FULL_RESET
+        if self.max_session_rss or self.admission_controller:
+            rss = self.__measure_rss__(session)
+            if self.max_session_rss and rss is not None and rss > self.max_session_rss:
+                return MAX_RSS
+        return None
+
+    def __measure_rss__(self, session: DriverSession):
+        # Processes of the session are found once, their tree is walked on every measure as renderers come and go
+        if session.root_pid is None:
+            session.root_pid = get_driver_root_pid(session.driver)
+        if session.root_pid is None:
+            return None
+        session.rss = get_process_tree_rss(session.root_pid)
+        if self.admission_controller and session.rss:
+            self.admission_controller.observe_footprint(session.rss)
+        return session.rss
+
+    def __evict_dead_idle_drivers__(self):
+        with self.__lock__:
+            sessions = list(self.__preallocated_pool__)
+        for session in sessions:
+            reason = self.__prober__.check(session.driver)
+            if reason is None:
+                continue
+            with self.__lock__:
+                if not self.__preallocated_pool__.remove(session):
+                    # Session was taken while it was probed, it is checked again on checkout
+                    continue
+            self.__evict_session__(session, reason)
+
+    def __close_expired_idle_drivers__(self):
+        # Idle sessions are taken from the right, so sessions idle for the longest time are on the left
+        expired = list()
+        with self.__lock__:
+            expire_before = time.monotonic() - self.idle_ttl
+            while len(self.__preallocated_pool__) > (self.min_idle or 0) \
+                    and self.__preallocated_pool__.oldest().idle_since < expire_before:
+                expired.append(self.__preallocated_pool__.pop_oldest())
+            if expired:
+                self.__waiters__.notify()
+        for session in expired:
+            self.__quit_session__(session)
+            logging.info('Driver {} closed after being idle for {} seconds.'
+                         .format(str(session.session_id), self.idle_ttl))
+
+    def __make_new_session__(self, timeout: float = None, proxy: str = None, browser: BrowserSpec = None):
+        # Launch waits for admission up to timeout seconds, launches in background wait until pool is closed
+        if self.admission_controller and \
+                not self.admission_controller.acquire(timeout, is_cancelled=lambda: not self.__is_pool_ran__):
+            self.metrics.increment(ADMISSION_TIMEOUTS)
+            raise BrowserPoolGeneralException('Host has no resources to start driver in {} browser pool.'
+                                              .format(self.browser_name))
+        started = time.monotonic()
+        profile_dir = None
+        try:
+            config = browser.config if proxy is None else browser.config.for_proxy(proxy)
+            if self.profile_template:
+                profile_dir = self.profile_template.clone()
+                config = config.with_profile_dir(profile_dir)
+            driver = self.__providers__[browser.name](config)
+        except Exception:
+            self.metrics.increment(LAUNCH_FAILURES)
+            if profile_dir:
+                ProfileTemplate.remove(profile_dir)
+            raise
+        finally:
+            if self.admission_controller:
+                self.admission_controller.release()
+        self.metrics.observe(LAUNCH_SECONDS, time.monotonic() - started)
+        session = browser.session_class(uuid.uuid4(), driver)
+        session.browser = browser.name
+        session.profile_dir = profile_dir
+        session.proxy = proxy
+        if self.warm_up and not self.__warm_up_session__(session):
+            self.__quit_session__(session)
+            raise BrowserPoolGeneralException('Failed to warm up driver in {} browser pool.'.format(self.browser_name))
+        return session
+
+    def __warm_up_session__(self, session: DriverSession) -> bool:
+        # Returns False when the hook failed, such session is quit instead of given out
+        started = time.monotonic()
+        try:
+            self.warm_up(session)
+        except Exception as ex:
+            self.metrics.increment(WARM_UP_FAILURES)
+            logging.warning('Failed to warm up driver {}: {}'.format(str(session.session_id), ex))
+            return False
+        self.metrics.observe(WARM_UP_SECONDS, time.monotonic() - started)
+        return True
+
+    def __quit_session__(self, session: DriverSession):
+        started = time.monotonic()
+        try:
+            session.driver.quit()
+        except Exception as ex:
+            # Driver service or browser could be already dead
+            logging.warning('Failed to quit driver {}: {}'.format(str(session.session_id), ex))
+        if session.profile_dir:
+            ProfileTemplate.remove(session.profile_dir)
+        self.metrics.observe(QUIT_SECONDS, time.monotonic() - started)
+
+    def __kill_session__(self, session: DriverSession):
+        # Quit did not finish in time, processes of the session are killed, so the browser is not left running
+        try:
+            killed = kill_driver_processes(session.driver, session.root_pid)
+        except Exception as ex:
+            logging.warning('Failed to kill processes of driver {}: {}'.format(str(session.session_id), ex))
+            killed = 0
+        logging.warning('Driver {} did not quit in time, {} of its processes killed.'
+                        .format(str(session.session_id), killed))
+        on_kill = getattr(session.driver, 'on_kill', None)
+        if on_kill:
+            # Driver gives back what its quit would, e.g. capacity of its node of BalancingDriverProvider
+            on_kill()
+        if session.profile_dir:
+            ProfileTemplate.remove(session.profile_dir)
+        self.metrics.increment(FORCE_KILLS)
+
+    def __validate_config__(self):
+        if not self.browsers:
+            raise InvalidOrMissingConfigurationException('Pool should have at least one browser.')
+        if len(set(x.name for x in self.browsers)) < len(self.browsers):
+            raise InvalidOrMissingConfigurationException('Names of browsers should be unique.')
+        for browser in self.browsers:
+            if browser.is_default_provider and not browser.config.executable_path:
+                raise InvalidOrMissingConfigurationException('{} executable path should be set.'
+                                                             .format(browser.browser_name))
+        if self.pool_size < 1:
+            raise InvalidOrMissingConfigurationException('Pool size should be greater than 0.')
+        if self.launch_concurrency < 1:
+            raise InvalidOrMissingConfigurationException('Launch concurrency should be greater than 0.')
+        if self.min_ready < 0 or self.min_ready > self.pool_size:
+            raise InvalidOrMissingConfigurationException('Minimum ready sessions should be between 0 and pool size.')
+        if self.max_session_uses is not None and self.max_session_uses < 1:
+            raise InvalidOrMissingConfigurationException('Max session uses should be greater than 0.')
+        if self.min_idle is not None and not self.lazy_pool:
+            raise InvalidOrMissingConfigurationException('Minimum idle sessions can be set only for lazy pool.')
+        if self.min_idle is not None and (self.min_idle < 0 or self.min_idle > self.pool_size):
+            raise InvalidOrMissingConfigurationException('Minimum idle sessions should be between 0 and pool size.')
+        if self.idle_ttl is not None and not self.lazy_pool:
+            raise InvalidOrMissingConfigurationException('Idle TTL can be set only for lazy pool.')
+        if self.idle_ttl is not None and self.idle_ttl <= 0:
+            raise InvalidOrMissingConfigurationException('Idle TTL should be greater than 0.')
+        if self.health_check_interval is not None and self.health_check_interval <= 0:
+            raise InvalidOrMissingConfigurationException('Health check interval should be greater than 0.')
+        if self.health_check_timeout is not None and self.health_check_timeout <= 0:
+            raise InvalidOrMissingConfigurationException('Health check timeout should be greater than 0.')
+        if self.max_session_rss is not None and self.max_session_rss < 1:
+            raise InvalidOrMissingConfigurationException('Max session RSS should be greater than 0.')
+        if self.priority_classes and len(set(x.name for x in self.priority_classes)) < len(self.priority_classes):
+            raise InvalidOrMissingConfigurationException('Names of priority classes should be unique.')
+        if self.priority_classes and any(x.reserved < 0 for x in self.priority_classes):
+            raise InvalidOrMissingConfigurationException('Reserved sessions of priority class should not be negative.')
+        if self.priority_classes and sum(x.reserved for x in self.priority_classes) > self.pool_size:
+            raise InvalidOrMissingConfigurationException('Reserved sessions of priority classes exceed pool size.')
+        if self.max_lease_time is not None and self.max_lease_time <= 0:
+            raise InvalidOrMissingConfigurationException('Max lease time should be greater than 0.')
+        if self.close_timeout is not None and self.close_timeout < 0:
+            raise InvalidOrMissingConfigurationException('Close timeout should not be negative.')
+        if self.max_session_age is not None and self.max_session_age <= 0:
+            raise InvalidOrMissingConfigurationException('Max session age should be greater than 0.')
+        if self.shared_services is not None and self.shared_services < 1:
+            raise InvalidOrMissingConfigurationException('Shared services should be greater than 0.')
+        if self.shared_services and not all(x.is_default_provider for x in self.browsers):
+            raise InvalidOrMissingConfigurationException(
+                'Shared services can be used only with default driver provider.')
+        if self.rebalance_interval is not None and self.rebalance_interval <= 0:
+            raise InvalidOrMissingConfigurationException('Rebalance interval should be greater than 0.')
@@ -0,0 +1,77 @@
+import atexit
+import functools
+import logging
+import os
+import signal
+import threading
+import weakref
+from typing import Iterable
+
+# Termination signals which end the process without running atexit handlers
+DEFAULT_SIGNALS = tuple(getattr(signal, x) for x in ('SIGTERM', 'SIGHUP') if hasattr(signal, x))
+
+__pools__ = weakref.WeakSet()
+# Re-entrant, so a signal handled while the main thread registers a pool can still take it
+__lock__ = threading.RLock()
+__is_atexit_registered__ = False
+
+
+def register_pool(pool):
+    # Pool is closed when the process exits, unless it was closed before
+    global __is_atexit_registered__
+    with __lock__:
+        __pools__.add(pool)
+        if not __is_atexit_registered__:
+            atexit.register(close_registered_pools)
+            __is_atexit_registered__ = True
+
+
+def unregister_pool(pool):
+    with __lock__:
+        __pools__.discard(pool)
+
+
+def close_registered_pools():
+    # Pools are closed concurrently, every pool quits its sessions within its own close timeout
+    threads = list()
+    for pool in __get_registered_pools__():
+        thread = threading.Thread(target=__close_pool__, args=(pool,), name='pool-exit-close', daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+
+def install_signal_handlers(signals: Iterable[int] = DEFAULT_SIGNALS):
+    # Must be called from the main thread. Pools are closed on the signals, then the previous handler runs
+    # or the process is ended by the signal, so exit status still tells how the process ended
+    for signum in signals:
+        previous = signal.getsignal(signum)
+        signal.signal(signum, functools.partial(__handle_signal__, previous))
+
+
+def __get_registered_pools__() -> list:
+    with __lock__:
+        return list(__pools__)
+
+
+def __close_pool__(pool):
+    try:
+        pool.close_pool()
+    except Exception as ex:
+        logging.warning('Failed to close browser pool on exit: {}'.format(ex))
+
+
+def __handle_signal__(previous, signum, frame):
+    # Handler runs on the main thread in the middle of what it was doing, possibly holding the lock of a pool.
+    # Other threads would wait for that lock forever, so pools are closed here one after another,
+    # their locks and locks of their providers are re-entrant
+    for pool in __get_registered_pools__():
+        __close_pool__(pool)
+    if callable(previous):
+        previous(signum, frame)
+        return
+    if previous == signal.SIG_IGN:
+        return
+    signal.signal(signum, signal.SIG_DFL)
+    os.kill(os.getpid(), signum)
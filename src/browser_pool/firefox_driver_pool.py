@@ -1,83 +1,73 @@
-import logging
-import uuid
-from typing import List
+from typing import Callable, List
 
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from src.browser_pool.admission_controller import AdmissionController
+from src.browser_pool.browser_spec import BrowserSpec
+from src.browser_pool.driver_pool import DEFAULT_CLOSE_TIMEOUT, DEFAULT_HEALTH_CHECK_INTERVAL, \
+    DEFAULT_HEALTH_CHECK_TIMEOUT, DEFAULT_LAUNCH_CONCURRENCY, DriverPool
+from src.browser_pool.priority_class import DEFAULT_PRIORITY_AGING, PriorityClass
+from src.browser_pool.proxy_selector import ROUND_ROBIN
+from src.config.profile_template import ProfileTemplate
 from src.config.webdriver_config import FirefoxConfiguration, FirefoxSession
-from src.exception.BrowserPoolGeneralException import BrowserPoolGeneralException
-from src.exception.InvalidOrMissingConfigurationException import InvalidOrMissingConfigurationException
 from src.provider.webdriver_provider import provide_firefox_driver
 
 
-class FirefoxDriverPool:
+class FirefoxDriverPool(DriverPool):
     def __init__(self,
                  pool_size: int = 0,
                  lazy_pool: bool = True,
-                 ff_config: FirefoxConfiguration = FirefoxConfiguration()):
-        self.__pool__: List[FirefoxSession] = list()
-        self.__preallocated_pool__: List[FirefoxSession] = list()
-        self.pool_size = pool_size
-        self.lazy_pool = lazy_pool
+                 ff_config: FirefoxConfiguration = FirefoxConfiguration(),
+                 driver_provider: Callable[[FirefoxConfiguration], WebDriver] = provide_firefox_driver,
+                 launch_concurrency: int = DEFAULT_LAUNCH_CONCURRENCY,
+                 min_ready: int = None,
+                 max_session_uses: int = None,
+                 min_idle: int = None,
+                 max_size: int = None,
+                 idle_ttl: float = None,
+                 health_check_on_checkout: bool = True,
+                 health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL,
+                 health_check_timeout: float = DEFAULT_HEALTH_CHECK_TIMEOUT,
+                 shared_services: int = None,
+                 max_session_rss: int = None,
+                 max_session_age: float = None,
+                 admission_controller: AdmissionController = None,
+                 profile_template: ProfileTemplate = None,
+                 proxies: List[str] = None,
+                 proxy_selection: str = ROUND_ROBIN,
+                 close_timeout: float = DEFAULT_CLOSE_TIMEOUT,
+                 close_on_exit: bool = True,
+                 warm_up: Callable[[FirefoxSession], None] = None,
+                 max_lease_time: float = None,
+                 priority_classes: List[PriorityClass] = None,
+                 priority_aging: float = DEFAULT_PRIORITY_AGING,
+                 require_full_reset: bool = False):
         self.ff_config = ff_config
-        self.__is_pool_ran__ = True
-
-        self.__validate_config__()
-
-        if not self.lazy_pool:
-            self.__fill_pool__()
-
-    def get_session(self) -> FirefoxSession:
-        # When lazy pool, session instance will be created just on get_session method call and add to pool
-        if self.lazy_pool:
-            return self.__get_new_driver__()
-        # When not lazy pool, session should be got from preallocated_pool and moved to pool
-        return self.__get_preallocated_driver__()
-
-    def close_driver(self, session_id: uuid):
-        session = next((x for x in self.__pool__ if x.session_id == session_id), None)
-        self.__pool__.remove(session)
-        if session:
-            session.driver.quit()
-            if not self.lazy_pool and self.__is_pool_ran__:
-                self.__preallocated_pool__.append(self.__make_new_session__())
-        else:
-            logging.warning('Session {} already closed or it was not started.'.format(str(session.session_id)))
-        logging.info('Driver {} closed successful.'.format(str(session.session_id)))
-
-    def __close_preallocated_drivers__(self):
-        while len(self.__preallocated_pool__) > 0:
-            session = self.__preallocated_pool__.pop()
-            session.driver.quit()
-
-    def close_pool(self):
-        self.__is_pool_ran__ = False
-        while len(self.__pool__) > 0:
-            session = self.__pool__.__getitem__(0)
-            self.close_driver(session.session_id)
-        self.__close_preallocated_drivers__()
-
-    def __get_new_driver__(self):
-        if len(self.__pool__) == self.pool_size:
-            raise BrowserPoolGeneralException('Reached limit of drivers in Firefox browser pool.')
-        session = self.__make_new_session__()
-        self.__pool__.append(session)
-        return session
-
-    def __get_preallocated_driver__(self):
-        if len(self.__preallocated_pool__) == 0:
-            raise BrowserPoolGeneralException('Reached limit of drivers in Firefox browser pool.')
-        session = self.__preallocated_pool__.pop()
-        self.__pool__.append(session)
-        return session
-
-    def __fill_pool__(self):
-        for x in range(0, self.pool_size):
-            self.__preallocated_pool__.append(self.__make_new_session__())
-
-    def __make_new_session__(self):
-        return FirefoxSession(uuid.uuid4(), provide_firefox_driver(self.ff_config))
-
-    def __validate_config__(self):
-        if not self.ff_config.executable_path:
-            raise InvalidOrMissingConfigurationException('Firefox executable path should be set.')
-        if self.pool_size < 1:
-            raise InvalidOrMissingConfigurationException('Pool size should be greater than 0.')
+        # Starts driver for the configuration, can be replaced e.g. by FakeDriverProvider to run without browser
+        self.driver_provider = driver_provider
+        super().__init__(browsers=[BrowserSpec.firefox(ff_config, driver_provider)],
+                         pool_size=pool_size,
+                         lazy_pool=lazy_pool,
+                         launch_concurrency=launch_concurrency,
+                         min_ready=min_ready,
+                         max_session_uses=max_session_uses,
+                         min_idle=min_idle,
+                         max_size=max_size,
+                         idle_ttl=idle_ttl,
+                         health_check_on_checkout=health_check_on_checkout,
+                         health_check_interval=health_check_interval,
+                         health_check_timeout=health_check_timeout,
+                         shared_services=shared_services,
+                         max_session_rss=max_session_rss,
+                         max_session_age=max_session_age,
+                         admission_controller=admission_controller,
+                         profile_template=profile_template,
+                         proxies=proxies,
+                         proxy_selection=proxy_selection,
+                         close_timeout=close_timeout,
+                         close_on_exit=close_on_exit,
+                         warm_up=warm_up,
+                         max_lease_time=max_lease_time,
+                         priority_classes=priority_classes,
+                         priority_aging=priority_aging,
+                         require_full_reset=require_full_reset)
@@ -0,0 +1,75 @@
+import queue
+import threading
+from typing import Optional
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from src.util.webdriver_utils import UNRESPONSIVE, check_driver_health
+
+
+class Probe:
+    """Health check of one driver, reason is None when the driver is alive."""
+
+    def __init__(self, driver: WebDriver):
+        self.driver = driver
+        self.reason: Optional[str] = None
+        self.done = threading.Event()
+
+
+class HealthProber:
+    """Checks health of drivers on daemon threads and waits for the result up to `timeout` seconds,
+    so a hung browser does not block the caller of get_session or the pool maintainer.
+    Threads are kept for next probes, thread stuck in a probe of hung browser is replaced by a new one."""
+
+    def __init__(self, timeout: float, browser_name: str):
+        self.timeout = timeout
+        self.browser_name = browser_name
+        self.__lock__ = threading.RLock()
+        self.__probes__ = queue.SimpleQueue()
+        # Threads waiting for a probe, every queued probe has a thread which is idle or started for it
+        self.__idle__ = 0
+        self.__started__ = 0
+        self.__is_closed__ = False
+
+    def check(self, driver: WebDriver) -> Optional[str]:
+        # Returns reason why driver cannot be used or None when it is alive, `None` timeout probes on the caller thread
+        if self.timeout is None:
+            return check_driver_health(driver)
+        probe = Probe(driver)
+        with self.__lock__:
+            if self.__idle__ > 0:
+                self.__idle__ -= 1
+                thread = None
+            else:
+                self.__started__ += 1
+                thread = threading.Thread(target=self.__run__,
+                                          name='{}-health-probe-{}'.format(self.browser_name.lower(),
+                                                                           self.__started__),
+                                          daemon=True)
+        self.__probes__.put(probe)
+        if thread is not None:
+            thread.start()
+        if not probe.done.wait(self.timeout):
+            return UNRESPONSIVE
+        return probe.reason
+
+    def shutdown(self):
+        # Idle threads exit, threads stuck in a probe exit once it finishes
+        with self.__lock__:
+            self.__is_closed__ = True
+            idle = self.__idle__
+            self.__idle__ = 0
+        for x in range(idle):
+            self.__probes__.put(None)
+
+    def __run__(self):
+        while True:
+            probe = self.__probes__.get()
+            if probe is None:
+                return
+            probe.reason = check_driver_health(probe.driver)
+            probe.done.set()
+            with self.__lock__:
+                if self.__is_closed__:
+                    return
+                self.__idle__ += 1
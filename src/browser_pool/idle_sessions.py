@@ -0,0 +1,96 @@
+from collections import Counter, OrderedDict
+from typing import Dict, Iterator, List
+
+from src.config.webdriver_config import DriverSession
+
+
+class IdleSessions:
+    """Idle sessions of a pool in the order they became idle, indexed by id and by browser and proxy,
+    so sessions are taken and removed without scanning all idle sessions."""
+
+    def __init__(self):
+        self.__sessions__: Dict[object, DriverSession] = OrderedDict()
+        # Sessions by browser and proxy, every group is in the order its sessions became idle.
+        # Sessions are taken from the end of groups, so plain dicts keep order, ordered dict of all sessions
+        # takes the oldest from the start without passing removed entries
+        self.__groups__: Dict[tuple, Dict[object, DriverSession]] = dict()
+
+    def __len__(self) -> int:
+        return len(self.__sessions__)
+
+    def __iter__(self) -> Iterator[DriverSession]:
+        # Sessions idle for the longest time come first
+        return iter(list(self.__sessions__.values()))
+
+    def __contains__(self, session: DriverSession) -> bool:
+        return self.__sessions__.get(session.session_id) is session
+
+    def append(self, session: DriverSession):
+        self.__sessions__[session.session_id] = session
+        key = (session.browser, session.proxy)
+        group = self.__groups__.get(key)
+        if group is None:
+            group = self.__groups__[key] = dict()
+        group[session.session_id] = session
+
+    def remove(self, session: DriverSession) -> bool:
+        # Returns False when the session is not idle, e.g. it was taken by another caller
+        if session not in self:
+            return False
+        del self.__sessions__[session.session_id]
+        key = (session.browser, session.proxy)
+        group = self.__groups__[key]
+        del group[session.session_id]
+        if not group:
+            del self.__groups__[key]
+        return True
+
+    def oldest(self) -> DriverSession:
+        return next(iter(self.__sessions__.values()))
+
+    def pop_oldest(self) -> DriverSession:
+        session = self.oldest()
+        self.remove(session)
+        return session
+
+    def pop(self, proxy: str, browsers: List[str]) -> DriverSession:
+        # The most recently used session of one of browsers behind the proxy
+        if len(browsers) == 1:
+            # Pool of one browser takes the last session of its group without comparing groups
+            key = (browsers[0], proxy)
+            group = self.__groups__.get(key)
+            if not group:
+                return None
+            session_id, session = group.popitem()
+            if not group:
+                del self.__groups__[key]
+            del self.__sessions__[session_id]
+            return session
+        candidates = [next(reversed(group.values())) for group in
+                      (self.__groups__.get((x, proxy)) for x in browsers) if group]
+        if not candidates:
+            return None
+        session = max(candidates, key=lambda x: x.idle_since)
+        self.remove(session)
+        return session
+
+    def latest(self, browsers: List[str] = None) -> List[DriverSession]:
+        # The most recently used session of every browser and proxy
+        return [next(reversed(group.values())) for (browser, proxy), group in self.__groups__.items()
+                if browsers is None or browser in browsers]
+
+    def count_by_browser(self) -> Counter:
+        counts = Counter()
+        for (browser, proxy), group in self.__groups__.items():
+            counts[browser] += len(group)
+        return counts
+
+    def count_by_proxy(self) -> Counter:
+        counts = Counter()
+        for (browser, proxy), group in self.__groups__.items():
+            counts[proxy] += len(group)
+        return counts
+
+    def clear(self):
+        self.__sessions__.clear()
+        self.__groups__.clear()
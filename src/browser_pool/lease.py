@@ -0,0 +1,47 @@
+import time
+
+from selenium.common.exceptions import WebDriverException
+
+
+class Lease:
+    """Session taken from a pool until it is released, closed or its max hold time passes,
+    then the pool reclaims the session and quits its driver.
+    As a context manager it gives the session and releases it on exit, driver which failed is closed."""
+
+    def __init__(self, pool, session):
+        self.pool = pool
+        self.session = session
+        self.__is_returned__ = False
+
+    @property
+    def session_id(self):
+        return self.session.session_id
+
+    @property
+    def driver(self):
+        return self.session.driver
+
+    def remaining(self):
+        # Seconds until the pool reclaims the session, None when the lease has no max hold time
+        expires_at = self.session.lease_expires_at
+        return None if expires_at is None else max(expires_at - time.monotonic(), 0)
+
+    def release(self):
+        if not self.__is_returned__:
+            self.__is_returned__ = True
+            self.pool.release_session(self.session_id)
+
+    def close(self):
+        if not self.__is_returned__:
+            self.__is_returned__ = True
+            self.pool.close_driver(self.session_id)
+
+    def __enter__(self):
+        return self.session
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        if exc_type is not None and issubclass(exc_type, WebDriverException):
+            self.close()
+        else:
+            self.release()
+        return False
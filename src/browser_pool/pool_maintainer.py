@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+from typing import Callable, List
+
+DEFAULT_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+
+
+class PeriodicTask:
+    """Pool housekeeping task run by maintainer every `interval` seconds."""
+
+    def __init__(self, task: Callable[[], None], interval: float):
+        self.task = task
+        self.interval = interval
+        self.run_at = time.monotonic() + interval
+
+
+class PoolMaintainer:
+    """Background worker which keeps idle sessions of the pool topped up.
+    Wake ups which come while sessions are launched are coalesced into the next launch batch."""
+
+    def __init__(self,
+                 deficit: Callable[[], int],
+                 launch: Callable[[int], int],
+                 browser_name: str,
+                 backoff: float = DEFAULT_BACKOFF,
+                 max_backoff: float = MAX_BACKOFF):
+        self.__deficit__ = deficit
+        self.__launch__ = launch
+        self.browser_name = browser_name
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.__periodic_tasks__: List[PeriodicTask] = list()
+        self.__wake_event__ = threading.Event()
+        self.__is_running__ = False
+        self.__thread__ = threading.Thread(target=self.__run__,
+                                           name='{}-pool-maintainer'.format(browser_name.lower()),
+                                           daemon=True)
+
+    def schedule(self, task: Callable[[], None], interval: float):
+        # E.g. to quit sessions which are idle for too long. Task scheduled after start runs once the worker
+        # wakes up, wake makes it pick the task up at once
+        self.__periodic_tasks__.append(PeriodicTask(task, interval))
+
+    def start(self):
+        self.__is_running__ = True
+        # First check tops up sessions which pool expects to have from the start
+        self.__wake_event__.set()
+        self.__thread__.start()
+
+    def wake(self):
+        self.__wake_event__.set()
+
+    def stop(self, timeout: float = None):
+        # Waits up to timeout seconds for the running task, the thread is a daemon, so a hung task is left behind
+        self.__is_running__ = False
+        self.__wake_event__.set()
+        if self.__thread__.is_alive() and self.__thread__ is not threading.current_thread():
+            self.__thread__.join(timeout)
+
+    def __run__(self):
+        delay = None
+        current_backoff = 0.0
+        retry_at = 0.0
+        while True:
+            self.__wake_event__.wait(self.__next_timeout__(delay))
+            self.__wake_event__.clear()
+            if not self.__is_running__:
+                return
+            self.__run_periodic_tasks__()
+            delay = None
+            now = time.monotonic()
+            if now < retry_at:
+                # Wake ups during back off are postponed, so broken driver setup does not spin the worker
+                delay = retry_at - now
+                continue
+            missing = self.__deficit__()
+            if missing <= 0:
+                continue
+            failed = self.__launch__(missing)
+            if failed:
+                current_backoff = min(max(current_backoff * 2, self.backoff), self.max_backoff)
+                retry_at = time.monotonic() + current_backoff
+                delay = current_backoff
+                logging.warning('Failed to start {} of {} drivers in {} browser pool, retry in {} seconds.'
+                                .format(failed, missing, self.browser_name, current_backoff))
+            else:
+                current_backoff = 0.0
+                # Sessions closed during the launch are replenished in the next batch
+                delay = 0
+
+    def __run_periodic_tasks__(self):
+        for periodic_task in self.__periodic_tasks__:
+            if time.monotonic() < periodic_task.run_at:
+                continue
+            try:
+                periodic_task.task()
+            except Exception as ex:
+                logging.warning('Failed to run maintenance of {} browser pool: {}'.format(self.browser_name, ex))
+            periodic_task.run_at = time.monotonic() + periodic_task.interval
+
+    def __next_timeout__(self, delay: float):
+        timeout = delay
+        for periodic_task in self.__periodic_tasks__:
+            until_run = max(periodic_task.run_at - time.monotonic(), 0)
+            timeout = until_run if timeout is None else min(timeout, until_run)
+        return timeout
@@ -0,0 +1,14 @@
+DEFAULT_PRIORITY_CLASS = 'default'
+# Priority waiting callers gain per second, caller of priority 0 is served before fresh callers of priority 10
+# after waiting for 10 seconds
+DEFAULT_PRIORITY_AGING = 1.0
+
+
+class PriorityClass:
+    """Named class of pool callers. Waiting callers of higher `priority` are served first,
+    `reserved` sessions of the pool are kept for callers of the class and other classes cannot take them."""
+
+    def __init__(self, name: str, priority: float = 0, reserved: int = 0):
+        self.name = name
+        self.priority = priority
+        self.reserved = reserved
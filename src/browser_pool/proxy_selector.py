@@ -0,0 +1,32 @@
+from collections import Counter
+from typing import Callable, List
+
+from src.exception.InvalidOrMissingConfigurationException import InvalidOrMissingConfigurationException
+
+ROUND_ROBIN = 'round_robin'
+LEAST_USED = 'least_used'
+
+
+class ProxySelector:
+    """Picks proxy for new sessions which are requested without one, idle sessions behind any proxy are reused first.
+    Round robin takes proxies in turn, least used takes the proxy with the fewest sessions in use or idle."""
+
+    def __init__(self, proxies: List[str], policy: str = ROUND_ROBIN):
+        if not proxies:
+            raise InvalidOrMissingConfigurationException('Proxies should not be empty.')
+        if policy not in (ROUND_ROBIN, LEAST_USED):
+            raise InvalidOrMissingConfigurationException('Proxy selection should be round_robin or least_used.')
+        self.proxies = list(proxies)
+        self.policy = policy
+        self.__position__ = 0
+
+    def select(self, usage: Callable[[], Counter]) -> str:
+        # Called only when a session is started, so round robin turns with started sessions.
+        # Usage is counted only for least used policy, proxies are tried from the position of round robin,
+        # so ties go to proxies in turn
+        ordered = self.proxies[self.__position__:] + self.proxies[:self.__position__]
+        self.__position__ = (self.__position__ + 1) % len(self.proxies)
+        if self.policy == ROUND_ROBIN:
+            return ordered[0]
+        in_use = usage()
+        return min(ordered, key=lambda x: in_use[x])
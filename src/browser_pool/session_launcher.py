@@ -0,0 +1,105 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, List
+
+from src.exception.BrowserPoolGeneralException import BrowserPoolGeneralException
+
+
+class LaunchBatch:
+    """Progress of sessions submitted to the launcher together."""
+
+    def __init__(self, count: int):
+        self.count = count
+        self.ready = 0
+        self.errors: List[Exception] = list()
+        self.futures: List[Future] = list()
+
+
+class SessionLauncher:
+    """Launches browser sessions on a bounded thread pool.
+    Used by pools to pre-warm sessions concurrently instead of one after another."""
+
+    def __init__(self,
+                 make_session: Callable[[], object],
+                 quit_session: Callable[[object], None],
+                 concurrency: int,
+                 browser_name: str):
+        self.__make_session__ = make_session
+        self.__quit_session__ = quit_session
+        self.browser_name = browser_name
+        self.__executor__ = ThreadPoolExecutor(max_workers=concurrency,
+                                               thread_name_prefix='{}-launcher'.format(browser_name.lower()))
+        self.__condition__ = threading.Condition()
+        self.__futures__: List[Future] = list()
+        self.__is_aborted__ = False
+
+    def prewarm(self, count: int, required: int, on_ready: Callable[[object], None]):
+        # Blocks until `required` sessions are ready, the rest keep launching in background
+        with self.__condition__:
+            batch = self.__submit__(count, on_ready)
+            while batch.ready < required and len(batch.errors) <= count - required:
+                self.__condition__.wait()
+            failed = len(batch.errors) > count - required
+        if failed:
+            self.shutdown()
+            raise BrowserPoolGeneralException('Failed to start {} of {} drivers in {} browser pool.'
+                                              .format(len(batch.errors), count, self.browser_name)) \
+                from batch.errors[0]
+
+    def launch(self, count: int, on_ready: Callable[[object], None]) -> int:
+        # Blocks until all sessions are launched, returns number of sessions which failed to start
+        with self.__condition__:
+            if self.__is_aborted__:
+                return count
+            batch = self.__submit__(count, on_ready)
+        wait(batch.futures)
+        return count - batch.ready
+
+    def submit(self, task: Callable[[], None]) -> bool:
+        # Runs the task on a launcher thread, e.g. reset of a released session, which prepares it for the next caller
+        # like a launch does. Returns False when the launcher is shut down
+        with self.__condition__:
+            if self.__is_aborted__:
+                return False
+            self.__futures__ = [x for x in self.__futures__ if not x.done()]
+            self.__futures__.append(self.__executor__.submit(task))
+        return True
+
+    def shutdown(self, timeout: float = None):
+        # Sessions which finish launching after shutdown are quit, so nothing is leaked.
+        # Waits up to timeout seconds for launches in progress, `None` waits until they finish
+        with self.__condition__:
+            self.__is_aborted__ = True
+            futures = list(self.__futures__)
+        for future in futures:
+            future.cancel()
+        self.__executor__.shutdown(wait=False)
+        wait(futures, timeout)
+
+    def __submit__(self, count: int, on_ready: Callable[[object], None]) -> LaunchBatch:
+        batch = LaunchBatch(count)
+        # Finished futures are dropped, so long living pool does not accumulate them
+        self.__futures__ = [x for x in self.__futures__ if not x.done()]
+        for x in range(0, count):
+            future = self.__executor__.submit(self.__launch__, batch, on_ready)
+            batch.futures.append(future)
+            self.__futures__.append(future)
+        return batch
+
+    def __launch__(self, batch: LaunchBatch, on_ready: Callable[[object], None]):
+        try:
+            session = self.__make_session__()
+        except Exception as ex:
+            logging.warning('Failed to start driver in {} browser pool: {}'.format(self.browser_name, ex))
+            with self.__condition__:
+                batch.errors.append(ex)
+                self.__condition__.notify_all()
+            return
+        with self.__condition__:
+            if not self.__is_aborted__:
+                batch.ready += 1
+                on_ready(session)
+                self.__condition__.notify_all()
+                return
+        self.__quit_session__(session)
@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List
+
+
+class SessionReaper:
+    """Quits sessions concurrently within a deadline, sessions which did not quit in time are killed.
+    Used by pools on close, so one hung browser does not hang the whole shutdown,
+    and to quit closed sessions in background, so callers of close_driver do not wait for the quit."""
+
+    def __init__(self,
+                 quit_session: Callable[[object], None],
+                 kill_session: Callable[[object], None],
+                 concurrency: int,
+                 browser_name: str):
+        self.__quit_session__ = quit_session
+        self.__kill_session__ = kill_session
+        self.concurrency = concurrency
+        self.browser_name = browser_name
+        self.__condition__ = threading.Condition()
+        # Sessions waiting for a reaper thread and all sessions which did not finish to quit, by id
+        self.__pending__: Deque[object] = deque()
+        self.__unfinished__: Dict[int, object] = dict()
+        self.__workers__ = 0
+
+    def quit_later(self, session: object):
+        # Returns at once, the session is quit on a reaper thread
+        with self.__condition__:
+            self.__pending__.append(session)
+            self.__unfinished__[id(session)] = session
+            if self.__workers__ >= self.concurrency:
+                return
+            self.__workers__ += 1
+            number = self.__workers__
+        # Daemon threads, so quit which hangs forever does not keep the process from exiting
+        threading.Thread(target=self.__quit_pending__,
+                         name='{}-reaper-{}'.format(self.browser_name.lower(), number),
+                         daemon=True).start()
+
+    def reap(self, sessions: List[object], timeout: float = None) -> List[object]:
+        # Quits the sessions and sessions still quitting in background. Returns sessions which were killed,
+        # `None` timeout waits for all quits
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for session in sessions:
+            self.quit_later(session)
+        with self.__condition__:
+            while self.__unfinished__:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self.__condition__.wait(remaining)
+            # Sessions not started to quit are taken from the threads, the rest hang in quit
+            self.__pending__.clear()
+            overdue = list(self.__unfinished__.values())
+            self.__unfinished__.clear()
+        for session in overdue:
+            self.__kill_session__(session)
+        return overdue
+
+    def __quit_pending__(self):
+        while True:
+            with self.__condition__:
+                if not self.__pending__:
+                    self.__workers__ -= 1
+                    return
+                session = self.__pending__.popleft()
+            self.__quit_session__(session)
+            with self.__condition__:
+                self.__unfinished__.pop(id(session), None)
+                self.__condition__.notify_all()
@@ -0,0 +1,73 @@
+import threading
+import time
+from typing import Callable, Dict, List
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+GET_LOCAL_STORAGE_SCRIPT = 'return Object.assign({}, window.localStorage);'
+SET_LOCAL_STORAGE_SCRIPT = 'for (const [key, value] of Object.entries(arguments[0])) ' \
+                           '{ window.localStorage.setItem(key, value); }'
+
+
+class SessionState:
+    """Cookies and local storage of the origin captured from a browser."""
+
+    def __init__(self, cookies: List[dict], local_storage: Dict[str, str]):
+        self.cookies = cookies
+        self.local_storage = local_storage
+        self.captured_at = time.monotonic()
+
+
+class SessionStateCache:
+    """Warm-up hook of pools which logs in once and replays the captured state into next sessions.
+    The first session runs `login(driver)` and its cookies and local storage of `origin` are captured,
+    next sessions get them replayed and are left on `origin`. State older than `ttl` seconds or invalidated
+    is captured again by the next session."""
+
+    def __init__(self,
+                 origin: str,
+                 login: Callable[[WebDriver], None] = None,
+                 ttl: float = None):
+        self.origin = origin
+        self.login = login
+        self.ttl = ttl
+        self.__state__: SessionState = None
+        # Sessions wait while the state is captured, so login runs once instead of in every session
+        self.__lock__ = threading.Lock()
+
+    def __call__(self, session):
+        self.apply(session.driver)
+
+    def apply(self, driver: WebDriver):
+        with self.__lock__:
+            state = self.__state__
+            if state is None or self.__is_expired__(state):
+                self.__state__ = self.capture(driver)
+                return
+        self.replay(driver, state)
+
+    def capture(self, driver: WebDriver) -> SessionState:
+        driver.get(self.origin)
+        if self.login:
+            self.login(driver)
+            # Login can end on another page, state is read on the origin
+            driver.get(self.origin)
+        return SessionState(driver.get_cookies(), driver.execute_script(GET_LOCAL_STORAGE_SCRIPT) or dict())
+
+    def replay(self, driver: WebDriver, state: SessionState):
+        # Cookies and storage can be set only on a page of their origin, the page is loaded again to see them
+        driver.get(self.origin)
+        for cookie in state.cookies:
+            driver.add_cookie(cookie)
+        if state.local_storage:
+            driver.execute_script(SET_LOCAL_STORAGE_SCRIPT, state.local_storage)
+        if state.cookies or state.local_storage:
+            driver.get(self.origin)
+
+    def invalidate(self):
+        # E.g. when a task finds the session logged out, sessions warmed up later log in again
+        with self.__lock__:
+            self.__state__ = None
+
+    def __is_expired__(self, state: SessionState) -> bool:
+        return self.ttl is not None and time.monotonic() - state.captured_at > self.ttl
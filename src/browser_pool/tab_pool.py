@@ -0,0 +1,309 @@
+import logging
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, Iterator, List
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from src.browser_pool.task_runner import TaskResult, TaskRunner
+from src.exception.BrowserPoolGeneralException import BrowserPoolGeneralException
+from src.exception.InvalidOrMissingConfigurationException import InvalidOrMissingConfigurationException
+from src.util.webdriver_utils import BLANK_PAGE, block_urls
+
+DEFAULT_TABS_PER_BROWSER = 8
+
+
+class BrowserTabs:
+    """Browser taken from the wrapped pool whose tabs are given out as sessions.
+    The first window is never given out, it keeps the browser open while tabs are closed."""
+
+    def __init__(self, session, isolate_tabs: bool, blocked_urls: List[str] = None):
+        self.session = session
+        self.driver = session.driver
+        # Tabs get own browser context with separate cookies and storage where browser supports it (Chrome CDP)
+        self.isolate_tabs = isolate_tabs and hasattr(self.driver, 'execute_cdp_cmd')
+        # Chrome blocks urls only in the window they were set for at launch, so they are set again in every tab
+        self.blocked_urls = blocked_urls if hasattr(self.driver, 'execute_cdp_cmd') else None
+        # Browser runs commands in its current window, so commands of tabs are sent one at a time
+        self.lock = threading.RLock()
+        self.current_handle: str = None
+        self.__first_handle__: str = None
+        # Open tabs and whether the browser failed, failed browser gets no new tabs. Guarded by the tab pool lock
+        self.tabs = 0
+        self.is_broken = False
+
+    def switch_to_tab(self, handle: str):
+        # Switch is skipped when the browser is already in the window, tab commands of one browser mostly come in runs
+        if self.current_handle != handle:
+            self.driver.switch_to.window(handle)
+            self.current_handle = handle
+
+    def open_tab(self):
+        # Returns window handle of the new tab and its browser context id
+        with self.lock:
+            if self.__first_handle__ is None:
+                # Pool gives out sessions switched to their first window
+                self.__first_handle__ = self.driver.window_handles[0]
+                self.current_handle = self.__first_handle__
+            if not self.isolate_tabs:
+                self.driver.switch_to.new_window('tab')
+                self.current_handle = self.driver.current_window_handle
+                if self.blocked_urls:
+                    block_urls(self.driver, self.blocked_urls)
+                return self.current_handle, None
+            # CDP commands run in the current window, so it must be one which is not closed
+            self.switch_to_tab(self.__first_handle__)
+            context_id = self.driver.execute_cdp_cmd('Target.createBrowserContext', dict())['browserContextId']
+            try:
+                target = self.driver.execute_cdp_cmd('Target.createTarget',
+                                                     {'url': BLANK_PAGE, 'browserContextId': context_id})
+                if self.blocked_urls:
+                    # Window handles of chromedriver are ids of the targets, tab is still blank when urls are blocked
+                    self.switch_to_tab(target['targetId'])
+                    block_urls(self.driver, self.blocked_urls)
+            except Exception:
+                self.switch_to_tab(self.__first_handle__)
+                self.driver.execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': context_id})
+                raise
+            return target['targetId'], context_id
+
+    def close_tab(self, handle: str, context_id: str = None):
+        with self.lock:
+            if context_id is None:
+                self.switch_to_tab(handle)
+                self.driver.close()
+                self.current_handle = None
+                return
+            # Disposed context closes its windows together with cookies and storage of the tab
+            self.switch_to_tab(self.__first_handle__)
+            self.driver.execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': context_id})
+
+
+class TabWebDriver(WebDriver):
+    """Driver of one tab of a pooled browser. It shares the session of the browser and switches the browser
+    to its tab before every command, elements found by the driver send their commands through it as well.
+    Quit closes the tab, the browser stays open."""
+
+    def __init__(self, browser: BrowserTabs, window_handle: str, on_quit: Callable[[], None]):
+        self.__browser__ = browser
+        self.window_handle = window_handle
+        self.__on_quit__ = on_quit
+        super().__init__(command_executor=browser.driver.command_executor)
+
+    def start_session(self, capabilities: dict, browser_profile=None):
+        # Tab belongs to the session of the browser, no new session is started
+        self.session_id = self.__browser__.driver.session_id
+        self.caps = self.__browser__.driver.capabilities
+
+    def execute(self, driver_command: str, params: dict = None) -> dict:
+        with self.__browser__.lock:
+            self.__browser__.switch_to_tab(self.window_handle)
+            response = super().execute(driver_command, params)
+            if driver_command == Command.SWITCH_TO_WINDOW:
+                # Tab moved to another window, e.g. a popup it opened
+                self.window_handle = params['handle']
+                self.__browser__.current_handle = self.window_handle
+            elif driver_command == Command.CLOSE:
+                self.__browser__.current_handle = None
+            return response
+
+    def execute_cdp_cmd(self, cmd: str, cmd_args: dict):
+        return self.execute('executeCdpCommand', {'cmd': cmd, 'params': cmd_args})['value']
+
+    def quit(self):
+        on_quit, self.__on_quit__ = self.__on_quit__, None
+        if on_quit:
+            on_quit()
+
+
+class LockedTabDriver:
+    """Driver of one tab for browser drivers which are not selenium remote drivers, e.g. FakeWebDriver.
+    Attributes are read and methods are called under the lock of the browser after it is switched to the tab."""
+
+    def __init__(self, browser: BrowserTabs, window_handle: str, on_quit: Callable[[], None]):
+        self.__browser__ = browser
+        self.window_handle = window_handle
+        self.__on_quit__ = on_quit
+
+    def __getattr__(self, name: str):
+        browser = self.__browser__
+        with browser.lock:
+            # Properties such as current_url, title or page_source are commands of the current window,
+            # so they are read here, in the tab and before other tabs can switch the browser away
+            browser.switch_to_tab(self.window_handle)
+            value = getattr(browser.driver, name)
+        if not callable(value):
+            return value
+
+        def call_in_tab(*args, **kwargs):
+            with browser.lock:
+                browser.switch_to_tab(self.window_handle)
+                return value(*args, **kwargs)
+        return call_in_tab
+
+    def quit(self):
+        on_quit, self.__on_quit__ = self.__on_quit__, None
+        if on_quit:
+            on_quit()
+
+
+class TabSession:
+    def __init__(self, session_id: uuid = None, browser: BrowserTabs = None, window_handle: str = None,
+                 browser_context_id: str = None):
+        self.session_id: uuid = session_id
+        self.driver = None
+        self.browser = browser
+        self.window_handle = window_handle
+        # Browser context of the tab, None when the tab shares cookies and storage with other tabs of the browser
+        self.browser_context_id = browser_context_id
+        self.proxy: str = browser.session.proxy if browser else None
+
+
+class TabPool:
+    """Gives out tabs of pooled browsers as sessions, up to `tabs_per_browser` tabs share one browser.
+    A browser is taken from the wrapped pool only when the taken ones have no free tab,
+    and given back when its last tab is released. The tab pool owns the wrapped pool and closes it."""
+
+    def __init__(self,
+                 pool,
+                 tabs_per_browser: int = DEFAULT_TABS_PER_BROWSER,
+                 isolate_tabs: bool = True):
+        self.pool = pool
+        self.tabs_per_browser = tabs_per_browser
+        self.isolate_tabs = isolate_tabs
+        self.__browsers__: List[BrowserTabs] = list()
+        self.__sessions__: Dict[uuid.UUID, TabSession] = dict()
+        # Browsers being taken from the wrapped pool, they are counted against its size
+        self.__acquiring__ = 0
+        self.__is_pool_ran__ = True
+        self.__lock__ = threading.Lock()
+        self.__tab_freed__ = threading.Condition(self.__lock__)
+
+        self.__validate_config__()
+
+    @property
+    def pool_size(self) -> int:
+        return self.pool.pool_size * self.tabs_per_browser
+
+    def get_session(self, timeout: float = 0) -> TabSession:
+        # Waits up to timeout seconds for a free tab, `None` waits without limit
+        browser = self.__reserve_tab__(timeout)
+        try:
+            handle, context_id = browser.open_tab()
+        except Exception:
+            self.__free_tab__(browser, is_broken=True)
+            raise
+        session = TabSession(uuid.uuid4(), browser, handle, context_id)
+        make_driver = TabWebDriver if isinstance(browser.driver, WebDriver) else LockedTabDriver
+        session.driver = make_driver(browser, handle, lambda: self.release_session(session.session_id))
+        with self.__lock__:
+            self.__sessions__[session.session_id] = session
+        return session
+
+    def release_session(self, session_id: uuid):
+        self.__close_tab__(session_id, is_broken=False)
+
+    def close_driver(self, session_id: uuid):
+        # Tab is closed and its browser gets no new tabs, it is closed once its other tabs are released
+        self.__close_tab__(session_id, is_broken=True)
+
+    def map(self,
+            fn: Callable[[TabSession, object], object],
+            items: Iterable[object],
+            concurrency: int = None,
+            timeout: float = None,
+            retries: int = 0) -> Iterator[TaskResult]:
+        # Same as map of the pools, tasks run in tabs, all tabs of the pool by default
+        return TaskRunner(self, fn, concurrency or self.pool_size, timeout, retries).run(items)
+
+    def close_pool(self, timeout: float = None):
+        with self.__lock__:
+            self.__is_pool_ran__ = False
+            self.__sessions__.clear()
+            self.__browsers__.clear()
+            self.__tab_freed__.notify_all()
+        # Browsers are quit with their tabs by the wrapped pool
+        self.pool.close_pool(timeout)
+
+    def __reserve_tab__(self, timeout: float) -> BrowserTabs:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.__lock__:
+            while True:
+                self.__check_pool_ran__()
+                free = [x for x in self.__browsers__ if not x.is_broken and x.tabs < self.tabs_per_browser]
+                if free:
+                    # Tabs are packed into the fullest browsers, so browsers are given back when load drops
+                    browser = max(free, key=lambda x: x.tabs)
+                    browser.tabs += 1
+                    return browser
+                if len(self.__browsers__) + self.__acquiring__ < self.pool.pool_size:
+                    self.__acquiring__ += 1
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise BrowserPoolGeneralException('All tabs of tab pool are in use.')
+                self.__tab_freed__.wait(remaining)
+        # Browser is taken without holding the lock, the wrapped pool can wait for it
+        try:
+            session = self.pool.get_session(timeout=None if deadline is None
+                                            else max(deadline - time.monotonic(), 0))
+        except Exception:
+            with self.__lock__:
+                self.__acquiring__ -= 1
+                self.__tab_freed__.notify()
+            raise
+        browser = BrowserTabs(session, self.isolate_tabs, self.__get_blocked_urls__(session))
+        browser.tabs = 1
+        with self.__lock__:
+            self.__acquiring__ -= 1
+            if self.__is_pool_ran__:
+                self.__browsers__.append(browser)
+                return browser
+        self.pool.release_session(session.session_id)
+        self.__check_pool_ran__()
+
+    def __close_tab__(self, session_id: uuid, is_broken: bool):
+        with self.__lock__:
+            session = self.__sessions__.pop(session_id, None)
+        if not session:
+            logging.warning('Tab {} already released or it was not opened.'.format(str(session_id)))
+            return
+        try:
+            session.browser.close_tab(session.window_handle, session.browser_context_id)
+        except WebDriverException as ex:
+            logging.warning('Failed to close tab {}: {}'.format(str(session_id), ex))
+            is_broken = True
+        self.__free_tab__(session.browser, is_broken)
+
+    def __free_tab__(self, browser: BrowserTabs, is_broken: bool):
+        with self.__lock__:
+            browser.tabs -= 1
+            browser.is_broken = browser.is_broken or is_broken
+            is_empty = browser.tabs == 0 and browser in self.__browsers__
+            if is_empty:
+                self.__browsers__.remove(browser)
+            self.__tab_freed__.notify()
+        if not is_empty:
+            return
+        if browser.is_broken:
+            self.pool.close_driver(browser.session.session_id)
+        else:
+            self.pool.release_session(browser.session.session_id)
+
+    def __get_blocked_urls__(self, session) -> List[str]:
+        # Urls blocked by configuration of the browser the session was started for
+        for browser in getattr(self.pool, 'browsers', ()):
+            if browser.name == session.browser:
+                return getattr(browser.config, 'blocked_urls', None)
+        return None
+
+    def __check_pool_ran__(self):
+        if not self.__is_pool_ran__:
+            raise BrowserPoolGeneralException('Tab pool is closed.')
+
+    def __validate_config__(self):
+        if self.tabs_per_browser < 1:
+            raise InvalidOrMissingConfigurationException('Tabs per browser should be greater than 0.')
@@ -0,0 +1,128 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator
+
+from selenium.common.exceptions import WebDriverException
+
+from src.exception.TaskTimeoutException import TaskTimeoutException
+
+
+class TaskResult:
+    """Outcome of the task of one item, error is set when the task failed on every attempt."""
+
+    def __init__(self, item, result=None, error: Exception = None, attempts: int = 1):
+        self.item = item
+        self.result = result
+        self.error = error
+        self.attempts = attempts
+
+
+class Task:
+    """Item which is processed, session is set while an attempt runs on it."""
+
+    def __init__(self, item):
+        self.item = item
+        self.session = None
+        self.started_at: float = None
+        self.is_timed_out = False
+        self.lock = threading.Lock()
+
+
+class TaskRunner:
+    """Runs fn(session, item) for items on sessions of the pool, at most `concurrency` tasks at a time.
+    Task whose driver raised is retried on a fresh session up to `retries` times, driver of the task which runs
+    longer than `timeout` seconds is closed, so the hung browser is recycled and the task is retried."""
+
+    def __init__(self, pool, fn: Callable, concurrency: int, timeout: float = None, retries: int = 0):
+        self.pool = pool
+        self.fn = fn
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+
+    def run(self, items: Iterable) -> Iterator[TaskResult]:
+        # Items are taken only when there is a free slot, so memory does not grow with the number of items
+        items = iter(items)
+        running: Dict[Future, Task] = dict()
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='pool-task')
+        try:
+            while True:
+                while len(running) < self.concurrency:
+                    task = Task(next(items, StopIteration))
+                    if task.item is StopIteration:
+                        break
+                    running[executor.submit(self.__run_task__, task)] = task
+                if not running:
+                    return
+                done, _ = wait(running, timeout=self.__next_timeout__(running.values()), return_when=FIRST_COMPLETED)
+                for future in done:
+                    del running[future]
+                    yield future.result()
+                self.__close_timed_out_sessions__(running.values())
+        finally:
+            for future in running:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def __run_task__(self, task: Task) -> TaskResult:
+        error = None
+        for attempt in range(1, self.retries + 2):
+            try:
+                session = self.pool.get_session(timeout=None)
+            except Exception as ex:
+                # Pool is closed, there is no session to retry on
+                return TaskResult(task.item, error=ex, attempts=attempt)
+            with task.lock:
+                task.session = session
+                task.started_at = time.monotonic()
+                task.is_timed_out = False
+            result = None
+            try:
+                result = self.fn(session, task.item)
+                error = None
+            except Exception as ex:
+                error = ex
+            with task.lock:
+                task.session = None
+                is_timed_out = task.is_timed_out
+            if is_timed_out and error is None:
+                # Task finished just as its driver was being closed by the runner
+                return TaskResult(task.item, result=result, attempts=attempt)
+            if is_timed_out:
+                # Driver was closed by the runner, its error only says that the browser is gone
+                error = TaskTimeoutException('Task timed out after {} seconds.'.format(self.timeout))
+            elif error is None:
+                self.pool.release_session(session.session_id)
+                return TaskResult(task.item, result=result, attempts=attempt)
+            elif isinstance(error, WebDriverException):
+                self.pool.close_driver(session.session_id)
+            else:
+                # Error of the task itself, the driver is fine and the task would fail again
+                self.pool.release_session(session.session_id)
+                return TaskResult(task.item, error=error, attempts=attempt)
+            logging.warning('Task of item {} failed on attempt {}: {}'.format(task.item, attempt, error))
+        return TaskResult(task.item, error=error, attempts=self.retries + 1)
+
+    def __next_timeout__(self, tasks):
+        if self.timeout is None:
+            return None
+        started = [x.started_at for x in tasks if x.session is not None and not x.is_timed_out]
+        if not started:
+            # Tasks wait for sessions, their attempts start when they get one
+            return self.timeout
+        return max(min(started) + self.timeout - time.monotonic(), 0)
+
+    def __close_timed_out_sessions__(self, tasks):
+        if self.timeout is None:
+            return
+        now = time.monotonic()
+        for task in tasks:
+            with task.lock:
+                if task.session is None or task.is_timed_out or now - task.started_at < self.timeout:
+                    continue
+                # Session is closed while task holds it, so session returned by the task to the pool is not touched
+                task.is_timed_out = True
+                session = task.session
+            self.pool.close_driver(session.session_id)
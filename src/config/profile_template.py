@@ -0,0 +1,68 @@
+import os
+import tempfile
+
+from selenium.webdriver import FirefoxProfile
+
+from src.exception.InvalidOrMissingConfigurationException import InvalidOrMissingConfigurationException
+from src.util.file_utils import clone_directory, remove_directory
+
+# Lock files of a running browser, clone of the template should not look like a profile which is in use
+PROFILE_LOCK_FILES = ('SingletonLock', 'SingletonSocket', 'SingletonCookie', 'lock', '.parentlock', 'parent.lock')
+PROFILE_DIR_PREFIX = 'browser-pool-profile-'
+
+
+class ProfileTemplate:
+    """Browser profile directory prepared once, e.g. with extensions and preferences, and cloned for every session.
+    Files are cloned copy on write where file system supports it, so a clone of heavy profile is cheap."""
+
+    def __init__(self, template_dir: str, clone_root: str = None):
+        if not os.path.isdir(template_dir):
+            raise InvalidOrMissingConfigurationException('Profile template directory does not exist.')
+        self.template_dir = template_dir
+        # Clones should be on the same file system as the template, otherwise they are copied
+        self.clone_root = clone_root
+
+    @staticmethod
+    def from_firefox_profile(firefox_profile: FirefoxProfile, clone_root: str = None):
+        # Preferences set on the profile are written to its user.js, so clones get them without encoding
+        firefox_profile.update_preferences()
+        return ProfileTemplate(firefox_profile.path, clone_root)
+
+    def clone(self) -> str:
+        profile_dir = tempfile.mkdtemp(prefix=PROFILE_DIR_PREFIX, dir=self.clone_root)
+        try:
+            clone_directory(self.template_dir, profile_dir, PROFILE_LOCK_FILES)
+        except Exception:
+            remove_directory(profile_dir)
+            raise
+        return profile_dir
+
+    @staticmethod
+    def remove(profile_dir: str):
+        remove_directory(profile_dir)
+
+
+class CachedFirefoxProfile(FirefoxProfile):
+    """Firefox profile which is zipped and encoded once instead of for every new driver.
+    Encoded profile is computed again after preferences or extensions are changed."""
+
+    def __init__(self, profile_directory=None):
+        self.__encoded__ = None
+        super().__init__(profile_directory)
+
+    def set_preference(self, key, value):
+        self.__encoded__ = None
+        super().set_preference(key, value)
+
+    def add_extension(self, extension=None):
+        self.__encoded__ = None
+        if extension is None:
+            super().add_extension()
+        else:
+            super().add_extension(extension)
+
+    @property
+    def encoded(self):
+        if self.__encoded__ is None:
+            self.__encoded__ = super().encoded
+        return self.__encoded__
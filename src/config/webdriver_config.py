@@ -1,28 +1,137 @@
+import base64
+import copy
+import json
+import time
+import traceback
 import uuid
-from typing import Dict, Union
+from typing import Dict, List, Union
 
 from selenium.webdriver import FirefoxProfile, DesiredCapabilities
 from selenium.webdriver.chrome import webdriver as chrome_driver
 from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.firefox import webdriver as firefox_driver
 from selenium.webdriver.firefox.options import Options as FirefoxOptions
-
-
-class FirefoxSession:
-    def __init__(self, session_id: uuid = None, driver: firefox_driver = None):
+from selenium.webdriver.remote.webdriver import WebDriver
+
+# Requests blocked by the fast scraping profile: fonts, media and analytics do not change content of pages
+FAST_SCRAPING_BLOCKED_URLS = ['*.woff*', '*.ttf*', '*.otf*', '*.eot*', '*.mp4*', '*.webm*', '*.mp3*', '*.ogg*',
+                              '*google-analytics.com/*', '*googletagmanager.com/*', '*doubleclick.net/*',
+                              '*connect.facebook.net/*']
+CHROME_FAST_SCRAPING_ARGUMENTS = ['--blink-settings=imagesEnabled=false',
+                                  '--mute-audio',
+                                  '--autoplay-policy=user-gesture-required',
+                                  '--disable-background-networking',
+                                  '--disable-component-update',
+                                  '--disable-default-apps',
+                                  '--disable-sync',
+                                  '--disable-domain-reliability',
+                                  '--disable-client-side-phishing-detection',
+                                  '--metrics-recording-only',
+                                  '--no-pings',
+                                  '--no-first-run']
+CHROME_FAST_SCRAPING_PREFERENCES = {'profile.managed_default_content_settings.images': 2,
+                                    'profile.managed_default_content_settings.media_stream': 2,
+                                    'profile.default_content_setting_values.notifications': 2}
+FIREFOX_FAST_SCRAPING_PREFERENCES = {'permissions.default.image': 2,
+                                     'gfx.downloadable_fonts.enabled': False,
+                                     'media.autoplay.default': 5,
+                                     'media.autoplay.blocking_policy': 2,
+                                     'media.peerconnection.enabled': False,
+                                     'network.prefetch-next': False,
+                                     'network.dns.disablePrefetch': True,
+                                     'network.http.speculative-parallel-limit': 0,
+                                     'browser.safebrowsing.malware.enabled': False,
+                                     'browser.safebrowsing.phishing.enabled': False,
+                                     'browser.safebrowsing.downloads.enabled': False,
+                                     'browser.newtabpage.enabled': False,
+                                     'browser.ping-centre.telemetry': False,
+                                     'datareporting.healthreport.uploadEnabled': False,
+                                     'datareporting.policy.dataSubmissionEnabled': False,
+                                     'toolkit.telemetry.enabled': False,
+                                     'app.update.auto': False,
+                                     'extensions.update.enabled': False}
+# Discard port of localhost, requests routed to it fail at once
+BLACKHOLE_PROXY = '127.0.0.1:9'
+
+
+class DriverSession:
+    """Browser session of a driver pool with bookkeeping of its uses, resources and lease."""
+
+    def __init__(self, session_id: uuid = None, driver: WebDriver = None):
         self.session_id: uuid = session_id
-        self.driver: firefox_driver = driver
+        self.driver: WebDriver = driver
+        # Number of times session was released back to the pool
+        self.uses: int = 0
+        # Monotonic time when session was put to idle sessions of the pool
+        self.idle_since: float = None
+        # Monotonic time when session was created, used to recycle sessions older than max age of the pool
+        self.created_at: float = time.monotonic()
+        # Process whose tree is the browser of the session and its last measured resident memory in bytes
+        self.root_pid: int = None
+        self.rss: int = None
+        # Clone of profile template used by the session, it is removed when session is quit
+        self.profile_dir: str = None
+        # Proxy the browser of the session was started with, pool reuses idle sessions of the requested proxy
+        self.proxy: str = None
+        # Monotonic time when session was given out and when the pool reclaims it, None without max hold time
+        self.leased_at: float = None
+        self.lease_expires_at: float = None
+        # Stack of the caller which took the session, reported when the session is reclaimed
+        self.lease_stack: List[traceback.FrameSummary] = None
+        # Priority class of the caller which holds the session, counted against reserved sessions of the classes
+        self.priority: str = None
+        # Name of the browser spec the session was started for, pools of several browsers route callers by it
+        self.browser: str = None
+        # Session was released and is reset in background, it keeps its slot until it becomes idle
+        self.is_released: bool = False
+
+
+class FirefoxSession(DriverSession):
+    driver: firefox_driver.WebDriver
 
 
 def add_capability(capabilities: Dict[str, Union[str, bool]], name: str, value: Union[str, bool]):
     capabilities[name] = value
 
 
-def set_proxy(capabilities: Dict[str, Union[str, bool]], proxy: str):
-    add_capability(capabilities, "proxy", Union["proxyType", "manual"])
-    add_capability(capabilities, "proxy", Union["httpProxy", proxy])
-    add_capability(capabilities, "proxy", Union["ftpProxy", proxy])
-    add_capability(capabilities, "proxy", Union["sslProxy", proxy])
+def get_proxy_capability(proxy: str) -> Dict[str, str]:
+    # Manual proxy for http and https traffic, browsers reject ftpProxy since they dropped ftp support
+    return {"proxyType": "manual", "httpProxy": proxy, "sslProxy": proxy}
+
+
+def set_proxy(capabilities: Dict[str, Union[str, bool, dict]], proxy: str):
+    add_capability(capabilities, "proxy", get_proxy_capability(proxy))
+
+
+def get_blocking_pac_url(blocked_urls: List[str], proxy: str = None) -> str:
+    # Proxy auto-config which sends blocked urls to the blackhole proxy and other urls to the proxy or directly
+    conditions = ' || '.join('shExpMatch(url, {})'.format(json.dumps(x)) for x in blocked_urls) or 'false'
+    route = 'PROXY {}'.format(proxy) if proxy else 'DIRECT'
+    script = 'function FindProxyForURL(url, host) {{ return ({}) ? "PROXY {}" : "{}"; }}'.format(
+        conditions, BLACKHOLE_PROXY, route)
+    return 'data:application/x-ns-proxy-autoconfig;base64,' + base64.b64encode(script.encode()).decode()
+
+
+def copy_with_proxy(config, proxy: str):
+    # Options are copied too, because driver merges desired capabilities into them
+    config_copy = copy.copy(config)
+    config_copy.proxy = proxy
+    config_copy.desired_capabilities = dict(config.desired_capabilities)
+    set_proxy(config_copy.desired_capabilities, proxy)
+    config_copy.options = copy.deepcopy(config.options)
+    config_copy.options.set_capability("proxy", get_proxy_capability(proxy))
+    return config_copy
+
+
+def get_launch_options(config):
+    # Options of one launch for providers which pass Firefox profile in options, e.g. remote and shared service drivers.
+    # Profile is set on a copy, so launches do not change options shared by the configuration
+    firefox_profile = getattr(config, 'firefox_profile', None)
+    if not firefox_profile:
+        return config.options
+    options = copy.deepcopy(config.options)
+    options.profile = firefox_profile
+    return options
 
 
 class FirefoxConfiguration:
@@ -30,7 +139,7 @@ class FirefoxConfiguration:
                  firefox_profile: FirefoxProfile = None,
                  proxy: str = None,
                  executable_path: str = None,
-                 options: FirefoxOptions = FirefoxOptions(),
+                 options: FirefoxOptions = None,
                  desired_capabilities: Dict[str, Union[str, bool]] = DesiredCapabilities.FIREFOX,
                  page_load_strategy: str = None,
                  log_path: str = None,
@@ -40,21 +149,68 @@ class FirefoxConfiguration:
         self.firefox_profile = firefox_profile
         self.proxy = proxy
         self.executable_path = executable_path
-        self.options = options
-        self.desired_capabilities = desired_capabilities
+        # Options are created per configuration, changes of one configuration must not leak to the others
+        self.options = options or FirefoxOptions()
+        # Capabilities are copied, so proxy and added capabilities do not change DesiredCapabilities defaults
+        self.desired_capabilities = dict(desired_capabilities)
         self.log_path = log_path
         self.service_log_path = service_log_path
         self.keep_alive = keep_alive
+        # Url patterns which browser does not request, set by the fast scraping profile
+        self.blocked_urls: List[str] = None
 
         self.options.headless = headless
         if page_load_strategy:
             self.options.page_load_strategy = page_load_strategy
+        if proxy:
+            set_proxy(self.desired_capabilities, proxy)
 
     def set_profile(self, firefox_profile: FirefoxProfile):
         self.firefox_profile = firefox_profile
 
+    def with_profile_dir(self, profile_dir: str):
+        # Copy of the configuration which starts browser in the profile dir instead of encoded firefox_profile
+        config = copy.copy(self)
+        config.firefox_profile = None
+        config.options = copy.deepcopy(self.options)
+        config.options.add_argument('-profile')
+        config.options.add_argument(profile_dir)
+        return config
+
     def with_proxy(self, proxy: str):
-        set_proxy(self.desired_capabilities, proxy)
+        self.proxy = proxy
+        if self.blocked_urls is not None:
+            self.__set_blocking_proxy_config__()
+        else:
+            set_proxy(self.desired_capabilities, proxy)
+
+    def for_proxy(self, proxy: str):
+        # Copy of the configuration which starts browser behind the proxy, used by pools to start sessions per proxy
+        if self.blocked_urls is None:
+            return copy_with_proxy(self, proxy)
+        config = copy.copy(self)
+        config.proxy = proxy
+        config.desired_capabilities = dict(self.desired_capabilities)
+        config.options = copy.deepcopy(self.options)
+        config.__set_blocking_proxy_config__()
+        return config
+
+    def set_fast_scraping_profile(self, blocked_urls: List[str] = None):
+        # Images, fonts, media, prefetching and telemetry are turned off, pages are returned once DOM is loaded
+        for name, value in FIREFOX_FAST_SCRAPING_PREFERENCES.items():
+            self.options.set_preference(name, value)
+        self.options.page_load_strategy = 'eager'
+        self.blocked_urls = list(FAST_SCRAPING_BLOCKED_URLS if blocked_urls is None else blocked_urls)
+        self.__set_blocking_proxy_config__()
+
+    def __set_blocking_proxy_config__(self):
+        # Firefox blocks urls by proxy auto-config, proxy capability would replace it, so the proxy is routed by it
+        self.desired_capabilities.pop('proxy', None)
+        self.options.capabilities.pop('proxy', None)
+        self.options.set_preference('network.proxy.type', 2)
+        self.options.set_preference('network.proxy.autoconfig_url', get_blocking_pac_url(self.blocked_urls, self.proxy))
+        # Firefox strips path of https urls given to proxy auto-config, url patterns need it
+        self.options.set_preference('network.proxy.autoconfig_url.include_path', True)
 
     def set_executable_path(self, executable_path: str):
         self.executable_path = executable_path
@@ -84,17 +240,15 @@ class FirefoxConfiguration:
         self.keep_alive = keep_alive
 
 
-class ChromeSession:
-    def __init__(self, session_id: uuid = None, driver: chrome_driver = None):
-        self.session_id: uuid = session_id
-        self.driver: chrome_driver = driver
+class ChromeSession(DriverSession):
+    driver: chrome_driver.WebDriver
 
 
 class ChromeConfiguration:
     def __init__(self,
                  proxy: str = None,
                  executable_path: str = None,
-                 options: ChromeOptions = ChromeOptions(),
+                 options: ChromeOptions = None,
                  desired_capabilities: Dict[str, Union[str, bool]] = DesiredCapabilities.CHROME,
                  page_load_strategy: str = None,
                  log_path: str = None,
@@ -103,19 +257,49 @@ class ChromeConfiguration:
                  headless: bool = False):
         self.proxy = proxy
         self.executable_path = executable_path
-        self.options = options
-        self.desired_capabilities = desired_capabilities
+        # Options are created per configuration, changes of one configuration must not leak to the others
+        self.options = options or ChromeOptions()
+        # Capabilities are copied, so proxy and added capabilities do not change DesiredCapabilities defaults
+        self.desired_capabilities = dict(desired_capabilities)
         self.log_path = log_path
         self.service_log_path = service_log_path
         self.keep_alive = keep_alive
+        # Url patterns which browser does not request, set by the fast scraping profile
+        self.blocked_urls: List[str] = None
 
         self.options.headless = headless
         if page_load_strategy:
             self.options.page_load_strategy = page_load_strategy
+        if proxy:
+            set_proxy(self.desired_capabilities, proxy)
 
     def set_proxy(self, proxy: str):
+        self.proxy = proxy
         set_proxy(self.desired_capabilities, proxy)
 
+    def for_proxy(self, proxy: str):
+        # Copy of the configuration which starts browser behind the proxy, used by pools to start sessions per proxy
+        return copy_with_proxy(self, proxy)
+
+    def set_fast_scraping_profile(self, blocked_urls: List[str] = None):
+        # Images, media, background networking and telemetry are turned off, pages are returned once DOM is loaded.
+        # Blocked urls are applied by driver providers through CDP, when the browser is started
+        for argument in CHROME_FAST_SCRAPING_ARGUMENTS:
+            if argument not in self.options.arguments:
+                self.options.add_argument(argument)
+        preferences = dict(self.options.experimental_options.get('prefs', dict()))
+        preferences.update(CHROME_FAST_SCRAPING_PREFERENCES)
+        self.options.add_experimental_option('prefs', preferences)
+        self.options.page_load_strategy = 'eager'
+        self.blocked_urls = list(FAST_SCRAPING_BLOCKED_URLS if blocked_urls is None else blocked_urls)
+
+    def with_profile_dir(self, profile_dir: str):
+        # Copy of the configuration which starts browser with the user data dir, options are copied as they are mutable
+        config = copy.copy(self)
+        config.options = copy.deepcopy(self.options)
+        config.options.add_argument('--user-data-dir={}'.format(profile_dir))
+        return config
+
     def set_executable_path(self, executable_path: str):
         self.executable_path = executable_path
 
@@ -0,0 +1,121 @@
+import http.client
+import json
+import logging
+import urllib.error
+import urllib.request
+from typing import Iterable
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from src.exception.BrowserPoolGeneralException import BrowserPoolGeneralException
+from src.util.webdriver_utils import create_remote_connection
+
+DEFAULT_REQUEST_TIMEOUT = 30
+
+
+class AttachedWebDriver(WebDriver):
+    """Remote driver attached to a browser session which was started by the pool daemon.
+    Quit asks the daemon to close the session, so the pool replaces it."""
+
+    def __init__(self, lease: dict, on_quit):
+        self.__lease__ = lease
+        self.__on_quit__ = on_quit
+        browser_name = lease['capabilities'].get('browserName')
+        super().__init__(command_executor=create_remote_connection(lease['executor_url'], browser_name))
+
+    def start_session(self, capabilities: dict, browser_profile=None):
+        # Session is already started by the daemon, the driver only takes it over
+        self.session_id = self.__lease__['webdriver_session_id']
+        self.caps = self.__lease__['capabilities']
+
+    def execute_cdp_cmd(self, cmd: str, cmd_args: dict):
+        return self.execute('executeCdpCommand', {'cmd': cmd, 'params': cmd_args})['value']
+
+    def quit(self):
+        self.stop_client()
+        on_quit, self.__on_quit__ = self.__on_quit__, None
+        if on_quit:
+            on_quit()
+
+
+class RemoteSession:
+    """Session leased from the pool daemon, its driver is attached on first use."""
+
+    def __init__(self, client, lease: dict):
+        self.session_id: str = lease['session_id']
+        self.proxy: str = lease['proxy']
+        self.lease = lease
+        self.__client__ = client
+        self.__driver__: AttachedWebDriver = None
+
+    @property
+    def driver(self) -> AttachedWebDriver:
+        if self.__driver__ is None:
+            if not self.lease['executor_url']:
+                raise BrowserPoolGeneralException('Session {} has no remote endpoint to attach to.'
+                                                  .format(self.session_id))
+            self.__driver__ = AttachedWebDriver(self.lease, lambda: self.__client__.close_driver(self.session_id))
+        return self.__driver__
+
+    def detach(self):
+        if self.__driver__ is not None:
+            self.__driver__.stop_client()
+            self.__driver__ = None
+
+
+class PoolClient:
+    """Client of the pool daemon with the same checkout methods as the pools,
+    so worker processes share browsers of one pool instead of starting own ones."""
+
+    def __init__(self, address: str, request_timeout: float = DEFAULT_REQUEST_TIMEOUT):
+        self.address = address.rstrip('/')
+        # Time to wait for the daemon on top of the time get_session waits for a free session
+        self.request_timeout = request_timeout
+        self.__sessions__ = dict()
+
+    def get_session(self, timeout: float = 0, proxy: str = None, max_hold: float = None, priority: str = None,
+                    browser: str = None, tags: Iterable[str] = None) -> RemoteSession:
+        body = {'timeout': timeout, 'proxy': proxy, 'max_hold': max_hold, 'priority': priority, 'browser': browser,
+                'tags': None if tags is None else list(tags)}
+        payload = self.__request__('/sessions', body, wait=timeout)
+        session = RemoteSession(self, json.loads(payload))
+        self.__sessions__[session.session_id] = session
+        return session
+
+    def release_session(self, session_id: str):
+        self.__give_back__(session_id, 'release')
+
+    def close_driver(self, session_id: str):
+        self.__give_back__(session_id, 'close')
+
+    def get_prometheus_metrics(self) -> str:
+        return self.__request__('/metrics').decode()
+
+    def __give_back__(self, session_id: str, action: str):
+        session = self.__sessions__.pop(session_id, None)
+        if session:
+            session.detach()
+        if self.__request__('/sessions/{}/{}'.format(session_id, action), dict(), allow_missing=True) is None:
+            logging.warning('Session {} already released or it was not leased.'.format(session_id))
+
+    def __request__(self, path: str, body: dict = None, wait: float = 0, allow_missing: bool = False):
+        data = None if body is None else json.dumps(body).encode()
+        request = urllib.request.Request(self.address + path, data=data,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=None if wait is None else wait + self.request_timeout) \
+                    as response:
+                return response.read()
+        except urllib.error.HTTPError as ex:
+            if ex.code == 404 and allow_missing:
+                return None
+            try:
+                message = json.loads(ex.read())['error']
+            except (ValueError, KeyError):
+                message = 'Pool daemon responded with status {}.'.format(ex.code)
+            raise BrowserPoolGeneralException(message)
+        except urllib.error.URLError as ex:
+            raise BrowserPoolGeneralException('Pool daemon {} is not reachable: {}'.format(self.address, ex.reason))
+        except (http.client.HTTPException, ConnectionError, TimeoutError) as ex:
+            # Daemon dropped the connection or did not answer in time
+            raise BrowserPoolGeneralException('Pool daemon {} failed to respond: {!r}'.format(self.address, ex))
@@ -0,0 +1,208 @@
+import argparse
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+from src.exception.BrowserPoolGeneralException import BrowserPoolGeneralException
+from src.exception.InvalidOrMissingConfigurationException import InvalidOrMissingConfigurationException
+
+DEFAULT_HOST = '127.0.0.1'
+# Port which is not taken by driver services, chromedriver listens on 9515 and geckodriver on 4444 by default
+DEFAULT_PORT = 9615
+# Worker process which died holding a lease does not give its session back, the pool reclaims it after this time
+DEFAULT_MAX_LEASE_TIME = 600
+
+
+def describe_session(session) -> dict:
+    # Everything a client in another process needs to attach to the browser of the session
+    driver = session.driver
+    command_executor = getattr(driver, 'command_executor', None)
+    return {'session_id': str(session.session_id),
+            'executor_url': getattr(command_executor, '_url', None),
+            'webdriver_session_id': driver.session_id,
+            'capabilities': getattr(driver, 'capabilities', None) or dict(),
+            'proxy': session.proxy}
+
+
+class PoolDaemon:
+    """Serves sessions of one pool to other processes over HTTP on localhost.
+    Leased session is described by the endpoint of its driver service, so clients drive the browser directly
+    and the daemon takes part only in checkout and release."""
+
+    def __init__(self, pool, host: str = DEFAULT_HOST, port: int = 0):
+        self.pool = pool
+        # Sessions given out to clients by their id
+        self.__leases__: Dict[str, object] = dict()
+        self.__lock__ = threading.Lock()
+        # Sessions reclaimed by the pool are not given back by their clients, so their leases are dropped then
+        self.pool.add_reclaim_listener(self.__forget__)
+        self.__server__ = ThreadingHTTPServer((host, port), PoolRequestHandler)
+        self.__server__.daemon_threads = True
+        self.__server__.pool_daemon = self
+        self.__thread__ = threading.Thread(target=self.__server__.serve_forever, name='pool-daemon', daemon=True)
+
+    @property
+    def address(self) -> str:
+        host, port = self.__server__.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def start(self):
+        # Serves requests on a background thread, serve_forever serves them on the calling one
+        self.__thread__.start()
+        return self
+
+    def serve_forever(self):
+        self.__server__.serve_forever()
+
+    def stop(self, close_pool: bool = True):
+        self.__server__.shutdown()
+        self.__server__.server_close()
+        if self.__thread__.is_alive():
+            self.__thread__.join()
+        self.pool.remove_reclaim_listener(self.__forget__)
+        if close_pool:
+            self.pool.close_pool()
+
+    def lease(self, timeout: float, proxy: str, max_hold: float = None, priority: str = None, browser: str = None,
+              tags: list = None) -> dict:
+        session = self.pool.get_session(timeout=timeout, proxy=proxy, max_hold=max_hold, priority=priority,
+                                        browser=browser, tags=tags)
+        with self.__lock__:
+            self.__leases__[str(session.session_id)] = session
+        return describe_session(session)
+
+    def release(self, session_id: str) -> bool:
+        with self.__lock__:
+            session = self.__leases__.pop(session_id, None)
+        if session is None:
+            return False
+        self.pool.release_session(session.session_id)
+        return True
+
+    def close(self, session_id: str) -> bool:
+        with self.__lock__:
+            session = self.__leases__.pop(session_id, None)
+        if session is None:
+            return False
+        self.pool.close_driver(session.session_id)
+        return True
+
+    def leases(self) -> list:
+        with self.__lock__:
+            sessions = list(self.__leases__.values())
+        return [describe_session(x) for x in sessions]
+
+    def __forget__(self, session):
+        with self.__lock__:
+            self.__leases__.pop(str(session.session_id), None)
+
+
+class PoolRequestHandler(BaseHTTPRequestHandler):
+    """HTTP API of the pool daemon:
+    POST /sessions leases a session, POST /sessions/<id>/release and POST /sessions/<id>/close give it back,
+    GET /sessions lists leased sessions and GET /metrics returns metrics of the pool in Prometheus format."""
+
+    def do_GET(self):
+        daemon = self.server.pool_daemon
+        if self.path == '/metrics':
+            self.__send__(200, daemon.pool.get_prometheus_metrics().encode(), 'text/plain; version=0.0.4')
+        elif self.path == '/sessions':
+            self.__send_json__(200, daemon.leases())
+        else:
+            self.__send_json__(404, {'error': 'Unknown path {}.'.format(self.path)})
+
+    def do_POST(self):
+        daemon = self.server.pool_daemon
+        parts = self.path.strip('/').split('/')
+        try:
+            if parts == ['sessions']:
+                body = self.__read_json__()
+                self.__send_json__(200, daemon.lease(body.get('timeout', 0), body.get('proxy'), body.get('max_hold'),
+                                                     body.get('priority'), body.get('browser'), body.get('tags')))
+                return
+            if len(parts) == 3 and parts[0] == 'sessions' and parts[2] in ('release', 'close'):
+                is_done = daemon.release(parts[1]) if parts[2] == 'release' else daemon.close(parts[1])
+                if is_done:
+                    self.__send_json__(200, {'session_id': parts[1]})
+                else:
+                    self.__send_json__(404, {'error': 'Session {} is not leased.'.format(parts[1])})
+                return
+        except BrowserPoolGeneralException as ex:
+            self.__send_json__(503, {'error': ex.message})
+            return
+        except InvalidOrMissingConfigurationException as ex:
+            self.__send_json__(400, {'error': ex.message})
+            return
+        except Exception as ex:
+            # Client gets the error instead of a dropped connection, the daemon keeps serving other requests
+            logging.exception('Pool daemon failed to serve {}'.format(self.path))
+            self.__send_json__(500, {'error': 'Pool daemon failed to serve {}: {}'.format(self.path, ex)})
+            return
+        self.__send_json__(404, {'error': 'Unknown path {}.'.format(self.path)})
+
+    def log_message(self, format, *args):
+        logging.debug('Pool daemon: ' + format % args)
+
+    def __read_json__(self) -> dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}') if length else dict()
+
+    def __send_json__(self, status: int, payload):
+        self.__send__(status, json.dumps(payload).encode(), 'application/json')
+
+    def __send__(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Serve browsers of one pool to worker processes.')
+    parser.add_argument('--browser', choices=['chrome', 'firefox'], default='chrome')
+    parser.add_argument('--executable-path', required=True, help='Path to chromedriver or geckodriver')
+    parser.add_argument('--pool-size', type=int, required=True)
+    parser.add_argument('--lazy', action='store_true', help='Start browsers on demand instead of up front')
+    parser.add_argument('--headless', action='store_true')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-lease-time', type=float, default=DEFAULT_MAX_LEASE_TIME,
+                        help='Seconds a client can hold a session before it is reclaimed, 0 disables reclaiming')
+    args = parser.parse_args(argv)
+    args.max_lease_time = args.max_lease_time or None
+    return args
+
+
+def main():
+    # Imported here, so the daemon module does not start to depend on both browsers for library users
+    from src.browser_pool import ChromeDriverPool, FirefoxDriverPool
+    from src.browser_pool.exit_handler import install_signal_handlers
+    from src.config.webdriver_config import ChromeConfiguration, FirefoxConfiguration
+
+    args = parse_args()
+
+    if args.browser == 'chrome':
+        pool = ChromeDriverPool(pool_size=args.pool_size, lazy_pool=args.lazy, max_lease_time=args.max_lease_time,
+                                chrome_config=ChromeConfiguration(executable_path=args.executable_path,
+                                                                  headless=args.headless))
+    else:
+        pool = FirefoxDriverPool(pool_size=args.pool_size, lazy_pool=args.lazy, max_lease_time=args.max_lease_time,
+                                 ff_config=FirefoxConfiguration(executable_path=args.executable_path,
+                                                                headless=args.headless))
+    daemon = PoolDaemon(pool, host=args.host, port=args.port)
+    # Browsers are closed when the daemon is terminated, not only on Ctrl+C
+    install_signal_handlers()
+    print('Serving {} browser pool on {}'.format(args.browser, daemon.address))
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.stop()
+
+
+if __name__ == '__main__':
+    main()
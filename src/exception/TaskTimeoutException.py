@@ -0,0 +1,6 @@
+class TaskTimeoutException(Exception):
+    """Exception raised when task run on pooled session takes longer than its timeout."""
+
+    def __init__(self, message='Task timed out.'):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,123 @@
+import bisect
+import logging
+import threading
+from typing import Callable, Dict, List, Tuple
+
+# Counters
+EXHAUSTED = 'exhausted'
+EVICTIONS = 'evictions'
+RECYCLES = 'recycles'
+LAUNCH_FAILURES = 'launch_failures'
+ADMISSION_TIMEOUTS = 'admission_timeouts'
+FORCE_KILLS = 'force_kills'
+WARM_UP_FAILURES = 'warm_up_failures'
+# Histograms, values are in seconds
+LAUNCH_SECONDS = 'launch_seconds'
+QUIT_SECONDS = 'quit_seconds'
+CHECKOUT_WAIT_SECONDS = 'checkout_wait_seconds'
+WARM_UP_SECONDS = 'warm_up_seconds'
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+METRIC_PREFIX = 'browser_pool_'
+
+
+class Histogram:
+    """Histogram with fixed upper bounds of buckets, last bucket counts values greater than all bounds."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> dict:
+        cumulative = 0
+        buckets = dict()
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {'buckets': buckets, 'sum': self.sum, 'count': self.count}
+
+
+class PoolMetrics:
+    """Counters and histograms of a browser pool.
+    Observers are called with metric name and value on every update, when there are none nothing is called."""
+
+    def __init__(self, browser_name: str):
+        self.browser_name = browser_name
+        self.__lock__ = threading.RLock()
+        self.__counters__: Dict[str, float] = {EXHAUSTED: 0, LAUNCH_FAILURES: 0, ADMISSION_TIMEOUTS: 0,
+                                              FORCE_KILLS: 0, WARM_UP_FAILURES: 0}
+        self.__histograms__: Dict[str, Histogram] = {LAUNCH_SECONDS: Histogram(),
+                                                     QUIT_SECONDS: Histogram(),
+                                                     CHECKOUT_WAIT_SECONDS: Histogram(),
+                                                     WARM_UP_SECONDS: Histogram()}
+        self.__observers__: List[Callable[[str, float], None]] = list()
+
+    def add_observer(self, observer: Callable[[str, float], None]):
+        self.__observers__.append(observer)
+
+    def remove_observer(self, observer: Callable[[str, float], None]):
+        self.__observers__.remove(observer)
+
+    def increment(self, name: str, value: float = 1):
+        with self.__lock__:
+            self.__counters__[name] += value
+        if self.__observers__:
+            self.notify(name, value)
+
+    def observe(self, name: str, value: float):
+        with self.__lock__:
+            self.__histograms__[name].observe(value)
+        if self.__observers__:
+            self.notify(name, value)
+
+    def snapshot(self, gauges: Dict[str, int], labeled_counters: Dict[str, Dict[str, int]] = None) -> dict:
+        # Gauges and labeled counters are owned by the pool and passed in, so they are read under pool lock
+        with self.__lock__:
+            return {'pool': self.browser_name.lower(),
+                    'gauges': dict(gauges),
+                    'counters': dict(self.__counters__),
+                    'labeled_counters': {k: dict(v) for k, v in (labeled_counters or dict()).items()},
+                    'histograms': {k: v.snapshot() for k, v in self.__histograms__.items()}}
+
+    def notify(self, name: str, value: float):
+        # Events which are not stored here, e.g. evictions counted by the pool, are passed to observers too
+        for observer in list(self.__observers__):
+            try:
+                observer(name, value)
+            except Exception as ex:
+                logging.warning('Metrics observer of {} browser pool failed: {}'.format(self.browser_name, ex))
+
+
+def render_prometheus(snapshot: dict) -> str:
+    # Renders snapshot of PoolMetrics in Prometheus text exposition format
+    pool = snapshot['pool']
+    lines = list()
+    for name, value in snapshot['gauges'].items():
+        metric = METRIC_PREFIX + name
+        lines.append('# TYPE {} gauge'.format(metric))
+        lines.append('{}{{pool="{}"}} {}'.format(metric, pool, value))
+    for name, value in snapshot['counters'].items():
+        metric = METRIC_PREFIX + name + '_total'
+        lines.append('# TYPE {} counter'.format(metric))
+        lines.append('{}{{pool="{}"}} {}'.format(metric, pool, value))
+    for name, values in snapshot['labeled_counters'].items():
+        metric = METRIC_PREFIX + name + '_total'
+        lines.append('# TYPE {} counter'.format(metric))
+        for reason, value in values.items():
+            lines.append('{}{{pool="{}",reason="{}"}} {}'.format(metric, pool, reason, value))
+    for name, histogram in snapshot['histograms'].items():
+        metric = METRIC_PREFIX + name
+        lines.append('# TYPE {} histogram'.format(metric))
+        for bound, count in histogram['buckets'].items():
+            le = '+Inf' if bound == float('inf') else repr(float(bound))
+            lines.append('{}_bucket{{pool="{}",le="{}"}} {}'.format(metric, pool, le, count))
+        lines.append('{}_sum{{pool="{}"}} {}'.format(metric, pool, histogram['sum']))
+        lines.append('{}_count{{pool="{}"}} {}'.format(metric, pool, histogram['count']))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,246 @@
+import json
+import logging
+import threading
+import time
+import urllib.request
+from typing import Callable, List
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from src.config.webdriver_config import get_launch_options
+from src.exception.InvalidOrMissingConfigurationException import InvalidOrMissingConfigurationException
+from src.util.webdriver_utils import create_remote_connection
+
+DEFAULT_MAX_FAILURES = 3
+DEFAULT_RETRY_AFTER = 30.0
+STATUS_TIMEOUT = 5
+
+
+class RemoteChromeDriver(webdriver.Remote):
+    """Remote Chrome driver with CDP commands, so the pool resets its sessions completely and reuses them."""
+
+    def execute_cdp_cmd(self, cmd: str, cmd_args: dict):
+        return self.execute('executeCdpCommand', {'cmd': cmd, 'params': cmd_args})['value']
+
+
+class RemoteDriverProvider:
+    """Driver provider which creates sessions on a remote WebDriver endpoint,
+    e.g. Selenium Grid or driver service running on another host."""
+
+    def __init__(self, url: str, status_timeout: float = STATUS_TIMEOUT):
+        self.url = url.rstrip('/')
+        self.status_timeout = status_timeout
+
+    def __call__(self, config) -> WebDriver:
+        options = get_launch_options(config)
+        browser_name = options.capabilities.get('browserName')
+        driver_class = RemoteChromeDriver if browser_name == 'chrome' else webdriver.Remote
+        return driver_class(command_executor=create_remote_connection(self.url, browser_name, config.keep_alive),
+                            options=options,
+                            desired_capabilities=config.desired_capabilities)
+
+    def is_ready(self) -> bool:
+        # W3C status endpoint tells whether the remote end can create new sessions
+        try:
+            with urllib.request.urlopen(self.url + '/status', timeout=self.status_timeout) as response:
+                return bool(json.loads(response.read())['value']['ready'])
+        except Exception as ex:
+            logging.warning('Status of remote WebDriver {} is not available: {}'.format(self.url, ex))
+            return False
+
+
+class DriverNode:
+    """Backend of the balancing provider which runs up to `capacity` sessions,
+    e.g. local driver provider or RemoteDriverProvider of another host.
+    `probe` tells whether the node can take sessions, it is called by health checks of the provider."""
+
+    def __init__(self,
+                 name: str,
+                 provider: Callable[[object], WebDriver],
+                 capacity: int,
+                 probe: Callable[[], bool] = None):
+        self.name = name
+        self.provider = provider
+        self.capacity = capacity
+        self.probe = probe
+        # State below is guarded by the lock of the provider.
+        # Sessions created or being created on the node
+        self.sessions = 0
+        self.failures = 0
+        self.unhealthy_until = 0.0
+        self.is_draining = False
+
+    @classmethod
+    def remote(cls, name: str, url: str, capacity: int):
+        provider = RemoteDriverProvider(url)
+        return cls(name, provider, capacity, probe=provider.is_ready)
+
+    @property
+    def is_healthy(self) -> bool:
+        return time.monotonic() >= self.unhealthy_until
+
+    @property
+    def is_drained(self) -> bool:
+        return self.is_draining and self.sessions == 0
+
+    @property
+    def load(self) -> float:
+        return self.sessions / self.capacity
+
+    def is_available(self) -> bool:
+        return self.is_healthy and not self.is_draining and self.sessions < self.capacity
+
+
+class BalancingDriverProvider:
+    """Driver provider which places sessions on several nodes, new session goes to the least loaded node.
+    Node which fails to start `max_failures` sessions in a row gets no sessions for `retry_after` seconds,
+    the failed session is started on the next node. Draining node gets no new sessions and pools quit
+    its sessions when they are released or checked, so it can be taken down once it is drained.
+    Pool size should not exceed total capacity of the nodes, checkouts over it fail to start drivers."""
+
+    def __init__(self,
+                 nodes: List[DriverNode],
+                 max_failures: int = DEFAULT_MAX_FAILURES,
+                 retry_after: float = DEFAULT_RETRY_AFTER,
+                 health_check_interval: float = None):
+        self.max_failures = max_failures
+        self.retry_after = retry_after
+        self.health_check_interval = health_check_interval
+        self.__nodes__: List[DriverNode] = list()
+        self.__lock__ = threading.RLock()
+        self.__stop_event__ = threading.Event()
+        self.__validate_config__()
+        for node in nodes:
+            self.add_node(node)
+        if health_check_interval:
+            threading.Thread(target=self.__run_health_checks__, name='balancing-provider-health', daemon=True).start()
+
+    def __call__(self, config) -> WebDriver:
+        tried = set()
+        last_error = None
+        while True:
+            node = self.__acquire__(tried)
+            if node is None:
+                if last_error is not None:
+                    raise last_error
+                raise WebDriverException('No driver node has free capacity.')
+            tried.add(node.name)
+            try:
+                driver = node.provider(config)
+            except Exception as ex:
+                logging.warning('Failed to start driver on node {}: {}'.format(node.name, ex))
+                self.__record_failure__(node)
+                last_error = ex
+                continue
+            with self.__lock__:
+                node.failures = 0
+            return self.__track__(driver, node)
+
+    def nodes(self) -> List[DriverNode]:
+        with self.__lock__:
+            return list(self.__nodes__)
+
+    def add_node(self, node: DriverNode):
+        if node.capacity < 1:
+            raise InvalidOrMissingConfigurationException('Capacity of node {} should be greater than 0.'
+                                                         .format(node.name))
+        with self.__lock__:
+            if any(x.name == node.name for x in self.__nodes__):
+                raise InvalidOrMissingConfigurationException('Node {} is already added.'.format(node.name))
+            self.__nodes__.append(node)
+
+    def remove_node(self, name: str) -> DriverNode:
+        # Sessions of the removed node keep running, they are quit by pools as usual
+        with self.__lock__:
+            node = self.__find_node__(name)
+            self.__nodes__.remove(node)
+            return node
+
+    def drain(self, name: str):
+        with self.__lock__:
+            self.__find_node__(name).is_draining = True
+
+    def resume(self, name: str):
+        with self.__lock__:
+            self.__find_node__(name).is_draining = False
+
+    def check_nodes(self):
+        # Probes are called without the lock, remote status can take a while
+        for node in self.nodes():
+            if node.probe is None:
+                continue
+            is_ready = node.probe()
+            with self.__lock__:
+                if is_ready:
+                    node.failures = 0
+                    node.unhealthy_until = 0.0
+                else:
+                    node.unhealthy_until = time.monotonic() + self.retry_after
+
+    def stop(self):
+        self.__stop_event__.set()
+
+    def __acquire__(self, tried: set) -> DriverNode:
+        with self.__lock__:
+            available = [x for x in self.__nodes__ if x.name not in tried and x.is_available()]
+            if not available:
+                return None
+            # Nodes of different capacity are balanced by share of capacity in use, ties go to the first node
+            node = min(available, key=lambda x: x.load)
+            node.sessions += 1
+            return node
+
+    def __record_failure__(self, node: DriverNode):
+        with self.__lock__:
+            node.sessions -= 1
+            node.failures += 1
+            if node.failures >= self.max_failures:
+                logging.warning('Node {} failed to start {} drivers in a row, it is skipped for {} seconds.'
+                                .format(node.name, node.failures, self.retry_after))
+                node.unhealthy_until = time.monotonic() + self.retry_after
+
+    def __track__(self, driver: WebDriver, node: DriverNode) -> WebDriver:
+        # Health check and release of pools see the node of the driver, so sessions of draining node are quit
+        driver.node = node
+        quit_driver = driver.quit
+        is_released = threading.Event()
+
+        def release():
+            # Pools can quit a driver more than once, e.g. reaper after a timed out quit
+            with self.__lock__:
+                if not is_released.is_set():
+                    is_released.set()
+                    node.sessions -= 1
+
+        def quit_and_release():
+            try:
+                quit_driver()
+            finally:
+                release()
+        driver.quit = quit_and_release
+        # Pools call it when processes of the driver are killed after its quit did not finish
+        driver.on_kill = release
+        return driver
+
+    def __find_node__(self, name: str) -> DriverNode:
+        for node in self.__nodes__:
+            if node.name == name:
+                return node
+        raise InvalidOrMissingConfigurationException('Unknown node {}.'.format(name))
+
+    def __run_health_checks__(self):
+        while not self.__stop_event__.wait(self.health_check_interval):
+            try:
+                self.check_nodes()
+            except Exception as ex:
+                logging.warning('Failed to check driver nodes: {}'.format(ex))
+
+    def __validate_config__(self):
+        if self.max_failures < 1:
+            raise InvalidOrMissingConfigurationException('Max failures should be greater than 0.')
+        if self.retry_after < 0:
+            raise InvalidOrMissingConfigurationException('Retry after should not be negative.')
+        if self.health_check_interval is not None and self.health_check_interval <= 0:
+            raise InvalidOrMissingConfigurationException('Health check interval should be greater than 0.')
@@ -0,0 +1,273 @@
+import itertools
+import random
+import threading
+import time
+import uuid
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from src.util.webdriver_utils import BLANK_PAGE, CLEAR_STORAGE_SCRIPT
+
+# Chrome keeps up to 50 pages in the history of a window
+MAX_HISTORY_ENTRIES = 50
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.__driver__ = driver
+
+    def window(self, handle: str):
+        if handle not in self.__driver__.window_handles:
+            raise WebDriverException('No such window: {}'.format(handle))
+        self.__driver__.current_window_handle = handle
+
+    def new_window(self, type_hint: str = None):
+        self.__driver__.open_window()
+
+
+class FakeWebDriver:
+    """In-process stand-in for selenium webdriver.
+    Implements commands used by the pool, so pool overhead can be measured and tested without browsers."""
+
+    def __init__(self, quit_latency: float = 0.0):
+        self.session_id = uuid.uuid4().hex
+        self.quit_latency = quit_latency
+        self.capabilities: Dict[str, object] = {'browserName': 'fake'}
+        self.__window_handles__: List[str] = [uuid.uuid4().hex]
+        self.current_window_handle = self.__window_handles__[0]
+        # Page of every window, windows which were not navigated show blank page
+        self.__urls__: Dict[str, str] = dict()
+        # History entries of every window as CDP returns them, entry ids are unique within the browser
+        self.__history__: Dict[str, List[dict]] = dict()
+        self.__entry_ids__ = itertools.count(1)
+        self.switch_to = FakeSwitchTo(self)
+        self.is_quit = False
+        self.is_crashed = False
+        self.__unfrozen__ = threading.Event()
+        self.__unfrozen__.set()
+        # Cookies and local storage by browser context and origin, windows opened in a context by CDP see only
+        # the state of the context, and pages see only the state of their origin
+        self.__cookies__: Dict[str, Dict[str, Dict[str, dict]]] = {None: dict()}
+        self.__storage__: Dict[str, Dict[str, Dict[str, str]]] = {None: dict()}
+        self.__window_contexts__: Dict[str, str] = dict()
+        # CDP commands sent to the driver with their parameters, and urls blocked in every window
+        self.cdp_commands: List[tuple] = list()
+        self.blocked_urls: Dict[str, List[str]] = dict()
+
+    @property
+    def window_handles(self) -> List[str]:
+        self.__check_alive__()
+        return list(self.__window_handles__)
+
+    @property
+    def current_url(self) -> str:
+        self.__check_alive__()
+        return self.__urls__.get(self.current_window_handle, BLANK_PAGE)
+
+    @property
+    def local_storage(self) -> Dict[str, str]:
+        # Local storage of the current page, it can be changed in place
+        self.__check_alive__()
+        return self.__storage__[self.__current_context__()].setdefault(self.__current_origin__(), dict())
+
+    def crash(self):
+        # Simulates browser which died, every following command fails
+        self.is_crashed = True
+
+    def freeze(self):
+        # Simulates browser which hangs, following commands block until unfreeze
+        self.__unfrozen__.clear()
+
+    def unfreeze(self):
+        self.__unfrozen__.set()
+
+    def get(self, url: str):
+        self.__check_alive__()
+        self.__urls__[self.current_window_handle] = url
+        history = self.__history__.setdefault(self.current_window_handle, list())
+        history.append({'id': next(self.__entry_ids__), 'url': url})
+        if len(history) > MAX_HISTORY_ENTRIES:
+            del history[0]
+
+    def open_window(self, context_id: str = None) -> str:
+        self.__check_alive__()
+        handle = uuid.uuid4().hex
+        self.__window_handles__.append(handle)
+        self.__window_contexts__[handle] = context_id
+        if context_id is None:
+            self.current_window_handle = handle
+        return handle
+
+    def close(self):
+        self.__check_alive__()
+        self.__window_handles__.remove(self.current_window_handle)
+
+    def execute_script(self, script: str, *args):
+        self.__check_alive__()
+        if script == CLEAR_STORAGE_SCRIPT:
+            self.local_storage.clear()
+
+    def execute_cdp_cmd(self, cmd: str, cmd_args: dict):
+        self.__check_alive__()
+        self.cdp_commands.append((cmd, cmd_args))
+        if cmd == 'Network.clearBrowserCookies':
+            self.__cookies__[self.__current_context__()].clear()
+        elif cmd == 'Storage.clearDataForOrigin':
+            context_id = self.__current_context__()
+            for state in (self.__cookies__[context_id], self.__storage__[context_id]):
+                if cmd_args['origin'] == '*':
+                    state.clear()
+                else:
+                    state.pop(cmd_args['origin'], None)
+        elif cmd == 'Network.setBlockedURLs':
+            self.blocked_urls[self.current_window_handle] = list(cmd_args['urls'])
+        elif cmd == 'Page.getNavigationHistory':
+            history = self.__history__.get(self.current_window_handle) or [{'id': 0, 'url': BLANK_PAGE}]
+            return {'currentIndex': len(history) - 1, 'entries': list(history)}
+        elif cmd == 'Target.createBrowserContext':
+            context_id = uuid.uuid4().hex
+            self.__cookies__[context_id] = dict()
+            self.__storage__[context_id] = dict()
+            return {'browserContextId': context_id}
+        elif cmd == 'Target.createTarget':
+            return {'targetId': self.open_window(cmd_args.get('browserContextId'))}
+        elif cmd == 'Target.disposeBrowserContext':
+            context_id = cmd_args['browserContextId']
+            self.__cookies__.pop(context_id)
+            self.__storage__.pop(context_id)
+            self.__window_handles__ = [x for x in self.__window_handles__
+                                       if self.__window_contexts__.get(x) != context_id]
+        return dict()
+
+    def add_cookie(self, cookie: dict):
+        self.__check_alive__()
+        self.__current_cookies__()[cookie['name']] = cookie
+
+    def get_cookie(self, name: str):
+        self.__check_alive__()
+        return self.__current_cookies__().get(name)
+
+    def get_cookies(self):
+        self.__check_alive__()
+        return list(self.__current_cookies__().values())
+
+    def delete_all_cookies(self):
+        self.__check_alive__()
+        self.__current_cookies__().clear()
+
+    def quit(self):
+        if self.quit_latency:
+            time.sleep(self.quit_latency)
+        self.is_quit = True
+
+    def __current_cookies__(self) -> Dict[str, dict]:
+        return self.__cookies__[self.__current_context__()].setdefault(self.__current_origin__(), dict())
+
+    def __current_context__(self) -> str:
+        return self.__window_contexts__.get(self.current_window_handle)
+
+    def __current_origin__(self) -> str:
+        url = urlsplit(self.current_url)
+        return '{}://{}'.format(url.scheme, url.netloc) if url.netloc else self.current_url
+
+    def __check_alive__(self):
+        self.__unfrozen__.wait()
+        if self.is_quit or self.is_crashed:
+            raise WebDriverException('Fake driver {} is not running.'.format(self.session_id))
+
+
+class FakeFirefoxWebDriver(FakeWebDriver):
+    """Fake driver of a browser without CDP, e.g. Firefox."""
+
+    @property
+    def execute_cdp_cmd(self):
+        raise AttributeError('Fake Firefox driver has no CDP commands.')
+
+
+class FakeCommandExecutor:
+    """Command executor of selenium remote driver which runs commands on FakeWebDriver instead of a driver service."""
+
+    COMMANDS = {
+        Command.GET: lambda driver, params: driver.get(params['url']),
+        Command.GET_CURRENT_URL: lambda driver, params: driver.current_url,
+        Command.W3C_GET_WINDOW_HANDLES: lambda driver, params: driver.window_handles,
+        Command.W3C_GET_CURRENT_WINDOW_HANDLE: lambda driver, params: driver.current_window_handle,
+        Command.SWITCH_TO_WINDOW: lambda driver, params: driver.switch_to.window(params['handle']),
+        Command.NEW_WINDOW: lambda driver, params: {'handle': driver.open_window(), 'type': 'tab'},
+        Command.CLOSE: lambda driver, params: driver.close(),
+        Command.ADD_COOKIE: lambda driver, params: driver.add_cookie(params['cookie']),
+        Command.GET_COOKIE: lambda driver, params: driver.get_cookie(params['name']),
+        Command.GET_ALL_COOKIES: lambda driver, params: driver.get_cookies(),
+        Command.DELETE_ALL_COOKIES: lambda driver, params: driver.delete_all_cookies(),
+        Command.W3C_EXECUTE_SCRIPT: lambda driver, params: driver.execute_script(params['script'], *params['args']),
+        Command.QUIT: lambda driver, params: driver.quit(),
+        'executeCdpCommand': lambda driver, params: driver.execute_cdp_cmd(params['cmd'], params['params']),
+    }
+
+    def __init__(self, driver: FakeWebDriver):
+        self.driver = driver
+
+    def execute(self, command: str, params: dict) -> dict:
+        if command not in self.COMMANDS:
+            raise WebDriverException('Fake driver does not support command {}.'.format(command))
+        return {'value': self.COMMANDS[command](self.driver, params)}
+
+    def close(self):
+        # Remote driver closes its connection on quit, fake driver has none
+        pass
+
+
+class FakeRemoteWebDriver(WebDriver):
+    """Selenium remote driver of FakeWebDriver, e.g. to test drivers which share the session of a pooled driver."""
+
+    def __init__(self, driver: FakeWebDriver):
+        self.fake_driver = driver
+        super().__init__(command_executor=FakeCommandExecutor(driver))
+
+    def start_session(self, capabilities: dict, browser_profile=None):
+        self.session_id = self.fake_driver.session_id
+        self.caps = self.fake_driver.capabilities
+
+    def execute_cdp_cmd(self, cmd: str, cmd_args: dict):
+        return self.execute('executeCdpCommand', {'cmd': cmd, 'params': cmd_args})['value']
+
+
+class FakeDriverProvider:
+    """Driver provider which starts FakeWebDriver with configured launch latency, quit latency and failure rate.
+    Can be passed to pools as driver_provider."""
+
+    def __init__(self,
+                 launch_latency: float = 0.0,
+                 quit_latency: float = 0.0,
+                 failure_rate: float = 0.0,
+                 seed: int = None,
+                 supports_cdp: bool = True,
+                 remote: bool = False):
+        self.launch_latency = launch_latency
+        self.quit_latency = quit_latency
+        self.failure_rate = failure_rate
+        # Drivers without CDP are started like Firefox drivers
+        self.driver_class = FakeWebDriver if supports_cdp else FakeFirefoxWebDriver
+        # Remote drivers are selenium drivers of the fake ones, launched keeps the fake drivers
+        self.remote = remote
+        self.__random__ = random.Random(seed)
+        self.__lock__ = threading.Lock()
+        self.launched: List[FakeWebDriver] = list()
+
+    def __call__(self, config=None):
+        if self.launch_latency:
+            time.sleep(self.launch_latency)
+        with self.__lock__:
+            if self.__random__.random() < self.failure_rate:
+                raise WebDriverException('Fake driver failed to start.')
+            driver = self.driver_class(quit_latency=self.quit_latency)
+            self.launched.append(driver)
+        return FakeRemoteWebDriver(driver) if self.remote else driver
+
+    def running_drivers(self) -> List[FakeWebDriver]:
+        with self.__lock__:
+            return [x for x in self.launched if not x.is_quit]
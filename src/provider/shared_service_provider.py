@@ -0,0 +1,207 @@
+import logging
+import threading
+from typing import Callable, List
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.service import Service as ChromeService
+from selenium.webdriver.common.service import Service
+from selenium.webdriver.firefox.service import Service as FirefoxService
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from src.config.webdriver_config import ChromeConfiguration, FirefoxConfiguration, get_launch_options
+from src.provider.webdriver_provider import apply_blocked_urls
+from src.util.webdriver_utils import create_remote_connection
+
+
+class SharedServiceDriver(WebDriver):
+    """Remote driver of a session created on a shared driver service.
+    Quit ends the browser session and gives its slot back, the service keeps running for next sessions."""
+
+    def __init__(self,
+                 service: Service,
+                 on_quit: Callable[[], None],
+                 browser_name: str,
+                 keep_alive: bool = True,
+                 **kwargs):
+        super().__init__(command_executor=create_remote_connection(service.service_url, browser_name, keep_alive),
+                         **kwargs)
+        # Health check of the pool polls service process, so sessions of the exited service are evicted
+        self.service = service
+        # Service process is not a part of the session, so it is not counted in memory of the session
+        self.is_service_shared = True
+        self.__on_quit__ = on_quit
+
+    def quit(self):
+        try:
+            super().quit()
+        finally:
+            on_quit, self.__on_quit__ = self.__on_quit__, None
+            if on_quit:
+                on_quit()
+
+
+class SharedServiceChromeDriver(SharedServiceDriver):
+    def execute_cdp_cmd(self, cmd: str, cmd_args: dict):
+        # Chromedriver serves CDP commands for remote sessions the same way as for local ones
+        return self.execute('executeCdpCommand', {'cmd': cmd, 'params': cmd_args})['value']
+
+
+class SharedDriverService:
+    """Driver service process used by several sessions, it is started again when the process exits."""
+
+    def __init__(self, make_service: Callable[[object], Service], browser_name: str):
+        self.__make_service__ = make_service
+        self.browser_name = browser_name
+        self.service: Service = None
+        # Sessions created or being created on the service
+        self.sessions = 0
+        self.__lock__ = threading.RLock()
+
+    def ensure_running(self, config) -> Service:
+        # Service is started by the first session which needs it, concurrent sessions wait for the start
+        with self.__lock__:
+            if self.service is not None and self.service.process.poll() is None:
+                return self.service
+            if self.service is not None:
+                logging.warning('{} driver service exited, it will be restarted.'.format(self.browser_name))
+                self.__stop_service__()
+            service = self.__make_service__(config)
+            service.start()
+            self.service = service
+            return service
+
+    def stop(self):
+        with self.__lock__:
+            self.__stop_service__()
+
+    def __stop_service__(self):
+        service, self.service = self.service, None
+        if service is None:
+            return
+        try:
+            service.stop()
+        except Exception as ex:
+            logging.warning('Failed to stop {} driver service: {}'.format(self.browser_name, ex))
+
+
+class SharedServiceDriverProvider:
+    """Driver provider which creates sessions on long living driver services instead of a service per session.
+    Sessions go to the least loaded of `service_count` services. When a service serves at most
+    `max_sessions_per_service` sessions, more services are started on demand and ones over `service_count`
+    are stopped once their sessions quit."""
+
+    def __init__(self,
+                 make_service: Callable[[object], Service],
+                 make_driver: Callable[[Service, Callable[[], None], object], WebDriver],
+                 browser_name: str,
+                 service_count: int = 1,
+                 max_sessions_per_service: int = None):
+        self.__make_service__ = make_service
+        self.__make_driver__ = make_driver
+        self.browser_name = browser_name
+        self.service_count = service_count
+        self.max_sessions_per_service = max_sessions_per_service
+        self.__services__: List[SharedDriverService] = list()
+        self.__lock__ = threading.RLock()
+        self.__is_stopped__ = False
+
+    def __call__(self, config) -> WebDriver:
+        shared = self.__acquire__()
+        is_released = threading.Event()
+
+        def release():
+            # Driver which fails after it is created quits itself, the slot must be given back only once
+            if not is_released.is_set():
+                is_released.set()
+                self.__release__(shared)
+        try:
+            service = shared.ensure_running(config)
+            return self.__make_driver__(service, release, config)
+        except Exception:
+            release()
+            raise
+
+    def services(self) -> List[SharedDriverService]:
+        with self.__lock__:
+            return list(self.__services__)
+
+    def stop(self):
+        # Sessions should be quit before, their browsers are closed by the services on stop
+        with self.__lock__:
+            self.__is_stopped__ = True
+            services = list(self.__services__)
+            self.__services__.clear()
+        for shared in services:
+            shared.stop()
+
+    def __acquire__(self) -> SharedDriverService:
+        with self.__lock__:
+            if self.__is_stopped__:
+                raise WebDriverException('Shared {} driver services are stopped.'.format(self.browser_name))
+            free = [x for x in self.__services__
+                    if self.max_sessions_per_service is None or x.sessions < self.max_sessions_per_service]
+            shared = min(free, key=lambda x: x.sessions, default=None)
+            if shared is None or (shared.sessions > 0 and len(self.__services__) < self.service_count):
+                shared = SharedDriverService(self.__make_service__, self.browser_name)
+                self.__services__.append(shared)
+            shared.sessions += 1
+            return shared
+
+    def __release__(self, shared: SharedDriverService):
+        with self.__lock__:
+            shared.sessions -= 1
+            is_surplus = shared.sessions == 0 and len(self.__services__) > self.service_count \
+                and shared in self.__services__
+            if is_surplus:
+                self.__services__.remove(shared)
+        if is_surplus:
+            shared.stop()
+
+
+class SharedChromeServiceProvider(SharedServiceDriverProvider):
+    """All sessions share `service_count` chromedriver processes, chromedriver serves many sessions at once."""
+
+    def __init__(self, service_count: int = 1):
+        super().__init__(make_service=self.__make_chrome_service__,
+                         make_driver=self.__make_chrome_driver__,
+                         browser_name='Chrome',
+                         service_count=service_count)
+
+    @staticmethod
+    def __make_chrome_service__(chrome_config: ChromeConfiguration) -> Service:
+        return ChromeService(executable_path=chrome_config.executable_path,
+                             log_path=chrome_config.service_log_path)
+
+    @staticmethod
+    def __make_chrome_driver__(service: Service, on_quit: Callable[[], None], chrome_config: ChromeConfiguration):
+        driver = SharedServiceChromeDriver(service, on_quit, 'chrome',
+                                           options=chrome_config.options,
+                                           desired_capabilities=chrome_config.desired_capabilities,
+                                           keep_alive=chrome_config.keep_alive)
+        apply_blocked_urls(driver, chrome_config)
+        return driver
+
+
+class SharedFirefoxServiceProvider(SharedServiceDriverProvider):
+    """Geckodriver serves one session at a time, so its processes are reused by next sessions instead.
+    `service_count` processes are kept running when sessions quit."""
+
+    def __init__(self, service_count: int = 1):
+        super().__init__(make_service=self.__make_firefox_service__,
+                         make_driver=self.__make_firefox_driver__,
+                         browser_name='Firefox',
+                         service_count=service_count,
+                         max_sessions_per_service=1)
+
+    @staticmethod
+    def __make_firefox_service__(ff_config: FirefoxConfiguration) -> Service:
+        return FirefoxService(executable_path=ff_config.executable_path,
+                              log_path=ff_config.service_log_path or ff_config.log_path or 'geckodriver.log')
+
+    @staticmethod
+    def __make_firefox_driver__(service: Service, on_quit: Callable[[], None], ff_config: FirefoxConfiguration):
+        # Profile is set on options of this launch, options of the configuration are shared by concurrent launches
+        return SharedServiceDriver(service, on_quit, 'firefox',
+                                   options=get_launch_options(ff_config),
+                                   desired_capabilities=ff_config.desired_capabilities,
+                                   keep_alive=ff_config.keep_alive)
@@ -2,6 +2,7 @@ from selenium import webdriver
 
 from src.config.webdriver_config import ChromeConfiguration
 from src.config.webdriver_config import FirefoxConfiguration
+from src.util.webdriver_utils import block_urls
 
 
 def provide_firefox_driver(ff_config: FirefoxConfiguration):
@@ -15,8 +16,21 @@ def provide_firefox_driver(ff_config: FirefoxConfiguration):
 
 
 def provide_chrome_driver(chrome_config: ChromeConfiguration):
-    return webdriver.Chrome(executable_path=chrome_config.executable_path,
-                            options=chrome_config.options,
-                            desired_capabilities=chrome_config.desired_capabilities,
-                            service_log_path=chrome_config.service_log_path,
-                            keep_alive=chrome_config.keep_alive)
+    driver = webdriver.Chrome(executable_path=chrome_config.executable_path,
+                              options=chrome_config.options,
+                              desired_capabilities=chrome_config.desired_capabilities,
+                              service_log_path=chrome_config.service_log_path,
+                              keep_alive=chrome_config.keep_alive)
+    apply_blocked_urls(driver, chrome_config)
+    return driver
+
+
+def apply_blocked_urls(driver, chrome_config: ChromeConfiguration):
+    # Chrome has no preference for blocked urls, they are set on the started browser, which is quit if it fails
+    if not chrome_config.blocked_urls:
+        return
+    try:
+        block_urls(driver, chrome_config.blocked_urls)
+    except Exception:
+        driver.quit()
+        raise
@@ -0,0 +1,128 @@
+import os
+import signal
+from typing import Dict, List
+
+PROC_DIR = '/proc'
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+# Windows has no SIGKILL, os.kill terminates the process there for any signal
+KILL_SIGNAL = getattr(signal, 'SIGKILL', signal.SIGTERM)
+HAS_CHILDREN_FILES = os.path.exists(os.path.join(PROC_DIR, 'self', 'task', str(os.getpid()), 'children'))
+
+
+def is_proc_available():
+    # Process accounting works only where /proc is mounted, i.e. on Linux
+    return os.path.isdir(os.path.join(PROC_DIR, 'self', 'task'))
+
+
+def get_parent_pids() -> Dict[int, int]:
+    # Parent of every running process, read from /proc/<pid>/stat
+    parents = dict()
+    for name in os.listdir(PROC_DIR):
+        if not name.isdigit():
+            continue
+        try:
+            with open(os.path.join(PROC_DIR, name, 'stat')) as stat:
+                # Process name is in parentheses and can contain spaces, fields after it are separated by spaces
+                fields = stat.read().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            # Process exited while /proc was read
+            continue
+        parents[int(name)] = int(fields[1])
+    return parents
+
+
+def get_child_pids(pid: int) -> List[int]:
+    if not HAS_CHILDREN_FILES:
+        # Kernel is built without children files, parents of all processes are read instead
+        return [child for child, parent in get_parent_pids().items() if parent == pid]
+    children = list()
+    task_dir = os.path.join(PROC_DIR, str(pid), 'task')
+    try:
+        tids = os.listdir(task_dir)
+    except OSError:
+        return children
+    for tid in tids:
+        try:
+            with open(os.path.join(task_dir, tid, 'children')) as children_file:
+                children.extend(int(x) for x in children_file.read().split())
+        except OSError:
+            # Thread exited while children were read
+            continue
+    return children
+
+
+def get_process_tree(pid: int) -> List[int]:
+    # Process and all its descendants, e.g. driver service, browser and its renderer processes
+    tree = list()
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        if not os.path.isdir(os.path.join(PROC_DIR, str(current))):
+            continue
+        tree.append(current)
+        pending.extend(get_child_pids(current))
+    return tree
+
+
+def kill_process_tree(pid: int) -> int:
+    # Tree is read before the kill, children of a killed parent move to init and could not be found afterwards.
+    # Without /proc only the process itself is known. Returns number of killed processes
+    pids = get_process_tree(pid) if is_proc_available() else [pid]
+    killed = 0
+    for x in pids:
+        try:
+            os.kill(x, KILL_SIGNAL)
+        except OSError:
+            # Process exited meanwhile
+            continue
+        killed += 1
+    return killed
+
+
+def get_rss(pid: int) -> int:
+    # Resident set size in bytes, 0 when process is not running
+    try:
+        with open(os.path.join(PROC_DIR, str(pid), 'statm')) as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError):
+        return 0
+
+
+def get_process_tree_rss(pid: int) -> int:
+    # Shared pages are counted in every process, so the sum is an upper bound of memory used by the tree
+    return sum(get_rss(x) for x in get_process_tree(pid))
+
+
+def find_pids_by_argument(argument: str) -> List[int]:
+    pids = list()
+    for name in os.listdir(PROC_DIR):
+        if not name.isdigit():
+            continue
+        try:
+            with open(os.path.join(PROC_DIR, name, 'cmdline'), 'rb') as cmdline:
+                arguments = cmdline.read().split(b'\0')
+        except OSError:
+            continue
+        if argument.encode() in arguments:
+            pids.append(int(name))
+    return pids
+
+
+def get_available_memory():
+    # Memory which can be used by new processes without swapping in bytes, None when it is not known
+    try:
+        with open(os.path.join(PROC_DIR, 'meminfo')) as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+def get_load_per_cpu():
+    # One minute load average divided by number of CPUs, None when it is not known
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
@@ -1,9 +1,44 @@
 import os
+from typing import List, Set
+from urllib.parse import urlsplit
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chromium.remote_connection import ChromiumRemoteConnection
+from selenium.webdriver.remote.remote_connection import RemoteConnection
+from selenium.webdriver.remote.webdriver import WebDriver, get_remote_connection
 
 from src.exception.UnsupportedOperationSystemException import UnsupportedOperationSystemException
+from src.util.process_utils import find_pids_by_argument, get_parent_pids, is_proc_available, kill_process_tree
 
 GECKODRIVER = 'geckodriver'
 CHROMEDRIVER = 'chromedriver'
+BLANK_PAGE = 'about:blank'
+CLEAR_STORAGE_SCRIPT = 'window.localStorage.clear(); window.sessionStorage.clear();'
+# Reasons why driver is evicted from the pool
+SERVICE_EXITED = 'service_exited'
+UNRESPONSIVE = 'unresponsive'
+LEASE_EXPIRED = 'lease_expired'
+# Reason why driver is evicted or quit on release, its node of BalancingDriverProvider is drained
+DRAINING = 'draining'
+# Reasons why driver is quit instead of reused when it is released
+MAX_USES = 'max_uses'
+MAX_AGE = 'max_age'
+MAX_RSS = 'max_rss'
+# Browser cannot clear cookies and storage of all origins, e.g. Firefox without CDP, and pool requires full reset
+NO_FULL_RESET = 'no_full_reset'
+
+
+def create_remote_connection(url: str, browser_name: str, keep_alive: bool = True) -> RemoteConnection:
+    # Selenium picks plain connection for chrome, it does not know CDP commands used to reset session state
+    if browser_name == 'chrome':
+        return ChromiumRemoteConnection(url, vendor_prefix='goog', browser_name=browser_name, keep_alive=keep_alive)
+    return get_remote_connection({'browserName': browser_name}, url, keep_alive=keep_alive)
+
+
+def block_urls(driver: WebDriver, blocked_urls: List[str]):
+    # Chrome fails requests of the window to matching urls, so they take neither time nor bandwidth
+    driver.execute_cdp_cmd('Network.enable', dict())
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(blocked_urls)})
 
 
 def get_chrome_driver_name_for_current_os():
@@ -22,3 +57,115 @@ def get_firefox_driver_name_for_current_os():
     elif system == 'posix':
         return GECKODRIVER
     raise UnsupportedOperationSystemException()
+
+
+def can_reset_driver_state(driver: WebDriver) -> bool:
+    # Webdriver commands clear cookies and storage of the current origin only, Chromium clears all of them by CDP
+    return hasattr(driver, 'execute_cdp_cmd')
+
+
+def reset_driver_state(driver: WebDriver):
+    # Brings browser back to the state of a new session, so it can be reused by next pool user
+    is_full_reset = can_reset_driver_state(driver)
+    # History entries up to this id were visited before the last reset, which cleared their state
+    reset_entry_id = getattr(driver, 'reset_entry_id', 0)
+    last_entry_id = reset_entry_id
+    origins = set()
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        if is_full_reset:
+            last_entry_id = max(last_entry_id, collect_visited_origins(driver, reset_entry_id, origins))
+        driver.close()
+    driver.switch_to.window(handles[0])
+    if is_full_reset:
+        last_entry_id = max(last_entry_id, collect_visited_origins(driver, reset_entry_id, origins))
+        driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        # Wildcard origin is not supported by every Chromium version, so visited origins are cleared one by one too
+        for origin in ['*'] + sorted(origins):
+            driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+        driver.reset_entry_id = last_entry_id
+    else:
+        try:
+            driver.execute_script(CLEAR_STORAGE_SCRIPT)
+        except WebDriverException:
+            # Storage is not accessible on pages like about:blank or data: urls
+            pass
+        driver.delete_all_cookies()
+    driver.get(BLANK_PAGE)
+
+
+def collect_visited_origins(driver: WebDriver, after_entry_id: int, origins: Set[str]) -> int:
+    # Adds origins of pages in the history of the current window which were opened after the entry,
+    # returns id of the newest entry. Entry ids grow across all windows of the browser, so older entries are skipped
+    last_entry_id = after_entry_id
+    for entry in reversed(driver.execute_cdp_cmd('Page.getNavigationHistory', {}).get('entries', ())):
+        entry_id = entry.get('id')
+        if entry_id is not None:
+            if entry_id <= after_entry_id:
+                break
+            last_entry_id = max(last_entry_id, entry_id)
+        url = entry.get('url', '')
+        if url.startswith('http'):
+            url = urlsplit(url)
+            if url.netloc:
+                origins.add('{}://{}'.format(url.scheme, url.netloc))
+    return last_entry_id
+
+
+def check_driver_health(driver: WebDriver):
+    # Returns reason why driver cannot be used or None when it is alive
+    if is_driver_draining(driver):
+        return DRAINING
+    service = getattr(driver, 'service', None)
+    process = getattr(service, 'process', None)
+    if process is not None and process.poll() is not None:
+        return SERVICE_EXITED
+    try:
+        # Cheap command which goes through driver service to the browser
+        driver.window_handles
+    except Exception:
+        return UNRESPONSIVE
+    return None
+
+
+def is_driver_draining(driver: WebDriver) -> bool:
+    # Node is set on drivers started by BalancingDriverProvider
+    node = getattr(driver, 'node', None)
+    return node is not None and node.is_draining
+
+
+def get_driver_root_pid(driver: WebDriver):
+    # Process whose tree holds the browser of the driver, None when it cannot be found
+    if not is_proc_available():
+        return None
+    service = getattr(driver, 'service', None)
+    process = getattr(service, 'process', None)
+    if process is not None and not getattr(driver, 'is_service_shared', False):
+        # Driver service started for this driver is the parent of the browser and its renderers
+        return process.pid
+    capabilities = getattr(driver, 'capabilities', None) or dict()
+    if 'moz:processID' in capabilities:
+        return capabilities['moz:processID']
+    user_data_dir = (capabilities.get('chrome') or dict()).get('userDataDir')
+    if not user_data_dir:
+        return None
+    # Every Chrome process of the session gets the same profile dir, the browser is the one started by the service
+    pids = find_pids_by_argument('--user-data-dir={}'.format(user_data_dir))
+    parents = get_parent_pids()
+    browsers = [x for x in pids if parents.get(x) not in pids]
+    return browsers[0] if browsers else None
+
+
+def kill_driver_processes(driver: WebDriver, root_pid: int = None) -> int:
+    # Last resort for driver which did not quit, shared driver service is spared as other sessions use it.
+    # Returns number of killed processes
+    pid = root_pid or get_driver_root_pid(driver)
+    if pid is not None:
+        return kill_process_tree(pid)
+    process = getattr(getattr(driver, 'service', None), 'process', None)
+    if process is None or getattr(driver, 'is_service_shared', False) or process.poll() is not None:
+        return 0
+    # Processes are not known without /proc, the browser loses its driver service at least
+    process.kill()
+    return 1
@@ -0,0 +1,60 @@
+import asyncio
+import os
+from unittest import IsolatedAsyncioTestCase
+
+from src.browser_pool import AsyncChromeDriverPool
+from src.config.webdriver_config import ChromeConfiguration
+from src.exception.BrowserPoolGeneralException import BrowserPoolGeneralException
+from src.util.webdriver_utils import get_chrome_driver_name_for_current_os
+
+CHROME_DRIVER_DIR = os.getenv('BROWSER_POOL_WEBDRIVER_DIR', None)
+CHROME_EXECUTABLE_PATH = os.path.join(CHROME_DRIVER_DIR, get_chrome_driver_name_for_current_os())
+URL_GOOGLE = 'https://google.com'
+
+
+def __get_headless_async_chrome_pool__(pool_size: int, lazy: bool):
+    headless_config = ChromeConfiguration(executable_path=CHROME_EXECUTABLE_PATH, headless=True)
+    return AsyncChromeDriverPool(pool_size=pool_size, lazy_pool=lazy, chrome_config=headless_config)
+
+
+class TestAsyncChromeDriverPool(IsolatedAsyncioTestCase):
+    async def test_init_and_destroy_pool_not_raise_exceptions(self):
+        pool_size = 3
+        try:
+            async with __get_headless_async_chrome_pool__(pool_size=pool_size, lazy=False) as chrome_pool:
+                assert len(chrome_pool.pool.__preallocated_pool__) == pool_size
+            assert len(chrome_pool.pool.__pool__) == 0
+            assert len(chrome_pool.pool.__preallocated_pool__) == 0
+        except Exception:
+            self.fail("Code raised exception unexpectedly!")
+
+    async def test_many_tasks_share_small_pool(self):
+        pool_size = 2
+        chrome_pool = __get_headless_async_chrome_pool__(pool_size=pool_size, lazy=True)
+        urls = list()
+
+        async def task():
+            async with chrome_pool.session() as session:
+                await asyncio.get_running_loop().run_in_executor(None, session.driver.get, URL_GOOGLE)
+                urls.append(session.driver.current_url)
+
+        try:
+            await asyncio.gather(*[task() for x in range(0, 10)])
+            assert len(urls) == 10
+            # Released sessions are idle or still reset in background
+            assert len(chrome_pool.get_lease_report()['active']) == 0
+            assert len(chrome_pool.pool.__pool__) + len(chrome_pool.pool.__preallocated_pool__) == pool_size
+        finally:
+            await chrome_pool.aclose()
+        assert len(chrome_pool.pool.__preallocated_pool__) == 0
+
+    async def test_throws_exception_when_acquire_timeout_expired(self):
+        chrome_pool = __get_headless_async_chrome_pool__(pool_size=1, lazy=True)
+        try:
+            await chrome_pool.acquire()
+            await chrome_pool.acquire(timeout=1)
+        except BrowserPoolGeneralException as ex:
+            assert ex.message == 'Reached limit of drivers in Chrome browser pool.'
+        finally:
+            await chrome_pool.aclose()
+        assert len(chrome_pool.pool.__pool__) == 0
@@ -0,0 +1,60 @@
+import asyncio
+import os
+from unittest import IsolatedAsyncioTestCase
+
+from src.browser_pool import AsyncFirefoxDriverPool
+from src.config.webdriver_config import FirefoxConfiguration
+from src.exception.BrowserPoolGeneralException import BrowserPoolGeneralException
+from src.util.webdriver_utils import get_firefox_driver_name_for_current_os
+
+FIREFOX_DRIVER_DIR = os.getenv('BROWSER_POOL_WEBDRIVER_DIR', None)
+FIREFOX_EXECUTABLE_PATH = os.path.join(FIREFOX_DRIVER_DIR, get_firefox_driver_name_for_current_os())
+URL_GOOGLE = 'https://google.com'
+
+
+def __get_headless_async_ff_pool__(pool_size: int, lazy: bool):
+    headless_config = FirefoxConfiguration(executable_path=FIREFOX_EXECUTABLE_PATH, headless=True)
+    return AsyncFirefoxDriverPool(pool_size=pool_size, lazy_pool=lazy, ff_config=headless_config)
+
+
+class TestAsyncFirefoxDriverPool(IsolatedAsyncioTestCase):
+    async def test_init_and_destroy_pool_not_raise_exceptions(self):
+        pool_size = 3
+        try:
+            async with __get_headless_async_ff_pool__(pool_size=pool_size, lazy=False) as ff_pool:
+                assert len(ff_pool.pool.__preallocated_pool__) == pool_size
+            assert len(ff_pool.pool.__pool__) == 0
+            assert len(ff_pool.pool.__preallocated_pool__) == 0
+        except Exception:
+            self.fail("Code raised exception unexpectedly!")
+
+    async def test_many_tasks_share_small_pool(self):
+        pool_size = 2
+        ff_pool = __get_headless_async_ff_pool__(pool_size=pool_size, lazy=True)
+        urls = list()
+
+        async def task():
+            async with ff_pool.session() as session:
+                await asyncio.get_running_loop().run_in_executor(None, session.driver.get, URL_GOOGLE)
+                urls.append(session.driver.current_url)
+
+        try:
+            await asyncio.gather(*[task() for x in range(0, 10)])
+            assert len(urls) == 10
+            # Released sessions are idle or still reset in background
+            assert len(ff_pool.get_lease_report()['active']) == 0
+            assert len(ff_pool.pool.__pool__) + len(ff_pool.pool.__preallocated_pool__) == pool_size
+        finally:
+            await ff_pool.aclose()
+        assert len(ff_pool.pool.__preallocated_pool__) == 0
+
+    async def test_throws_exception_when_acquire_timeout_expired(self):
+        ff_pool = __get_headless_async_ff_pool__(pool_size=1, lazy=True)
+        try:
+            await ff_pool.acquire()
+            await ff_pool.acquire(timeout=1)
+        except BrowserPoolGeneralException as ex:
+            assert ex.message == 'Reached limit of drivers in Firefox browser pool.'
+        finally:
+            await ff_pool.aclose()
+        assert len(ff_pool.pool.__pool__) == 0
@@ -1,4 +1,6 @@
 import os
+import threading
+import time
 from unittest import TestCase
 
 from selenium.webdriver.common.by import By
@@ -26,6 +28,13 @@ def __get_headful_chrome_pool__(pool_size: int, lazy: bool):
     return ChromeDriverPool(pool_size=pool_size, lazy_pool=lazy, chrome_config=config)
 
 
+def __wait_until__(predicate, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.1)
+    return predicate()
+
+
 class TestChromeDriverPool(TestCase):
     def test_init_and_destroy_pool_not_raise_exceptions(self):
         pool_size = 3
@@ -116,6 +125,33 @@ class TestChromeDriverPool(TestCase):
         assert len(chrome_pool.__pool__) == 0
         assert len(chrome_pool.__preallocated_pool__) == 0
 
+    def test_get_session_waits_for_closed_driver_until_timeout(self):
+        pool_size = 1
+        chrome_pool = __get_headless_chrome_pool__(pool_size=pool_size, lazy=True)
+        try:
+            session = chrome_pool.get_session()
+            threading.Timer(1, chrome_pool.close_driver, args=[session.session_id]).start()
+            waited_session = chrome_pool.get_session(timeout=30)
+            assert waited_session.session_id != session.session_id
+            assert len(chrome_pool.__pool__) == 1
+            chrome_pool.close_pool()
+        except Exception:
+            chrome_pool.close_pool()
+            self.fail("Code raised exception unexpectedly!")
+        assert len(chrome_pool.__pool__) == 0
+
+    def test_throws_exception_when_get_session_timeout_expired(self):
+        pool_size = 1
+        chrome_pool = __get_headless_chrome_pool__(pool_size=pool_size, lazy=False)
+        try:
+            chrome_pool.get_session()
+            chrome_pool.get_session(timeout=1)
+        except BrowserPoolGeneralException as ex:
+            chrome_pool.close_pool()
+            assert ex.message == 'Reached limit of drivers in Chrome browser pool.'
+        assert len(chrome_pool.__pool__) == 0
+        assert len(chrome_pool.__preallocated_pool__) == 0
+
     def test_add_new_driver_on_close_one_and_not_lazy_pool(self):
         pool_size = 2
         chrome_pool = __get_headful_chrome_pool__(pool_size=pool_size, lazy=False)
@@ -126,8 +162,9 @@ class TestChromeDriverPool(TestCase):
             assert len(chrome_pool.__pool__) == 1
             assert len(chrome_pool.__preallocated_pool__) == (pool_size - 1)
             chrome_pool.close_driver(session.session_id)
-            assert len(chrome_pool.__preallocated_pool__) == pool_size
-            session = next((x for x in chrome_pool.__pool__ if x.session_id == session.session_id), None)
+            # Closed driver is replaced in background
+            assert __wait_until__(lambda: len(chrome_pool.__preallocated_pool__) == pool_size)
+            session = chrome_pool.__pool__.get(session.session_id)
             assert session is None
             chrome_pool.close_pool()
         except Exception:
@@ -136,6 +173,105 @@ class TestChromeDriverPool(TestCase):
         assert len(chrome_pool.__pool__) == 0
         assert len(chrome_pool.__preallocated_pool__) == 0
 
+    def test_init_driver_pool_not_lazy_returns_on_min_ready(self):
+        pool_size = 4
+        config = ChromeConfiguration(executable_path=CHROME_EXECUTABLE_PATH, headless=True)
+        chrome_pool = ChromeDriverPool(pool_size=pool_size, lazy_pool=False, chrome_config=config,
+                                       launch_concurrency=2, min_ready=1)
+        try:
+            assert len(chrome_pool.__preallocated_pool__) >= 1
+            chrome_pool.close_pool()
+        except Exception:
+            chrome_pool.close_pool()
+            self.fail("Code raised exception unexpectedly!")
+        assert len(chrome_pool.__pool__) == 0
+        assert len(chrome_pool.__preallocated_pool__) == 0
+
+    def test_throws_exception_on_min_ready_greater_than_pool_size(self):
+        try:
+            config = ChromeConfiguration(executable_path=CHROME_EXECUTABLE_PATH)
+            ChromeDriverPool(pool_size=1, lazy_pool=False, chrome_config=config, min_ready=2)
+        except InvalidOrMissingConfigurationException as ex:
+            assert ex.message == 'Minimum ready sessions should be between 0 and pool size.'
+
+    def test_release_session_reuses_driver_with_reset_state(self):
+        pool_size = 1
+        chrome_pool = __get_headless_chrome_pool__(pool_size=pool_size, lazy=True)
+        try:
+            session = chrome_pool.get_session()
+            session.driver.get(URL_GOOGLE)
+            session.driver.add_cookie({'name': 'browser_pool', 'value': 'test'})
+            chrome_pool.release_session(session.session_id)
+            assert len(chrome_pool.__pool__) == 0
+            assert len(chrome_pool.__preallocated_pool__) == pool_size
+            reused_session = chrome_pool.get_session()
+            assert reused_session.session_id == session.session_id
+            assert reused_session.uses == 1
+            assert reused_session.driver.current_url == 'about:blank'
+            reused_session.driver.get(URL_GOOGLE)
+            assert reused_session.driver.get_cookie('browser_pool') is None
+            chrome_pool.close_pool()
+        except Exception:
+            chrome_pool.close_pool()
+            self.fail("Code raised exception unexpectedly!")
+        assert len(chrome_pool.__pool__) == 0
+        assert len(chrome_pool.__preallocated_pool__) == 0
+
+    def test_release_session_recycles_driver_after_max_uses(self):
+        config = ChromeConfiguration(executable_path=CHROME_EXECUTABLE_PATH, headless=True)
+        chrome_pool = ChromeDriverPool(pool_size=1, lazy_pool=False, chrome_config=config, max_session_uses=1)
+        try:
+            session = chrome_pool.get_session()
+            chrome_pool.release_session(session.session_id)
+            assert chrome_pool.get_session(timeout=30).session_id != session.session_id
+            chrome_pool.close_pool()
+        except Exception:
+            chrome_pool.close_pool()
+            self.fail("Code raised exception unexpectedly!")
+        assert len(chrome_pool.__pool__) == 0
+        assert len(chrome_pool.__preallocated_pool__) == 0
+
+    def test_elastic_pool_keeps_min_idle_and_shrinks_after_idle_ttl(self):
+        config = ChromeConfiguration(executable_path=CHROME_EXECUTABLE_PATH, headless=True)
+        chrome_pool = ChromeDriverPool(lazy_pool=True, chrome_config=config, min_idle=1, max_size=3, idle_ttl=2)
+        try:
+            assert __wait_until__(lambda: len(chrome_pool.__preallocated_pool__) == 1)
+            sessions = [chrome_pool.get_session(timeout=30) for x in range(0, 3)]
+            for session in sessions:
+                chrome_pool.release_session(session.session_id)
+            assert len(chrome_pool.__preallocated_pool__) == 3
+            assert __wait_until__(lambda: len(chrome_pool.__preallocated_pool__) == 1)
+            chrome_pool.close_pool()
+        except Exception:
+            chrome_pool.close_pool()
+            self.fail("Code raised exception unexpectedly!")
+        assert len(chrome_pool.__pool__) == 0
+        assert len(chrome_pool.__preallocated_pool__) == 0
+
+    def test_throws_exception_on_min_idle_for_not_lazy_pool(self):
+        try:
+            config = ChromeConfiguration(executable_path=CHROME_EXECUTABLE_PATH)
+            ChromeDriverPool(pool_size=1, lazy_pool=False, chrome_config=config, min_idle=1)
+        except InvalidOrMissingConfigurationException as ex:
+            assert ex.message == 'Minimum idle sessions can be set only for lazy pool.'
+
+    def test_dead_driver_evicted_on_checkout_and_replaced(self):
+        pool_size = 1
+        chrome_pool = __get_headless_chrome_pool__(pool_size=pool_size, lazy=False)
+        try:
+            dead_session = chrome_pool.__preallocated_pool__.oldest()
+            dead_session.driver.service.process.kill()
+            dead_session.driver.service.process.wait()
+            session = chrome_pool.get_session(timeout=30)
+            assert session.session_id != dead_session.session_id
+            assert chrome_pool.evictions['service_exited'] == 1
+            chrome_pool.close_pool()
+        except Exception:
+            chrome_pool.close_pool()
+            self.fail("Code raised exception unexpectedly!")
+        assert len(chrome_pool.__pool__) == 0
+        assert len(chrome_pool.__preallocated_pool__) == 0
+
     def test_throws_exception_when_init_pool_with_zero_size(self):
         try:
             __get_headless_chrome_pool__(pool_size=0, lazy=True)
@@ -0,0 +1,1067 @@
+import asyncio
+import base64
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from src.browser_pool import AsyncChromeDriverPool, BrowserSpec, ChromeDriverPool, DriverPool, FirefoxDriverPool, \
+    TabPool
+from src.browser_pool.admission_controller import AdmissionController
+from src.browser_pool import exit_handler
+from src.browser_pool.exit_handler import close_registered_pools
+from src.browser_pool.priority_class import PriorityClass
+from src.browser_pool.session_state_cache import SessionStateCache
+from src.browser_pool.tab_pool import LockedTabDriver, TabWebDriver
+from src.config.profile_template import CachedFirefoxProfile, ProfileTemplate
+from src.config.webdriver_config import ChromeConfiguration, FirefoxConfiguration, FAST_SCRAPING_BLOCKED_URLS, \
+    get_launch_options
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver import FirefoxProfile
+
+from src.exception.BrowserPoolGeneralException import BrowserPoolGeneralException
+from src.exception.InvalidOrMissingConfigurationException import InvalidOrMissingConfigurationException
+from src.exception.TaskTimeoutException import TaskTimeoutException
+from src.provider.balancing_provider import BalancingDriverProvider, DriverNode
+from src.provider.fake_webdriver_provider import FakeDriverProvider, FakeWebDriver
+from src.provider.shared_service_provider import SharedServiceDriverProvider
+from src.provider.webdriver_provider import apply_blocked_urls
+from src.util.file_utils import clone_directory
+
+
+def __get_fake_chrome_pool__(provider: FakeDriverProvider, pool_size: int, lazy: bool, **kwargs):
+    return ChromeDriverPool(pool_size=pool_size, lazy_pool=lazy, chrome_config=ChromeConfiguration(),
+                            driver_provider=provider, **kwargs)
+
+
+class FakeProcess:
+    def __init__(self):
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+
+class FakeService:
+    def __init__(self):
+        self.process = None
+        self.is_stopped = False
+
+    def start(self):
+        self.process = FakeProcess()
+
+    def stop(self):
+        self.is_stopped = True
+
+
+class FakeSharedServiceDriver(FakeWebDriver):
+    def __init__(self, service: FakeService, on_quit):
+        super().__init__()
+        self.service = service
+        self.on_quit = on_quit
+
+    def quit(self):
+        super().quit()
+        self.on_quit()
+
+
+def __get_fake_service_provider__(service_count: int, max_sessions_per_service: int = None):
+    return SharedServiceDriverProvider(make_service=lambda config: FakeService(),
+                                       make_driver=lambda service, on_quit, config:
+                                       FakeSharedServiceDriver(service, on_quit),
+                                       browser_name='Fake',
+                                       service_count=service_count,
+                                       max_sessions_per_service=max_sessions_per_service)
+
+
+def __wait_until__(predicate, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+async def __wait_until_async__(predicate, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    return predicate()
+
+
+class TestDriverPoolWithFakeDriver(TestCase):
+    def test_prewarm_starts_drivers_concurrently(self):
+        provider = FakeDriverProvider(launch_latency=0.2)
+        started = time.monotonic()
+        pool = __get_fake_chrome_pool__(provider, pool_size=8, lazy=False, launch_concurrency=8)
+        elapsed = time.monotonic() - started
+        pool.close_pool()
+        assert elapsed < 1
+        assert len(provider.running_drivers()) == 0
+
+    def test_failed_prewarm_does_not_leak_started_drivers(self):
+        provider = FakeDriverProvider(failure_rate=0.5, seed=1)
+        try:
+            __get_fake_chrome_pool__(provider, pool_size=10, lazy=False)
+            self.fail("Pool should not start when drivers fail!")
+        except BrowserPoolGeneralException as ex:
+            assert ex.message.startswith('Failed to start')
+            # Pool which failed to start is not kept registered to be closed on exit
+            assert all(x.__is_pool_ran__ for x in list(exit_handler.__pools__))
+        assert len(provider.running_drivers()) == 0
+
+    def test_waiters_are_served_in_order(self):
+        pool = __get_fake_chrome_pool__(FakeDriverProvider(), pool_size=1, lazy=True)
+        session = pool.get_session()
+        served = list()
+
+        def waiter(number: int):
+            pool.release_session(pool.get_session(timeout=5).session_id)
+            served.append(number)
+
+        threads = list()
+        for number in range(0, 5):
+            threads.append(threading.Thread(target=waiter, args=[number]))
+            threads[-1].start()
+            assert __wait_until__(lambda: len(pool.__waiters__) == number + 1)
+        pool.release_session(session.session_id)
+        for thread in threads:
+            thread.join()
+        pool.close_pool()
+        assert served == list(range(0, 5))
+
+    def test_release_session_reuses_driver(self):
+        provider = FakeDriverProvider()
+        pool = __get_fake_chrome_pool__(provider, pool_size=2, lazy=True, max_session_uses=2)
+        session = pool.get_session()
+        session.driver.add_cookie({'name': 'browser_pool', 'value': 'test'})
+        pool.release_session(session.session_id)
+        reused_session = pool.get_session()
+        assert reused_session is session
+        assert reused_session.driver.get_cookies() == []
+        pool.release_session(reused_session.session_id)
+        assert len(pool.__preallocated_pool__) == 0
+        assert __wait_until__(lambda: len(provider.running_drivers()) == 0)
+        pool.close_pool()
+
+    def test_release_session_clears_state_of_all_visited_origins(self):
+        pool = __get_fake_chrome_pool__(FakeDriverProvider(), pool_size=1, lazy=True)
+        session = pool.get_session()
+        driver = session.driver
+        for origin in ('https://example.com', 'https://example.org'):
+            driver.get(origin + '/login')
+            driver.add_cookie({'name': 'auth', 'value': origin})
+            driver.local_storage['auth'] = origin
+        driver.switch_to.new_window('tab')
+        driver.get('https://example.net')
+        driver.local_storage['auth'] = 'https://example.net'
+        pool.release_session(session.session_id)
+        assert pool.get_session() is session
+        for origin in ('https://example.com', 'https://example.org', 'https://example.net'):
+            driver.get(origin)
+            assert driver.get_cookies() == []
+            assert driver.local_storage == dict()
+        cleared = [x[1]['origin'] for x in driver.cdp_commands if x[0] == 'Storage.clearDataForOrigin']
+        assert cleared == ['*', 'https://example.com', 'https://example.net', 'https://example.org']
+        # Next resets clear only origins visited after the last reset
+        for visited in (['https://example.com', 'https://example.net', 'https://example.org'], []):
+            driver.cdp_commands.clear()
+            pool.release_session(session.session_id)
+            assert pool.get_session() is session
+            cleared = [x[1]['origin'] for x in driver.cdp_commands if x[0] == 'Storage.clearDataForOrigin']
+            assert cleared == ['*'] + visited
+        pool.close_pool()
+
+    def test_session_without_full_reset_reused_unless_pool_requires_it(self):
+        provider = FakeDriverProvider(supports_cdp=False)
+        pool = FirefoxDriverPool(pool_size=1, lazy_pool=True, ff_config=FirefoxConfiguration(),
+                                 driver_provider=provider)
+        session = pool.get_session()
+        session.driver.get('https://example.com')
+        session.driver.add_cookie({'name': 'auth', 'value': 'token'})
+        session.driver.local_storage['auth'] = 'token'
+        pool.release_session(session.session_id)
+        # Webdriver commands clear the current origin, and the driver is reused
+        assert pool.get_session() is session
+        session.driver.get('https://example.com')
+        assert session.driver.get_cookies() == []
+        assert session.driver.local_storage == dict()
+        pool.close_pool()
+
+        provider = FakeDriverProvider(supports_cdp=False)
+        pool = FirefoxDriverPool(pool_size=1, lazy_pool=True, ff_config=FirefoxConfiguration(),
+                                 driver_provider=provider, require_full_reset=True)
+        session = pool.get_session()
+        pool.release_session(session.session_id)
+        # Pool which requires full reset quits sessions which would keep state of other origins
+        assert __wait_until__(lambda: session.driver.is_quit)
+        assert pool.recycles['no_full_reset'] == 1
+        assert pool.get_session() is not session
+        assert len(provider.launched) == 2
+        pool.close_pool()
+
+    def test_hung_driver_evicted_after_health_check_timeout(self):
+        provider = FakeDriverProvider()
+        pool = __get_fake_chrome_pool__(provider, pool_size=2, lazy=False, health_check_interval=0.3,
+                                        health_check_timeout=0.2)
+        hung_session = list(pool.__preallocated_pool__)[-1]
+        hung_session.driver.freeze()
+        started = time.monotonic()
+        session = pool.get_session()
+        assert time.monotonic() - started < 1
+        assert session is not hung_session
+        assert pool.evictions['unresponsive'] == 1
+        pool.release_session(session.session_id)
+        assert __wait_until__(lambda: len(pool.__preallocated_pool__) == 2)
+        # Periodic check of idle drivers is not blocked by hung browsers either, they are replaced
+        for idle_session in list(pool.__preallocated_pool__):
+            idle_session.driver.freeze()
+        assert __wait_until__(lambda: pool.evictions['unresponsive'] == 3)
+        assert __wait_until__(lambda: len(pool.__preallocated_pool__) == 2)
+        assert len(provider.launched) == 5
+        pool.close_pool()
+        for driver in provider.launched:
+            driver.unfreeze()
+
+    def test_closed_driver_quit_and_replaced_in_background(self):
+        provider = FakeDriverProvider(launch_latency=0.1, quit_latency=0.3)
+        pool = __get_fake_chrome_pool__(provider, pool_size=2, lazy=False)
+        session = pool.get_session()
+        started = time.monotonic()
+        pool.close_driver(session.session_id)
+        assert time.monotonic() - started < 0.1
+        assert not session.driver.is_quit
+        assert __wait_until__(lambda: len(pool.__preallocated_pool__) == 2)
+        assert __wait_until__(lambda: session.driver.is_quit)
+        pool.close_pool()
+        assert len(provider.running_drivers()) == 0
+
+    def test_close_pool_waits_for_drivers_quit_in_background(self):
+        provider = FakeDriverProvider(quit_latency=0.3)
+        pool = __get_fake_chrome_pool__(provider, pool_size=2, lazy=True, close_timeout=5)
+        session = pool.get_session()
+        pool.close_driver(session.session_id)
+        pool.close_pool()
+        assert session.driver.is_quit
+        assert len(provider.running_drivers()) == 0
+        # Drivers whose background quit hangs past the close deadline are killed
+        provider = FakeDriverProvider(quit_latency=5)
+        pool = __get_fake_chrome_pool__(provider, pool_size=2, lazy=True, close_timeout=0.2)
+        pool.close_driver(pool.get_session().session_id)
+        started = time.monotonic()
+        pool.close_pool()
+        assert time.monotonic() - started < 1
+        assert pool.get_metrics()['counters']['force_kills'] == 1
+
+    def test_crashed_driver_evicted_on_checkout(self):
+        provider = FakeDriverProvider()
+        pool = __get_fake_chrome_pool__(provider, pool_size=2, lazy=False)
+        crashed_session = list(pool.__preallocated_pool__)[-1]
+        crashed_session.driver.crash()
+        session = pool.get_session()
+        assert session is not crashed_session
+        assert pool.evictions['unresponsive'] == 1
+        assert __wait_until__(lambda: len(pool.__preallocated_pool__) == 1)
+        pool.close_pool()
+        assert len(provider.running_drivers()) == 0
+
+    def test_elastic_pool_shrinks_to_min_idle(self):
+        provider = FakeDriverProvider()
+        pool = __get_fake_chrome_pool__(provider, pool_size=0, lazy=True, max_size=5, min_idle=1, idle_ttl=0.2)
+        assert __wait_until__(lambda: len(pool.__preallocated_pool__) == 1)
+        # Idle reserve is replenished in background and holds a slot, so the last callers wait for it
+        sessions = [pool.get_session(timeout=5) for x in range(0, 5)]
+        for session in sessions:
+            pool.release_session(session.session_id)
+        assert __wait_until__(lambda: len(pool.__preallocated_pool__) == 1)
+        assert len(provider.running_drivers()) == 1
+        pool.close_pool()
+
+    def test_metrics_count_launches_waits_and_exhaustion(self):
+        pool = __get_fake_chrome_pool__(FakeDriverProvider(), pool_size=1, lazy=True)
+        events = list()
+        pool.metrics.add_observer(lambda name, value: events.append(name))
+        session = pool.get_session()
+        try:
+            pool.get_session()
+            self.fail("Pool should be exhausted!")
+        except BrowserPoolGeneralException:
+            pass
+        metrics = pool.get_metrics()
+        assert metrics['gauges']['active_sessions'] == 1
+        assert metrics['counters']['exhausted'] == 1
+        assert metrics['histograms']['launch_seconds']['count'] == 1
+        assert metrics['histograms']['checkout_wait_seconds']['count'] == 1
+        assert events == ['launch_seconds', 'checkout_wait_seconds', 'exhausted']
+        pool.close_driver(session.session_id)
+        text = pool.get_prometheus_metrics()
+        assert 'browser_pool_exhausted_total{pool="chrome"} 1' in text
+        assert 'browser_pool_quit_seconds_count{pool="chrome"} 1' in text
+        assert 'browser_pool_active_sessions{pool="chrome"} 0' in text
+        pool.close_pool()
+
+    def test_sessions_share_driver_services(self):
+        provider = __get_fake_service_provider__(service_count=2)
+        pool = __get_fake_chrome_pool__(provider, pool_size=6, lazy=False)
+        services = provider.services()
+        assert len(services) == 2
+        assert [x.sessions for x in services] == [3, 3]
+        dead_service = services[0].service
+        dead_service.process.returncode = 1
+        # Sessions of the exited service are evicted and replaced on the restarted service
+        sessions = [pool.get_session(timeout=5) for x in range(0, 6)]
+        assert all(x.driver.service is not dead_service for x in sessions)
+        assert pool.evictions['service_exited'] == 3
+        assert dead_service.is_stopped
+        running_services = [x.service for x in provider.services()]
+        pool.close_pool()
+        provider.stop()
+        assert all(x.is_stopped for x in running_services)
+
+    def test_single_session_services_are_reused(self):
+        provider = __get_fake_service_provider__(service_count=1, max_sessions_per_service=1)
+        first = provider(None)
+        second = provider(None)
+        assert first.service is not second.service
+        second.quit()
+        # Service over service_count is stopped once its session quit
+        assert second.service.is_stopped
+        first.quit()
+        assert provider(None).service is first.service
+        provider.stop()
+
+    def test_old_session_recycled_on_release(self):
+        provider = FakeDriverProvider()
+        pool = __get_fake_chrome_pool__(provider, pool_size=1, lazy=True, max_session_age=0.1)
+        session = pool.get_session()
+        pool.release_session(session.session_id)
+        assert pool.get_session() is session
+        time.sleep(0.1)
+        pool.release_session(session.session_id)
+        assert __wait_until__(lambda: pool.recycles['max_age'] == 1)
+        assert __wait_until__(lambda: len(provider.running_drivers()) == 0)
+        pool.close_pool()
+
+    def test_session_over_memory_ceiling_recycled_on_release(self):
+        pool = __get_fake_chrome_pool__(FakeDriverProvider(), pool_size=1, lazy=True, max_session_rss=1)
+        session = pool.get_session()
+        # Process tree of the session is found from its driver service process
+        service = FakeService()
+        service.process = subprocess.Popen(['sleep', '10'])
+        session.driver.service = service
+        try:
+            assert pool.get_sessions_rss()[session.session_id] > 0
+            pool.release_session(session.session_id)
+            # Memory is measured when the session is reset in background, before the process is killed
+            assert __wait_until__(lambda: pool.recycles['max_rss'] == 1)
+        finally:
+            service.process.kill()
+            service.process.wait()
+        assert pool.get_sessions_rss() == dict()
+        pool.close_pool()
+
+    def test_admission_controller_limits_concurrent_launches(self):
+        provider = FakeDriverProvider(launch_latency=0.1)
+        controller = AdmissionController(max_concurrent_launches=1, min_available_memory=0)
+        pool = __get_fake_chrome_pool__(provider, pool_size=4, lazy=True, admission_controller=controller)
+        launching = list()
+        threads = [threading.Thread(target=lambda: pool.get_session(timeout=5)) for x in range(0, 4)]
+        for thread in threads:
+            thread.start()
+        while any(x.is_alive() for x in threads):
+            launching.append(controller.launching())
+            time.sleep(0.01)
+        assert max(launching) == 1
+        assert len(provider.running_drivers()) == 4
+        pool.close_pool()
+
+    def test_launch_queued_while_host_has_no_memory(self):
+        controller = AdmissionController(min_available_memory=0, browser_footprint=1 << 60, sample_interval=0.05)
+        pool = __get_fake_chrome_pool__(FakeDriverProvider(), pool_size=1, lazy=True, admission_controller=controller)
+        try:
+            pool.get_session(timeout=0.2)
+            self.fail("Driver should not be started without memory for it!")
+        except BrowserPoolGeneralException as ex:
+            assert ex.message.startswith('Host has no resources')
+        assert pool.get_metrics()['counters']['admission_timeouts'] == 1
+        # Slot of the launch which was not admitted is given back
+        controller.browser_footprint = 0
+        pool.get_session()
+        pool.close_pool()
+
+    def test_sessions_get_own_clone_of_profile_template(self):
+        provider = FakeDriverProvider()
+        configs = list()
+        with tempfile.TemporaryDirectory() as template_dir:
+            os.makedirs(os.path.join(template_dir, 'Default'))
+            with open(os.path.join(template_dir, 'Default', 'Preferences'), 'w') as preferences:
+                preferences.write('{}')
+            open(os.path.join(template_dir, 'SingletonLock'), 'w').close()
+            pool = ChromeDriverPool(pool_size=2, lazy_pool=False, chrome_config=ChromeConfiguration(),
+                                    driver_provider=lambda config: configs.append(config) or provider(config),
+                                    profile_template=ProfileTemplate(template_dir))
+            profile_dirs = [x.profile_dir for x in pool.__preallocated_pool__]
+            assert len(set(profile_dirs)) == 2
+            for profile_dir in profile_dirs:
+                assert os.path.isfile(os.path.join(profile_dir, 'Default', 'Preferences'))
+                assert not os.path.exists(os.path.join(profile_dir, 'SingletonLock'))
+            assert sorted('--user-data-dir={}'.format(x) for x in profile_dirs) == \
+                sorted(x.options.arguments[-1] for x in configs)
+            pool.close_pool()
+            assert not any(os.path.exists(x) for x in profile_dirs)
+
+    def test_cloned_directories_independent_of_template_and_each_other(self):
+        with tempfile.TemporaryDirectory() as root:
+            template_dir = os.path.join(root, 'template')
+            os.makedirs(os.path.join(template_dir, 'Default'))
+            with open(os.path.join(template_dir, 'Default', 'Preferences'), 'w') as preferences:
+                preferences.write('template')
+            os.chmod(os.path.join(template_dir, 'Default', 'Preferences'), 0o600)
+            clones = [os.path.join(root, 'first'), os.path.join(root, 'second')]
+            for clone in clones:
+                # File systems without copy on write clones, e.g. ext4 or tmpfs, get regular copies
+                clone_directory(template_dir, clone)
+            with open(os.path.join(clones[0], 'Default', 'Preferences'), 'w') as preferences:
+                preferences.write('changed')
+            for path, content in ((template_dir, 'template'), (clones[1], 'template'), (clones[0], 'changed')):
+                with open(os.path.join(path, 'Default', 'Preferences')) as preferences:
+                    assert preferences.read() == content
+            assert os.stat(os.path.join(clones[1], 'Default', 'Preferences')).st_mode & 0o777 == 0o600
+
+    def test_firefox_profile_template_clones_get_preferences(self):
+        profile = CachedFirefoxProfile()
+        profile.set_preference('browser.startup.homepage', 'https://example.com')
+        template = ProfileTemplate.from_firefox_profile(profile)
+        profile_dirs = [template.clone() for x in range(0, 2)]
+        try:
+            assert len(set(profile_dirs)) == 2
+            for profile_dir in profile_dirs:
+                with open(os.path.join(profile_dir, 'user.js')) as user_js:
+                    assert '"browser.startup.homepage", "https://example.com"' in user_js.read()
+        finally:
+            for profile_dir in profile_dirs:
+                ProfileTemplate.remove(profile_dir)
+        assert not any(os.path.exists(x) for x in profile_dirs)
+
+    def test_cached_firefox_profile_encoded_again_after_change(self):
+        profile = CachedFirefoxProfile()
+        encoded = profile.encoded
+        assert profile.encoded is encoded
+        profile.set_preference('browser.startup.homepage', 'https://example.com')
+        changed = profile.encoded
+        assert changed != encoded
+        assert profile.encoded is changed
+
+    def test_idle_sessions_partitioned_by_proxy(self):
+        provider = FakeDriverProvider()
+        configs = list()
+        pool = __get_fake_chrome_pool__(lambda config: configs.append(config) or provider(config),
+                                        pool_size=2, lazy=True)
+        first = pool.get_session(proxy='first:3128')
+        pool.release_session(first.session_id)
+        second = pool.get_session(proxy='second:3128')
+        assert second is not first
+        pool.release_session(second.session_id)
+        assert pool.get_session(proxy='first:3128') is first
+        pool.release_session(first.session_id)
+        # Pool is full, so idle session which was not used for the longest time is replaced
+        third = pool.get_session(proxy='third:3128')
+        assert __wait_until__(lambda: second.driver.is_quit) and not first.driver.is_quit
+        assert [x.desired_capabilities['proxy']['httpProxy'] for x in configs] == \
+            ['first:3128', 'second:3128', 'third:3128']
+        assert third.proxy == 'third:3128'
+        pool.close_pool()
+
+    def test_proxies_selected_in_turn_or_by_usage(self):
+        pool = __get_fake_chrome_pool__(FakeDriverProvider(), pool_size=4, lazy=True,
+                                        proxies=['a:1', 'b:1', 'c:1'])
+        assert [pool.get_session().proxy for x in range(0, 4)] == ['a:1', 'b:1', 'c:1', 'a:1']
+        pool.close_pool()
+        pool = __get_fake_chrome_pool__(FakeDriverProvider(), pool_size=4, lazy=True,
+                                        proxies=['a:1', 'b:1'], proxy_selection='least_used')
+        first = pool.get_session()
+        second = pool.get_session()
+        pool.release_session(second.session_id)
+        assert (first.proxy, second.proxy) == ('a:1', 'b:1')
+        # Proxy of the released session is not in use, so it is selected and its idle session is reused
+        assert pool.get_session() is second
+        pool.close_pool()
+
+    def test_idle_sessions_reused_with_more_proxies_than_pool_size(self):
+        proxies = ['proxy{}:3128'.format(x) for x in range(0, 100)]
+        for policy in ('round_robin', 'least_used'):
+            provider = FakeDriverProvider()
+            pool = __get_fake_chrome_pool__(provider, pool_size=10, lazy=True, proxies=proxies,
+                                            proxy_selection=policy)
+            for x in range(0, 200):
+                pool.release_session(pool.get_session().session_id)
+            held = [pool.get_session() for x in range(0, 10)]
+            # Idle sessions are reused behind their proxies, new sessions are started only to fill the pool
+            assert len(provider.launched) <= 10
+            assert len(set(x.proxy for x in held)) == len(provider.launched)
+            pool.close_pool()
+
+    def test_map_yields_results_in_completion_order(self):
+        pool = __get_fake_chrome_pool__(FakeDriverProvider(), pool_size=2, lazy=True)
+        taken = list()
+
+        def items():
+            for number in range(0, 20):
+                taken.append(number)
+                yield number
+
+        def task(session, number):
+            session.driver.get('https://example.com/{}'.format(number))
+            time.sleep(0.5 if number == 0 else 0)
+            return number * 2
+
+        results = pool.map(task, items(), concurrency=2)
+        first = next(results)
+        # Items are taken only when tasks finish, so the slow first item does not hold back the rest
+        assert len(taken) <= 3
+        rest = list(results)
+        assert first.result == 2
+        assert rest[-1].item == 0
+        assert sorted(x.result for x in [first] + rest) == [x * 2 for x in range(0, 20)]
+        pool.close_pool()
+
+    def test_map_retries_task_on_fresh_session(self):
+        provider = FakeDriverProvider()
+        pool = __get_fake_chrome_pool__(provider, pool_size=2, lazy=True)
+        failed_sessions = list()
+
+        def task(session, item):
+            if item == 'flaky' and not failed_sessions:
+                failed_sessions.append(session)
+                raise WebDriverException('Browser crashed.')
+            if item == 'broken':
+                raise ValueError('Broken item.')
+            return session
+
+        results = {x.item: x for x in pool.map(task, ['flaky', 'broken', 'fine'], retries=2)}
+        assert results['flaky'].attempts == 2
+        assert results['flaky'].result is not failed_sessions[0]
+        assert __wait_until__(lambda: failed_sessions[0].driver.is_quit)
+        # Errors of the task itself are not retried
+        assert isinstance(results['broken'].error, ValueError) and results['broken'].attempts == 1
+        assert results['fine'].error is None
+        pool.close_pool()
+
+    def test_map_recycles_hung_browser(self):
+        provider = FakeDriverProvider()
+        pool = __get_fake_chrome_pool__(provider, pool_size=2, lazy=True)
+
+        def task(session, item):
+            while item == 'hung':
+                # Waits for a page which never loads, until the driver is closed
+                session.driver.current_url
+                time.sleep(0.01)
+            return item
+
+        results = {x.item: x for x in pool.map(task, ['hung', 'fine'], timeout=0.2, retries=1)}
+        assert isinstance(results['hung'].error, TaskTimeoutException)
+        assert results['hung'].attempts == 2
+        assert results['fine'].result == 'fine'
+        # Browser of every timed out attempt is closed
+        assert __wait_until__(lambda: len([x for x in provider.launched if x.is_quit]) == 2)
+        pool.close_pool()
+
+    def test_fast_scraping_profile_of_chrome(self):
+        config = ChromeConfiguration()
+        config.set_fast_scraping_profile()
+        assert '--blink-settings=imagesEnabled=false' in config.options.arguments
+        preferences = config.options.experimental_options['prefs']
+        assert preferences['profile.managed_default_content_settings.images'] == 2
+        assert config.options.page_load_strategy == 'eager'
+        assert config.blocked_urls == FAST_SCRAPING_BLOCKED_URLS
+        # Options of other configurations are not changed by the profile
+        assert ChromeConfiguration().options.arguments == []
+
+        driver = FakeWebDriver()
+        config.set_fast_scraping_profile(blocked_urls=['*.png'])
+        apply_blocked_urls(driver, config.for_proxy('127.0.0.1:3128'))
+        assert driver.cdp_commands == [('Network.enable', {}), ('Network.setBlockedURLs', {'urls': ['*.png']})]
+        # Driver which failed to block urls is quit
+        driver.crash()
+        self.assertRaises(WebDriverException, apply_blocked_urls, driver, config)
+        assert driver.is_quit
+
+    def test_fast_scraping_profile_of_firefox(self):
+        config = FirefoxConfiguration(proxy='127.0.0.1:3128')
+        config.set_fast_scraping_profile(blocked_urls=['*.png'])
+        preferences = config.options.preferences
+        assert preferences['permissions.default.image'] == 2
+        assert not preferences['gfx.downloadable_fonts.enabled']
+        assert config.options.page_load_strategy == 'eager'
+        # Proxy goes through proxy auto-config, which also routes blocked urls to the blackhole proxy
+        assert preferences['network.proxy.type'] == 2
+        assert 'proxy' not in config.desired_capabilities
+        pac = base64.b64decode(preferences['network.proxy.autoconfig_url'].split(',')[1]).decode()
+        assert 'shExpMatch(url, "*.png")' in pac
+        assert 'PROXY 127.0.0.1:3128' in pac
+
+        proxied = config.for_proxy('127.0.0.2:3128')
+        pac = base64.b64decode(proxied.options.preferences['network.proxy.autoconfig_url'].split(',')[1]).decode()
+        assert 'PROXY 127.0.0.2:3128' in pac
+        assert 'proxy' not in proxied.options.capabilities
+        assert config.proxy == '127.0.0.1:3128'
+
+    def test_close_pool_quits_sessions_concurrently(self):
+        provider = FakeDriverProvider(quit_latency=0.2)
+        pool = __get_fake_chrome_pool__(provider, pool_size=8, lazy=False)
+        pool.get_session()
+        started = time.monotonic()
+        pool.close_pool()
+        assert time.monotonic() - started < 1
+        assert len(provider.running_drivers()) == 0
+        assert pool.get_metrics()['counters']['force_kills'] == 0
+
+    def test_close_pool_kills_session_which_does_not_quit(self):
+        provider = FakeDriverProvider(quit_latency=30)
+        pool = __get_fake_chrome_pool__(provider, pool_size=1, lazy=True)
+        session = pool.get_session()
+        service = FakeService()
+        service.process = subprocess.Popen(['sleep', '30'])
+        session.driver.service = service
+        try:
+            started = time.monotonic()
+            pool.close_pool(timeout=0.2)
+            assert time.monotonic() - started < 2
+            # Process tree of the session is killed after the deadline
+            assert service.process.wait(timeout=5) == -9
+        finally:
+            service.process.kill()
+            service.process.wait()
+        assert pool.get_metrics()['counters']['force_kills'] == 1
+
+    def test_pools_closed_on_exit(self):
+        provider = FakeDriverProvider()
+        pool = __get_fake_chrome_pool__(provider, pool_size=2, lazy=False)
+        not_registered = __get_fake_chrome_pool__(provider, pool_size=1, lazy=False, close_on_exit=False)
+        close_registered_pools()
+        self.assertRaises(BrowserPoolGeneralException, pool.get_session)
+        assert len(provider.running_drivers()) == 1
+        not_registered.close_pool()
+
+    def test_pools_closed_on_signal_while_pool_lock_held(self):
+        script = '''
+import os, signal, time
+from src.browser_pool import ChromeDriverPool
+from src.browser_pool.exit_handler import install_signal_handlers
+from src.config.webdriver_config import ChromeConfiguration
+from src.provider.fake_webdriver_provider import FakeDriverProvider
+pool = ChromeDriverPool(pool_size=2, lazy_pool=False, chrome_config=ChromeConfiguration(),
+                        driver_provider=FakeDriverProvider())
+pool.metrics.add_observer(lambda name, value: print(name, flush=True))
+install_signal_handlers()
+with pool.__lock__:
+    os.kill(os.getpid(), signal.SIGTERM)
+    time.sleep(30)
+'''
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        started = time.monotonic()
+        process = subprocess.run([sys.executable, '-c', script], cwd=root, capture_output=True, text=True, timeout=20)
+        assert time.monotonic() - started < 10
+        # Pools are closed, then the process is ended by the signal
+        assert process.returncode == -signal.SIGTERM
+        assert process.stdout.count('quit_seconds') == 2
+
+    def test_tabs_block_urls_of_fast_scraping_profile(self):
+        config = ChromeConfiguration()
+        config.set_fast_scraping_profile(blocked_urls=['*.png'])
+        for isolate_tabs in (True, False):
+            provider = FakeDriverProvider()
+            pool = ChromeDriverPool(pool_size=1, lazy_pool=True, chrome_config=config, driver_provider=provider)
+            tab_pool = TabPool(pool, tabs_per_browser=2, isolate_tabs=isolate_tabs)
+            sessions = [tab_pool.get_session() for x in range(2)]
+            # Urls blocked at launch apply to the first window only, so every tab blocks them again
+            assert provider.launched[0].blocked_urls == {x.window_handle: ['*.png'] for x in sessions}
+            tab_pool.close_pool()
+
+    def test_tabs_share_browsers(self):
+        provider = FakeDriverProvider()
+        tab_pool = TabPool(__get_fake_chrome_pool__(provider, pool_size=2, lazy=True), tabs_per_browser=3)
+        sessions = [tab_pool.get_session() for x in range(6)]
+        assert len(provider.launched) == 2
+        self.assertRaises(BrowserPoolGeneralException, tab_pool.get_session)
+        # Tabs of one browser have own browser contexts, so they do not see cookies of each other
+        first, second = sessions[0], sessions[1]
+        assert first.browser is second.browser
+        first.driver.add_cookie({'name': 'browser_pool', 'value': 'test'})
+        assert second.driver.get_cookies() == []
+        assert len(first.driver.get_cookies()) == 1
+        for session in sessions:
+            tab_pool.release_session(session.session_id)
+        # Browsers without tabs are given back to the pool with only their first window
+        assert __wait_until__(lambda: tab_pool.pool.get_metrics()['gauges']['idle_sessions'] == 2)
+        assert all(len(x.window_handles) == 1 for x in provider.launched)
+        tab_pool.close_pool()
+        assert len(provider.running_drivers()) == 0
+
+    def test_closed_tab_retires_its_browser(self):
+        provider = FakeDriverProvider()
+        tab_pool = TabPool(__get_fake_chrome_pool__(provider, pool_size=1, lazy=True), tabs_per_browser=2,
+                           isolate_tabs=False)
+        first, second = tab_pool.get_session(), tab_pool.get_session()
+        assert first.browser_context_id is None
+        tab_pool.close_driver(first.session_id)
+        # Browser is kept for its other tab, but gets no new tabs
+        second.driver.get('https://example.com')
+        self.assertRaises(BrowserPoolGeneralException, tab_pool.get_session)
+        second.driver.quit()
+        assert __wait_until__(lambda: provider.launched[0].is_quit)
+        tab_pool.get_session()
+        assert len(provider.running_drivers()) == 1
+        tab_pool.close_pool()
+
+    def test_tab_drivers_run_commands_in_own_browser_contexts(self):
+        provider = FakeDriverProvider(remote=True)
+        tab_pool = TabPool(__get_fake_chrome_pool__(provider, pool_size=1, lazy=True), tabs_per_browser=2)
+        first, second = tab_pool.get_session(), tab_pool.get_session()
+        browser = provider.launched[0]
+        assert isinstance(first.driver, TabWebDriver)
+        assert None not in (first.browser_context_id, second.browser_context_id)
+        assert first.browser_context_id != second.browser_context_id
+        first.driver.get('https://example.com')
+        second.driver.get('https://example.org')
+        first.driver.add_cookie({'name': 'browser_pool', 'value': 'test'})
+        assert first.driver.current_url == 'https://example.com'
+        assert second.driver.get_cookies() == []
+        assert {first.window_handle, second.window_handle}.issubset(browser.window_handles)
+        tab_pool.release_session(first.session_id)
+        # Closed tab disposes its browser context together with its window
+        assert ('Target.disposeBrowserContext', {'browserContextId': first.browser_context_id}) in browser.cdp_commands
+        assert first.window_handle not in browser.window_handles
+        assert second.driver.current_url == 'https://example.org'
+        tab_pool.close_pool()
+        assert len(provider.running_drivers()) == 0
+
+    def test_locked_tab_driver_reads_properties_in_its_tab(self):
+        tab_pool = TabPool(__get_fake_chrome_pool__(FakeDriverProvider(), pool_size=1, lazy=True), tabs_per_browser=2)
+        first, second = tab_pool.get_session(), tab_pool.get_session()
+        assert isinstance(first.driver, LockedTabDriver)
+        second.driver.get('https://example.org')
+        is_done = threading.Event()
+
+        def navigate():
+            while not is_done.is_set():
+                first.driver.get('https://example.com')
+        thread = threading.Thread(target=navigate)
+        thread.start()
+        # Property is read after the browser is switched to the tab, commands of other tabs wait for it
+        urls = {second.driver.current_url for x in range(0, 1000)}
+        is_done.set()
+        thread.join()
+        assert urls == {'https://example.org'}
+        assert first.driver.current_url == 'https://example.com'
+        tab_pool.close_pool()
+
+    def test_map_runs_tasks_in_tabs(self):
+        provider = FakeDriverProvider()
+        tab_pool = TabPool(__get_fake_chrome_pool__(provider, pool_size=2, lazy=True), tabs_per_browser=4)
+        results = list(tab_pool.map(lambda session, x: session.driver.get('https://example.com/{}'.format(x))
+                                    or session.driver.current_url, range(20)))
+        assert sorted(x.result for x in results) == sorted('https://example.com/{}'.format(x) for x in range(20))
+        assert len(provider.launched) <= 2
+        tab_pool.close_pool()
+
+    def test_warm_up_replays_captured_session_state(self):
+        logins = list()
+
+        def login(driver):
+            logins.append(driver)
+            driver.add_cookie({'name': 'auth', 'value': 'token'})
+        cache = SessionStateCache('https://example.com', login=login, ttl=60)
+        pool = __get_fake_chrome_pool__(FakeDriverProvider(), pool_size=2, lazy=True, warm_up=cache)
+        first, second = pool.get_session(), pool.get_session()
+        assert len(logins) == 1
+        assert second.driver.current_url == 'https://example.com'
+        assert second.driver.get_cookie('auth')['value'] == 'token'
+        # Released session is reset and warmed up again with the cached state
+        pool.release_session(first.session_id)
+        assert pool.get_session() is first
+        assert first.driver.get_cookie('auth')['value'] == 'token'
+        cache.invalidate()
+        pool.release_session(second.session_id)
+        assert __wait_until__(lambda: len(logins) == 2)
+        pool.close_pool()
+
+    def test_session_failed_to_warm_up_is_quit(self):
+        provider = FakeDriverProvider()
+        pool = __get_fake_chrome_pool__(provider, pool_size=1, lazy=True, warm_up=lambda session: 1 / 0)
+        self.assertRaises(BrowserPoolGeneralException, pool.get_session)
+        assert pool.get_metrics()['counters']['warm_up_failures'] == 1
+        assert len(provider.running_drivers()) == 0
+        pool.close_pool()
+
+    def test_release_returns_before_session_is_warmed_up(self):
+        warming_up = threading.Event()
+        warmed_up = threading.Event()
+
+        def warm_up(session):
+            warming_up.set()
+            warmed_up.wait(5)
+        provider = FakeDriverProvider()
+        pool = __get_fake_chrome_pool__(provider, pool_size=1, lazy=True)
+        session = pool.get_session()
+        pool.warm_up = warm_up
+        started = time.monotonic()
+        pool.release_session(session.session_id)
+        assert time.monotonic() - started < 1
+        # Session is warmed up on a launcher thread and keeps its slot, so no new driver is started meanwhile
+        assert warming_up.wait(5)
+        assert len(pool.get_lease_report()['active']) == 0
+        assert pool.get_metrics()['gauges']['idle_sessions'] == 0
+        # Caller without timeout waits for the session released before it asked
+        threading.Timer(0.2, warmed_up.set).start()
+        assert pool.get_session() is session
+        assert len(provider.launched) == 1
+        pool.close_pool()
+
+    def test_session_context_manager_returns_session(self):
+        provider = FakeDriverProvider()
+        pool = __get_fake_chrome_pool__(provider, pool_size=1, lazy=True)
+        with pool.session() as session:
+            session.driver.get('https://example.com')
+        assert __wait_until__(lambda: pool.get_metrics()['gauges']['idle_sessions'] == 1)
+        # Driver which failed is closed instead of released
+        with self.assertRaises(WebDriverException):
+            with pool.session() as session:
+                session.driver.crash()
+                session.driver.get('https://example.com')
+        assert __wait_until__(lambda: len(provider.running_drivers()) == 0)
+        pool.close_pool()
+
+    def test_expired_lease_reclaimed_with_report(self):
+        provider = FakeDriverProvider()
+        pool = __get_fake_chrome_pool__(provider, pool_size=2, lazy=True, max_lease_time=0.2)
+        leaked = pool.get_session()
+        lease = pool.lease(max_hold=60)
+        report = pool.get_lease_report()
+        assert len(report['active']) == 2
+        assert 'test_expired_lease_reclaimed_with_report' in report['active'][0]['acquired_at']
+        # Leaked session is quit and its slot serves next callers, session within its max hold is kept
+        assert pool.get_session(timeout=5) is not leaked
+        # Slot is given out before the driver is quit by the watchdog
+        assert __wait_until__(lambda: leaked.driver.is_quit)
+        assert not lease.driver.is_quit
+        assert pool.evictions['lease_expired'] == 1
+        reclaimed = pool.get_lease_report()['reclaimed']
+        assert reclaimed[0]['session_id'] == str(leaked.session_id)
+        assert 'test_expired_lease_reclaimed_with_report' in reclaimed[0]['acquired_at']
+        lease.release()
+        lease.release()
+        assert __wait_until__(lambda: pool.get_metrics()['gauges']['idle_sessions'] == 1)
+        pool.close_pool()
+
+    def test_leases_checked_only_when_sessions_can_be_reclaimed(self):
+        pool = __get_fake_chrome_pool__(FakeDriverProvider(), pool_size=2, lazy=True)
+        assert not pool.__is_lease_watched__
+        kept = pool.get_session()
+        assert not pool.__is_lease_watched__
+        # Checkout with max hold starts the checks in pool without max_lease_time
+        held = pool.get_session(max_hold=0.1)
+        assert pool.__is_lease_watched__
+        assert __wait_until__(lambda: held.driver.is_quit)
+        assert not kept.driver.is_quit
+        pool.close_pool()
+
+    def test_reserved_sessions_kept_for_priority_class(self):
+        classes = [PriorityClass('interactive', priority=10, reserved=1), PriorityClass('batch')]
+        pool = __get_fake_chrome_pool__(FakeDriverProvider(), pool_size=3, lazy=True, priority_classes=classes)
+        pool.get_session(priority='batch')
+        pool.get_session(priority='batch')
+        self.assertRaises(BrowserPoolGeneralException, pool.get_session, priority='batch')
+        assert pool.get_session(priority='interactive').priority == 'interactive'
+        self.assertRaises(InvalidOrMissingConfigurationException, pool.get_session, priority='unknown')
+        pool.close_pool()
+
+    def __get_served_order__(self, priority_aging: float, first_wait: float):
+        classes = [PriorityClass('interactive', priority=10), PriorityClass('batch')]
+        pool = __get_fake_chrome_pool__(FakeDriverProvider(), pool_size=1, lazy=True, priority_classes=classes,
+                                        priority_aging=priority_aging)
+        held = pool.get_session()
+        served = list()
+
+        def take(priority):
+            session = pool.get_session(timeout=5, priority=priority)
+            served.append(priority)
+            pool.release_session(session.session_id)
+        threads = [threading.Thread(target=take, args=(x,)) for x in ('batch', 'interactive')]
+        threads[0].start()
+        time.sleep(first_wait)
+        threads[1].start()
+        time.sleep(0.1)
+        pool.release_session(held.session_id)
+        for thread in threads:
+            thread.join()
+        pool.close_pool()
+        return served
+
+    def test_waiters_served_by_priority_with_aging(self):
+        assert self.__get_served_order__(priority_aging=0, first_wait=0.1) == ['interactive', 'batch']
+        # Batch caller waiting long enough gains priority over fresh interactive caller
+        assert self.__get_served_order__(priority_aging=100, first_wait=0.3) == ['batch', 'interactive']
+
+    def test_balancing_provider_places_sessions_on_least_loaded_node(self):
+        provider = BalancingDriverProvider([DriverNode('a', FakeDriverProvider(), capacity=2),
+                                            DriverNode('b', FakeDriverProvider(), capacity=1)])
+        pool = __get_fake_chrome_pool__(provider, pool_size=4, lazy=True)
+        nodes = [pool.get_session().driver.node.name for x in range(0, 3)]
+        assert nodes == ['a', 'b', 'a']
+        self.assertRaises(WebDriverException, pool.get_session)
+        pool.close_pool()
+        assert [x.sessions for x in provider.nodes()] == [0, 0]
+
+    def test_balancing_provider_skips_failing_node(self):
+        provider = BalancingDriverProvider([DriverNode('a', FakeDriverProvider(failure_rate=1), capacity=4),
+                                            DriverNode('b', FakeDriverProvider(), capacity=4)],
+                                           max_failures=2, retry_after=60)
+        pool = __get_fake_chrome_pool__(provider, pool_size=4, lazy=True)
+        assert pool.get_session().driver.node.name == 'b'
+        assert pool.get_session().driver.node.name == 'b'
+        node = provider.nodes()[0]
+        assert node.failures == 2 and not node.is_healthy and node.sessions == 0
+        pool.close_pool()
+
+    def test_balancing_provider_drains_node(self):
+        provider = BalancingDriverProvider([DriverNode('a', FakeDriverProvider(), capacity=2),
+                                            DriverNode('b', FakeDriverProvider(), capacity=2)])
+        pool = __get_fake_chrome_pool__(provider, pool_size=2, lazy=True)
+        first = pool.get_session()
+        pool.get_session()
+        provider.drain('a')
+        pool.release_session(first.session_id)
+        assert __wait_until__(lambda: pool.recycles['draining'] == 1)
+        assert __wait_until__(lambda: provider.nodes()[0].is_drained)
+        assert pool.get_session().driver.node.name == 'b'
+        pool.close_pool()
+
+    def test_balancing_provider_releases_node_of_killed_session(self):
+        provider = BalancingDriverProvider([DriverNode('a', FakeDriverProvider(quit_latency=30), capacity=1)])
+        pool = __get_fake_chrome_pool__(provider, pool_size=1, lazy=True)
+        pool.get_session()
+        pool.close_pool(timeout=0.1)
+        # Session which did not quit in time is killed, its slot on the node is given back without the quit
+        assert pool.get_metrics()['counters']['force_kills'] == 1
+        assert provider.nodes()[0].sessions == 0
+
+    def test_launch_options_with_firefox_profile_copied_per_launch(self):
+        profile = FirefoxProfile()
+        config = FirefoxConfiguration(firefox_profile=profile)
+        options = get_launch_options(config)
+        assert options.to_capabilities()['moz:firefoxOptions']['profile'] == profile.encoded
+        assert 'profile' not in config.options.to_capabilities().get('moz:firefoxOptions', dict())
+        assert get_launch_options(config) is not options
+        chrome_config = ChromeConfiguration()
+        assert get_launch_options(chrome_config) is chrome_config.options
+
+    def __get_mixed_pool__(self, pool_size: int, lazy: bool, **kwargs):
+        chrome, firefox = FakeDriverProvider(), FakeDriverProvider()
+        pool = DriverPool([BrowserSpec.chrome(ChromeConfiguration(), chrome),
+                           BrowserSpec.firefox(FirefoxConfiguration(), firefox, tags=['gecko'])],
+                          pool_size=pool_size, lazy_pool=lazy, **kwargs)
+        return pool, chrome, firefox
+
+    def test_mixed_pool_routes_sessions_by_browser_and_tags(self):
+        pool, chrome, firefox = self.__get_mixed_pool__(pool_size=2, lazy=True)
+        session = pool.get_session(browser='firefox')
+        assert session.browser == 'firefox' and session.driver in firefox.launched
+        pool.release_session(session.session_id)
+        assert pool.get_session(tags=['gecko']).session_id == session.session_id
+        assert pool.get_session(browser='chrome').driver in chrome.launched
+        # Both browsers count against one pool size
+        self.assertRaises(BrowserPoolGeneralException, pool.get_session, browser='chrome')
+        self.assertRaises(InvalidOrMissingConfigurationException, pool.get_session, browser='chrome', tags=['gecko'])
+        pool.close_pool()
+        assert len(chrome.running_drivers()) == 0 and len(firefox.running_drivers()) == 0
+
+    def test_mixed_pool_gives_idle_slot_to_other_browser(self):
+        pool, chrome, firefox = self.__get_mixed_pool__(pool_size=1, lazy=True)
+        session = pool.get_session(browser='chrome')
+        pool.release_session(session.session_id)
+        assert pool.get_session(browser='firefox').browser == 'firefox'
+        assert len(chrome.running_drivers()) == 0
+        pool.close_pool()
+
+    def test_mixed_pool_rebalances_idle_sessions_by_demand(self):
+        pool, chrome, firefox = self.__get_mixed_pool__(pool_size=4, lazy=False, rebalance_interval=0.1)
+        gauges = pool.get_metrics()['gauges']
+        assert gauges['idle_sessions_chrome'] == 2 and gauges['idle_sessions_firefox'] == 2
+        for x in range(0, 10):
+            pool.release_session(pool.get_session(browser='firefox').session_id)
+        assert __wait_until__(lambda: pool.get_metrics()['gauges']['idle_sessions_firefox'] == 4)
+        assert len(chrome.running_drivers()) == 0
+        pool.close_pool()
+
+    def test_async_pool_serves_waiters_one_at_a_time(self):
+        async def run():
+            pool = AsyncChromeDriverPool(pool_size=2, chrome_config=ChromeConfiguration(),
+                                         driver_provider=FakeDriverProvider())
+            async with pool:
+                served = list()
+
+                async def task(item):
+                    async with pool.session(timeout=30):
+                        served.append(item)
+                        await asyncio.sleep(0)
+                await asyncio.gather(*[task(x) for x in range(0, 500)])
+                assert sorted(served) == list(range(0, 500))
+                held = [await pool.acquire(), await pool.acquire()]
+                with self.assertRaises(BrowserPoolGeneralException):
+                    await pool.acquire(timeout=0.05)
+                # Cancelled waiter at the head of the queue does not hold back the next one
+                cancelled = asyncio.ensure_future(pool.acquire(timeout=30))
+                await asyncio.sleep(0.01)
+                cancelled.cancel()
+                waiting = asyncio.ensure_future(pool.acquire(timeout=5))
+                await asyncio.sleep(0.01)
+                await pool.release_session(held[1].session_id)
+                assert (await waiting) is held[1]
+
+                def fail_to_quit():
+                    raise WebDriverException('Browser is gone.')
+                # Failed quit still frees the slot of the session
+                held[0].driver.quit = fail_to_quit
+                await pool.close_driver(held[0].session_id)
+                assert (await pool.acquire(timeout=1)).driver is not held[0].driver
+        asyncio.run(run())
+
+    def test_async_pool_has_features_of_driver_pool(self):
+        async def run():
+            provider = FakeDriverProvider(launch_latency=0.2)
+            pool = AsyncChromeDriverPool(pool_size=2, chrome_config=ChromeConfiguration(), driver_provider=provider,
+                                         min_idle=1, max_lease_time=0.3, warm_up=lambda session: None)
+            async with pool:
+                # Idle reserve is replenished by the pool maintainer
+                assert await __wait_until_async__(lambda: pool.get_metrics()['gauges']['idle_sessions'] == 1)
+                ticks = list()
+
+                async def tick():
+                    while True:
+                        ticks.append(time.monotonic())
+                        await asyncio.sleep(0.01)
+                ticker = asyncio.ensure_future(tick())
+                leaked, second = await pool.acquire(), await pool.acquire(timeout=5)
+                # Event loop keeps running while the second driver is started
+                assert len(ticks) > 5
+                ticker.cancel()
+                assert 'run' in pool.get_lease_report()['active'][0]['acquired_at']
+                # Leaked session is reclaimed and its slot serves the waiting coroutine
+                assert (await pool.acquire(timeout=5)) is not leaked
+                assert pool.pool.evictions['lease_expired'] >= 1
+                await pool.release_session(second.session_id)
+            assert len(provider.running_drivers()) == 0
+        asyncio.run(run())
+
+    def test_firefox_pool_runs_with_fake_driver(self):
+        provider = FakeDriverProvider()
+        pool = FirefoxDriverPool(pool_size=2, lazy_pool=False, ff_config=FirefoxConfiguration(),
+                                 driver_provider=provider)
+        session = pool.get_session()
+        pool.release_session(session.session_id)
+        pool.close_pool()
+        assert len(provider.running_drivers()) == 0
@@ -0,0 +1,136 @@
+import socket
+import threading
+import time
+from types import SimpleNamespace
+from unittest import TestCase
+
+from src.browser_pool import ChromeDriverPool
+from src.config.webdriver_config import ChromeConfiguration
+from src.daemon.pool_client import PoolClient
+from src.daemon.pool_daemon import DEFAULT_MAX_LEASE_TIME, PoolDaemon, parse_args
+from src.exception.BrowserPoolGeneralException import BrowserPoolGeneralException
+from src.provider.fake_webdriver_provider import FakeDriverProvider
+
+FAKE_EXECUTOR_URL = 'http://127.0.0.1:9'
+
+
+def __wait_until__(predicate, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def __provide_fake_remote_driver__(provider: FakeDriverProvider):
+    def provide(config):
+        driver = provider(config)
+        # Endpoint of the driver service, fake driver is not reachable there, but clients can attach to it
+        driver.command_executor = SimpleNamespace(_url=FAKE_EXECUTOR_URL)
+        return driver
+    return provide
+
+
+class TestPoolDaemon(TestCase):
+    def setUp(self):
+        self.provider = FakeDriverProvider()
+        self.pool = ChromeDriverPool(pool_size=1, lazy_pool=True, chrome_config=ChromeConfiguration(),
+                                     driver_provider=__provide_fake_remote_driver__(self.provider))
+        self.daemon = PoolDaemon(self.pool).start()
+        self.client = PoolClient(self.daemon.address)
+
+    def tearDown(self):
+        self.daemon.stop()
+        assert len(self.provider.running_drivers()) == 0
+
+    def test_released_session_leased_again(self):
+        session = self.client.get_session()
+        assert session.lease['executor_url'] == FAKE_EXECUTOR_URL
+        assert session.lease['webdriver_session_id'] == self.provider.launched[0].session_id
+        self.client.release_session(session.session_id)
+        assert self.client.get_session().session_id == session.session_id
+        assert len(self.provider.launched) == 1
+
+    def test_pool_limit_applies_to_all_clients(self):
+        self.client.get_session()
+        try:
+            PoolClient(self.daemon.address).get_session(timeout=0.1)
+            self.fail("Session over pool size should not be leased!")
+        except BrowserPoolGeneralException as ex:
+            assert ex.message == 'Reached limit of drivers in Chrome browser pool.'
+
+    def test_attached_driver_uses_leased_session(self):
+        session = self.client.get_session()
+        driver = session.driver
+        assert driver.session_id == session.lease['webdriver_session_id']
+        assert driver.command_executor._url == FAKE_EXECUTOR_URL
+        assert driver.caps['browserName'] == 'fake'
+        # Quit of attached driver closes the session in the pool
+        driver.quit()
+        assert __wait_until__(lambda: self.provider.launched[0].is_quit)
+        assert 'browser_pool_active_sessions{pool="chrome"} 0' in self.client.get_prometheus_metrics()
+
+    def test_checkout_arguments_forwarded_to_pool(self):
+        try:
+            self.client.get_session(browser='firefox')
+            self.fail("Session of browser which is not in the pool should not be leased!")
+        except BrowserPoolGeneralException as ex:
+            assert ex.message.startswith('No browser of Chrome browser pool matches browser firefox')
+        session = self.client.get_session(max_hold=0.1)
+        # Lease held longer than max_hold is reclaimed and forgotten by the daemon
+        assert __wait_until__(lambda: not self.daemon.leases())
+        assert __wait_until__(lambda: self.provider.launched[0].is_quit)
+        self.client.release_session(session.session_id)
+        assert self.client.get_session(timeout=1).session_id != session.session_id
+
+    def test_reclaimed_lease_dropped(self):
+        provider = FakeDriverProvider()
+        pool = ChromeDriverPool(pool_size=1, lazy_pool=True, chrome_config=ChromeConfiguration(), max_lease_time=0.1,
+                                driver_provider=__provide_fake_remote_driver__(provider))
+        daemon = PoolDaemon(pool).start()
+        try:
+            session = PoolClient(daemon.address).get_session()
+            assert [x['session_id'] for x in daemon.leases()] == [session.session_id]
+            assert __wait_until__(lambda: not daemon.leases())
+            assert not daemon.release(session.session_id)
+        finally:
+            daemon.stop()
+        assert len(provider.running_drivers()) == 0
+
+    def test_unexpected_error_returned_as_json(self):
+        def fail(timeout, proxy, **kwargs):
+            raise ValueError('Broken pool.')
+        self.pool.get_session = fail
+        try:
+            self.client.get_session()
+            self.fail("Session should not be leased by failed pool!")
+        except BrowserPoolGeneralException as ex:
+            assert ex.message == 'Pool daemon failed to serve /sessions: Broken pool.'
+        # Daemon keeps serving after the failure
+        assert 'browser_pool_active_sessions{pool="chrome"} 0' in self.client.get_prometheus_metrics()
+
+    def test_dropped_connection_raises_pool_exception(self):
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+
+        def drop_connection():
+            connection, address = server.accept()
+            connection.recv(1024)
+            connection.close()
+        thread = threading.Thread(target=drop_connection, daemon=True)
+        thread.start()
+        try:
+            PoolClient('http://127.0.0.1:{}'.format(server.getsockname()[1])).get_session()
+            self.fail("Dropped connection should raise pool exception!")
+        except BrowserPoolGeneralException as ex:
+            assert ex.message.startswith('Pool daemon http://127.0.0.1:')
+        finally:
+            thread.join()
+            server.close()
+
+    def test_leases_reclaimed_by_default(self):
+        # Sessions of workers which died holding them come back to the pool
+        args = parse_args(['--executable-path', '/path/to/chromedriver', '--pool-size', '2'])
+        assert args.max_lease_time == DEFAULT_MAX_LEASE_TIME
+        args = parse_args(['--executable-path', '/path/to/chromedriver', '--pool-size', '2', '--max-lease-time', '0'])
+        assert args.max_lease_time is None